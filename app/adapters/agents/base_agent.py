@@ -1,15 +1,56 @@
 import abc
+import dataclasses
+import datetime
 import logging
 import typing
 
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
 from langchain_core.runnables import ConfigurableFieldSpec, RunnableConfig
 from langchain_core.runnables.history import RunnableWithMessageHistory
 from langchain_openai import ChatOpenAI
 
-from app import models, ports
+from app import metrics, models, ports
+from app.adapters.agents import utils
+from app.config import settings
+
+from .cache import normalize_message
+from .summary import HistoryCompactor
 
 logger = logging.getLogger(__name__)
 
+semantic_cache_hits = metrics.registry.counter(
+    "semantic_cache_hits_total",
+    "Number of chat responses served from the semantic answer cache",
+)
+semantic_cache_misses = metrics.registry.counter(
+    "semantic_cache_misses_total",
+    "Number of questions without a similar question in the semantic answer cache",
+)
+
+
+@dataclasses.dataclass(frozen=True)
+class _CachePolicy:
+    """Response caches enabled for a bot"""
+
+    updated_at: datetime.datetime
+    exact: bool = False
+    semantic_threshold: float | None = None
+
+    @property
+    def enabled(self) -> bool:
+        """Whether any response cache is enabled"""
+        return self.exact or self.semantic_threshold is not None
+
+
+@dataclasses.dataclass
+class _CacheLookup:
+    """Result of looking up a message in the response caches"""
+
+    key: str | None = None
+    vector: list[float] | None = None
+    content: str | None = None
+
 
 class BaseLangChainAgent(ports.ChatBotAgent, abc.ABC):
     """
@@ -19,8 +60,34 @@ class BaseLangChainAgent(ports.ChatBotAgent, abc.ABC):
     def __init__(self, bot: models.Bot, **kwargs: typing.Any) -> None:
         self._model: ChatOpenAI | None = None
         self._chain: RunnableWithMessageHistory | None = None
+        # keep the id so cached agents don't touch the detached bot instance
+        self._bot_id = str(bot.id)
+        self._cache_policy = _CachePolicy(
+            updated_at=bot.updated_at,
+            exact=bool(bot.response_cache),
+            semantic_threshold=bot.semantic_cache_threshold,
+        )
+        self._history_params = bot.get_history_params()
+        self._compactor: HistoryCompactor | None = None
+        if settings.history_summary_threshold > 0:
+            self._compactor = HistoryCompactor(
+                model=ChatOpenAI(
+                    openai_api_key=settings.openai_api_key,  # type: ignore[call-arg]
+                    model_name=settings.history_summary_model,
+                    temperature=0,
+                ),
+                threshold=settings.history_summary_threshold,
+                keep_messages=settings.history_summary_keep_messages,
+            )
         super().__init__(bot, **kwargs)
 
+    def _get_session_history(
+        self, bot_id: str, session_id: str
+    ) -> BaseChatMessageHistory:
+        return utils.get_session_history(
+            bot_id, session_id, compactor=self._compactor, **self._history_params
+        )
+
     @classmethod
     def _get_history_config(cls) -> list[ConfigurableFieldSpec]:
         return [
@@ -49,10 +116,7 @@ class BaseLangChainAgent(ports.ChatBotAgent, abc.ABC):
         logger.info(
             "Invoking bot with session: %s and message: %s", session_id, message
         )
-        config = typing.cast(
-            RunnableConfig,
-            {"configurable": {"session_id": session_id, "bot_id": str(self._bot.id)}},
-        )
+        config = self._get_config(session_id)
 
         response = await self._chain.ainvoke(
             {"input": message},
@@ -62,16 +126,100 @@ class BaseLangChainAgent(ports.ChatBotAgent, abc.ABC):
 
         return response
 
+    async def _cached_invoke(
+        self,
+        session_id: str,
+        message: str,
+        get_content: typing.Callable[[typing.Any], str],
+    ) -> str:
+        """
+        Invoke the agent through the response caches enabled for the bot.
+        A cached response is still added to the session history.
+        """
+        if not self._cache_policy.enabled:
+            return get_content(await self._invoke(session_id, message))
+
+        history = self._get_session_history(self._bot_id, session_id)
+        lookup = await self._lookup_caches(message, await history.aget_messages())
+        if lookup.content is not None:
+            logger.info("Cached response for session: %s", session_id)
+            await history.aadd_messages(
+                [HumanMessage(content=message), AIMessage(content=lookup.content)]
+            )
+            return lookup.content
+
+        content = get_content(await self._invoke(session_id, message))
+        if lookup.key is not None:
+            await utils.get_response_cache().aset(self._bot_id, lookup.key, content)
+        if lookup.vector is not None:
+            await utils.get_answer_cache().add(
+                self._cache_namespace, message, lookup.vector, content
+            )
+        return content
+
+    async def _lookup_caches(
+        self, message: str, history: list[BaseMessage]
+    ) -> _CacheLookup:
+        policy = self._cache_policy
+        lookup = _CacheLookup()
+        if policy.exact:
+            response_cache = utils.get_response_cache()
+            lookup.key = response_cache.make_key(
+                self._bot_id, policy.updated_at, message, history
+            )
+            lookup.content = await response_cache.aget(lookup.key)
+            if lookup.content is not None:
+                return lookup
+
+        # similar questions only share an answer without a conversation to refer to
+        if policy.semantic_threshold is not None and not history:
+            answer_cache = utils.get_answer_cache()
+            lookup.vector = await answer_cache.embed(normalize_message(message))
+            lookup.content = await answer_cache.lookup(
+                self._cache_namespace, lookup.vector, policy.semantic_threshold
+            )
+            if lookup.content is not None:
+                semantic_cache_hits.inc()
+            else:
+                semantic_cache_misses.inc()
+
+        return lookup
+
+    @property
+    def _cache_namespace(self) -> str:
+        # editing the bot starts a new namespace, so stale answers are not reused
+        return f"{self._bot_id}:{self._cache_policy.updated_at.isoformat()}"
+
     def _stream(self, session_id: str, message: str) -> typing.Iterator[typing.Any]:
         if not self._chain:
             raise RuntimeError("Agent is not initialized")
 
-        config = typing.cast(
-            RunnableConfig,
-            {"configurable": {"session_id": session_id, "bot_id": str(self._bot.id)}},
-        )
+        config = self._get_config(session_id)
 
         yield from self._chain.stream(
             {"input": message},
             config=config,
         )
+
+    async def _astream(
+        self, session_id: str, message: str
+    ) -> typing.AsyncIterator[typing.Any]:
+        if not self._chain:
+            raise RuntimeError("Agent is not initialized")
+
+        logger.info(
+            "Streaming bot with session: %s and message: %s", session_id, message
+        )
+        config = self._get_config(session_id)
+
+        async for chunk in self._chain.astream(
+            {"input": message},
+            config=config,
+        ):
+            yield chunk
+
+    def _get_config(self, session_id: str) -> RunnableConfig:
+        return typing.cast(
+            RunnableConfig,
+            {"configurable": {"session_id": session_id, "bot_id": self._bot_id}},
+        )
@@ -0,0 +1,100 @@
+import datetime
+import hashlib
+import json
+import logging
+import time
+import typing
+
+from langchain_core.messages import BaseMessage, message_to_dict
+from redis import asyncio as aioredis
+
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+cache_hits = metrics.registry.counter(
+    "response_cache_hits_total", "Number of chat responses served from the cache"
+)
+cache_misses = metrics.registry.counter(
+    "response_cache_misses_total", "Number of cacheable chat requests sent to the LLM"
+)
+
+
+def normalize_message(message: str) -> str:
+    """Collapse whitespace and case so trivially different questions match"""
+    return " ".join(message.split()).casefold()
+
+
+class ResponseCache:
+    """
+    Exact-match cache of chat responses stored in Redis.
+
+    Entries expire after `ttl` seconds and each bot keeps at most
+    `max_entries` responses, tracked in a sorted set by insertion time
+    so the oldest ones are evicted first.
+    """
+
+    def __init__(self, client: aioredis.Redis, ttl: int, max_entries: int) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._client = client
+
+    @classmethod
+    def make_key(
+        cls,
+        bot_id: str,
+        updated_at: datetime.datetime,
+        message: str,
+        history: typing.Sequence[BaseMessage],
+    ) -> str:
+        """
+        Build the cache key of a message sent with the given history window,
+        editing the bot changes `updated_at` and so invalidates its entries.
+        """
+        payload = json.dumps(
+            {
+                "updated_at": updated_at.isoformat(),
+                "message": normalize_message(message),
+                "history": [message_to_dict(m) for m in history],
+            },
+            sort_keys=True,
+        )
+        digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        return f"response_cache:{bot_id}:{digest}"
+
+    @classmethod
+    def index_key(cls, bot_id: str) -> str:
+        """Construct the key of the sorted set indexing the bot entries"""
+        return f"response_cache_index:{bot_id}"
+
+    async def aget(self, key: str) -> str | None:
+        """Retrieve a cached response"""
+        response = await typing.cast(
+            typing.Awaitable[bytes | None], self._client.get(key)
+        )
+        if response is None:
+            cache_misses.inc()
+            return None
+
+        cache_hits.inc()
+        return response.decode("utf-8")
+
+    async def aset(self, bot_id: str, key: str, response: str) -> None:
+        """Store a response, evicting the oldest entries of the bot past the limit"""
+        index_key = self.index_key(bot_id)
+        now = time.time()
+        async with self._client.pipeline(transaction=True) as pipe:
+            pipe.set(key, response, ex=self.ttl)
+            pipe.zadd(index_key, {key: now})
+            pipe.zremrangebyscore(index_key, "-inf", now - self.ttl)
+            pipe.zrange(index_key, 0, -self.max_entries - 1)
+            pipe.expire(index_key, self.ttl)
+            results = await pipe.execute()
+
+        evicted = results[3]
+        if evicted:
+            async with self._client.pipeline(transaction=True) as pipe:
+                pipe.delete(*evicted)
+                pipe.zrem(index_key, *evicted)
+                await pipe.execute()
+            logger.debug("Evicted %s cached responses of bot %s", len(evicted), bot_id)
@@ -4,7 +4,6 @@ from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.runnables.history import RunnableWithMessageHistory
 from langchain_openai import ChatOpenAI
 
-from app.adapters.agents import utils
 from app.config import settings
 
 from .base_agent import BaseLangChainAgent
@@ -32,16 +31,23 @@ class ChatBotAgent(BaseLangChainAgent):
         chain = prompt | self._model
         with_message_history = RunnableWithMessageHistory(
             chain,  # type: ignore[arg-type]
-            utils.get_session_history,
+            self._get_session_history,
             input_messages_key="input",
             history_factory_config=self._get_history_config(),
         )
         self._chain = with_message_history
 
     async def invoke(self, session_id: str, message: str) -> str:
-        resp = await self._invoke(session_id, message)
-        return str(resp.content)
+        return await self._cached_invoke(
+            session_id, message, lambda resp: str(resp.content)
+        )
 
     def stream(self, session_id: str, message: str) -> typing.Iterator[str]:
         for chunk in self._stream(session_id, message):
             yield str(chunk.content)
+
+    async def astream(  # pylint: disable=invalid-overridden-method
+        self, session_id: str, message: str
+    ) -> typing.AsyncGenerator[str, None]:
+        async for chunk in self._astream(session_id, message):
+            yield str(chunk.content)
@@ -0,0 +1,260 @@
+import asyncio
+import dataclasses
+import functools
+import json
+import typing
+import uuid
+
+import tiktoken
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import (
+    BaseMessage,
+    HumanMessage,
+    SystemMessage,
+    message_to_dict,
+    messages_from_dict,
+)
+from redis import asyncio as aioredis
+
+if typing.TYPE_CHECKING:
+    from .summary import HistoryCompactor
+
+_T = typing.TypeVar("_T")
+
+Summarizer = typing.Callable[[str | None, list[BaseMessage]], typing.Awaitable[str]]
+
+# number of messages fetched per LRANGE call when reading a history window
+HISTORY_PAGE_SIZE = 20
+# per message overhead added by the chat completion format
+MESSAGE_TOKENS_OVERHEAD = 4
+# seconds after which a stale compaction lock expires
+COMPACTION_LOCK_TIMEOUT = 120
+# releases the compaction lock only while it still holds our token,
+# an expired lock may have been taken by another worker meanwhile
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+
+@dataclasses.dataclass(frozen=True)
+class HistoryWindow:
+    """
+    Limits the chat history read for a session, unbounded when not set
+    """
+
+    max_messages: int | None = None
+    max_tokens: int | None = None
+    model_name: str | None = None
+
+
+class AsyncRedisChatMessageHistory(BaseChatMessageHistory):
+    """
+    Chat message history stored in Redis using a shared asyncio connection pool.
+
+    Messages are stored in the same format as `RedisChatMessageHistory`, so
+    existing sessions keep working. When a window is given, only the most
+    recent messages fitting the window are read.
+    Older messages compacted into a running summary are returned as a leading
+    system message.
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        client: aioredis.Redis,
+        window: HistoryWindow | None = None,
+        compactor: "HistoryCompactor | None" = None,
+    ) -> None:
+        self.session_id = session_id
+        self.window = window or HistoryWindow()
+        self._client = client
+        self._compactor = compactor
+        # the loop owning the connection pool, used to serve the sync API
+        self._loop = _get_running_loop()
+
+    @property
+    def key(self) -> str:
+        """Construct the record key to use"""
+        return "message_store:" + self.session_id
+
+    @property
+    def summary_key(self) -> str:
+        """Construct the running summary key to use"""
+        return "summary_store:" + self.session_id
+
+    async def aget_messages(self) -> list[BaseMessage]:
+        summary, messages = await asyncio.gather(
+            self.aget_summary(), self._aget_messages()
+        )
+        if summary:
+            summary_message = SystemMessage(
+                content=f"Summary of the earlier conversation:\n{summary}"
+            )
+            return [summary_message, *messages]
+        return messages
+
+    async def aget_summary(self) -> str | None:
+        """Retrieve the running summary of compacted messages"""
+        summary = await typing.cast(
+            typing.Awaitable[bytes | None], self._client.get(self.summary_key)
+        )
+        return summary.decode("utf-8") if summary else None
+
+    async def _aget_messages(self) -> list[BaseMessage]:
+        if self.window.max_messages is None and self.window.max_tokens is None:
+            _items = await self._lrange(0, -1)
+            items = [json.loads(m) for m in _items[::-1]]
+            return messages_from_dict(items)
+
+        return await self._aget_window()
+
+    async def _aget_window(self) -> list[BaseMessage]:
+        """
+        Read the most recent messages fitting the configured window,
+        paging through the list (stored newest first) with LRANGE.
+        """
+        limit = self.window.max_messages
+        max_tokens = self.window.max_tokens
+        page_size = min(limit, HISTORY_PAGE_SIZE) if limit else HISTORY_PAGE_SIZE
+        messages: list[BaseMessage] = []
+        tokens = 0
+        start = 0
+        while limit is None or start < limit:
+            stop = start + page_size - 1
+            if limit is not None:
+                stop = min(stop, limit - 1)
+
+            _items = await self._lrange(start, stop)
+            for item in _items:
+                message = messages_from_dict([json.loads(item)])[0]
+                if max_tokens is not None:
+                    tokens += self._count_tokens(message)
+                    if tokens > max_tokens:
+                        return _start_with_human_message(messages[::-1])
+                messages.append(message)
+
+            if len(_items) <= stop - start:
+                break
+            start = stop + 1
+
+        return _start_with_human_message(messages[::-1])
+
+    async def _lrange(self, start: int, stop: int) -> list[bytes]:
+        return await typing.cast(
+            typing.Awaitable[list[bytes]], self._client.lrange(self.key, start, stop)
+        )
+
+    def _count_tokens(self, message: BaseMessage) -> int:
+        encoding = _get_encoding(self.window.model_name)
+        return len(encoding.encode(str(message.content))) + MESSAGE_TOKENS_OVERHEAD
+
+    async def aadd_messages(self, messages: typing.Sequence[BaseMessage]) -> None:
+        if not messages:
+            return None
+
+        async with self._client.pipeline(transaction=False) as pipe:
+            for message in messages:
+                pipe.lpush(self.key, json.dumps(message_to_dict(message)))
+            results = await pipe.execute()
+
+        # LPUSH replies with the new length of the list
+        if self._compactor is not None and results[-1] > self._compactor.threshold:
+            self._compactor.schedule(self)
+
+    async def acompact(self, summarize: Summarizer, keep_messages: int) -> bool:
+        """
+        Fold all but the newest `keep_messages` messages into the running summary.
+        Returns False when there is nothing to compact or another worker
+        is already compacting the session.
+        """
+        lock_key = f"{self.summary_key}:lock"
+        token = uuid.uuid4().hex
+        locked = await typing.cast(
+            typing.Awaitable[bool | None],
+            self._client.set(lock_key, token, nx=True, ex=COMPACTION_LOCK_TIMEOUT),
+        )
+        if not locked:
+            return False
+
+        try:
+            length = await typing.cast(
+                typing.Awaitable[int], self._client.llen(self.key)
+            )
+            count = length - keep_messages
+            if count <= 0:
+                return False
+
+            # oldest messages are at the tail of the list
+            _items = await self._lrange(keep_messages, length - 1)
+            old_messages = messages_from_dict([json.loads(m) for m in _items[::-1]])
+            summary = await summarize(await self.aget_summary(), old_messages)
+
+            # trim from the tail, so messages pushed meanwhile are kept
+            async with self._client.pipeline(transaction=True) as pipe:
+                pipe.set(self.summary_key, summary)
+                pipe.ltrim(self.key, 0, -count - 1)
+                await pipe.execute()
+            return True
+        finally:
+            await typing.cast(
+                typing.Awaitable[int],
+                self._client.eval(_RELEASE_LOCK_SCRIPT, 1, lock_key, token),
+            )
+
+    async def aclear(self) -> None:
+        await self._client.delete(self.key, self.summary_key)
+
+    @property
+    def messages(self) -> list[BaseMessage]:  # type: ignore[override]
+        """Retrieve the messages from Redis"""
+        return self._run_sync(self.aget_messages())
+
+    def add_messages(self, messages: typing.Sequence[BaseMessage]) -> None:
+        self._run_sync(self.aadd_messages(messages))
+
+    def clear(self) -> None:
+        self._run_sync(self.aclear())
+
+    def _run_sync(self, coro: typing.Coroutine[typing.Any, typing.Any, _T]) -> _T:
+        """
+        Run a coroutine on the loop owning the connection pool.
+        LangChain calls the sync API from executor threads (e.g. the history
+        listener), so those calls are handed back to the event loop instead of
+        opening new connections.
+        """
+        if self._loop is None or self._loop.is_closed():
+            coro.close()
+            raise RuntimeError("Chat history must be created inside an event loop")
+        if _get_running_loop() is self._loop:
+            coro.close()
+            raise RuntimeError(
+                "Sync chat history API would block the event loop, use the async API"
+            )
+
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+
+def _start_with_human_message(messages: list[BaseMessage]) -> list[BaseMessage]:
+    """Drop leading replies whose question fell outside the window"""
+    for idx, message in enumerate(messages):
+        if isinstance(message, HumanMessage):
+            return messages[idx:]
+    return []
+
+
+@functools.lru_cache
+def _get_encoding(model_name: str | None) -> tiktoken.Encoding:
+    try:
+        return tiktoken.encoding_for_model(model_name or "")
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def _get_running_loop() -> asyncio.AbstractEventLoop | None:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
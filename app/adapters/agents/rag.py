@@ -2,7 +2,6 @@ import logging
 import typing
 
 from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain.chains.history_aware_retriever import create_history_aware_retriever
 from langchain.chains.retrieval import create_retrieval_chain
 from langchain_core import prompts
 from langchain_core.prompts import ChatPromptTemplate
@@ -11,10 +10,10 @@ from langchain_openai import ChatOpenAI
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
 from app import models, ports
-from app.adapters.agents import utils
 from app.config import settings
 
 from .base_agent import BaseLangChainAgent
+from .retrievers import create_rewriting_retriever
 
 logger = logging.getLogger(__name__)
 
@@ -54,8 +53,18 @@ class RAGAgent(BaseLangChainAgent):
                 ("human", "{input}"),
             ]
         )
-        history_aware_retriever = create_history_aware_retriever(
-            self._model, retriever, contextualize_q_prompt
+        rewrite_model = self._model
+        if settings.rag_rewrite_model:
+            rewrite_model = ChatOpenAI(
+                openai_api_key=settings.openai_api_key,  # type: ignore[call-arg]
+                model_name=settings.rag_rewrite_model,
+                temperature=0,
+            )
+        history_aware_retriever = create_rewriting_retriever(
+            rewrite_model,
+            retriever,
+            contextualize_q_prompt,
+            policy=settings.rag_rewrite_policy,
         )
 
         # create prompts template based on the bot context
@@ -74,7 +83,7 @@ class RAGAgent(BaseLangChainAgent):
         # add chat memory
         conversational_rag_chain = RunnableWithMessageHistory(
             rag_chain,
-            utils.get_session_history,
+            self._get_session_history,
             input_messages_key="input",
             history_messages_key="chat_history",
             output_messages_key="answer",
@@ -83,9 +92,18 @@ class RAGAgent(BaseLangChainAgent):
         self._chain = conversational_rag_chain
 
     async def invoke(self, session_id: str, message: str) -> str:
-        response = await self._invoke(session_id, message)
-        return str(response["answer"])
+        return await self._cached_invoke(
+            session_id, message, lambda response: str(response["answer"])
+        )
 
     def stream(self, session_id: str, message: str) -> typing.Iterator[str]:
         for chunk in self._stream(session_id, message):
             yield str(chunk["answer"])
+
+    async def astream(  # pylint: disable=invalid-overridden-method
+        self, session_id: str, message: str
+    ) -> typing.AsyncGenerator[str, None]:
+        async for chunk in self._astream(session_id, message):
+            # retrieval chain also streams the input and retrieved context
+            if "answer" in chunk:
+                yield str(chunk["answer"])
@@ -1,7 +1,10 @@
+import collections
+import datetime
 import logging
 import typing
+import uuid
 
-from app import models, ports, typings
+from app import metrics, models, ports, typings
 
 from .chatbot import ChatBotAgent
 from .rag import RAGAgent
@@ -10,13 +13,51 @@ _bot_mappings = {typings.BotType.chatbot: ChatBotAgent, typings.BotType.rag: RAG
 
 logger = logging.getLogger(__name__)
 
+cache_hits = metrics.registry.counter(
+    "agent_cache_hits_total", "Number of agents served from the agent cache"
+)
+cache_misses = metrics.registry.counter(
+    "agent_cache_misses_total", "Number of agents initialized on a cache miss"
+)
+
 
 class BotAgentRepository(ports.BotAgentRepository):
     """
-    A repository for LLM implemented agents
+    A repository for LLM implemented agents.
+
+    Initialized agents are kept in a bounded LRU cache keyed by the bot id and
+    `updated_at`, so an edited bot gets a freshly initialized agent.
+    Agent kwargs (e.g. the vector store) are expected to be process-wide.
     """
 
+    def __init__(self, cache_size: int = 0) -> None:
+        self._cache_size = cache_size
+        self._cache: collections.OrderedDict[
+            uuid.UUID, tuple[datetime.datetime, ports.ChatBotAgent]
+        ] = collections.OrderedDict()
+
     def get_agent(self, bot: models.Bot, **kwargs: typing.Any) -> ports.ChatBotAgent:
+        if self._cache_size <= 0:
+            return self._create_agent(bot, **kwargs)
+
+        cached = self._cache.get(bot.id)
+        if cached is not None and cached[0] == bot.updated_at:
+            self._cache.move_to_end(bot.id)
+            cache_hits.inc()
+            return cached[1]
+
+        cache_misses.inc()
+        agent = self._create_agent(bot, **kwargs)
+        self._cache[bot.id] = (bot.updated_at, agent)
+        self._cache.move_to_end(bot.id)
+        while len(self._cache) > self._cache_size:
+            evicted_id, _ = self._cache.popitem(last=False)
+            logger.debug("Evicted agent for bot %s from cache", evicted_id)
+
+        return agent
+
+    @classmethod
+    def _create_agent(cls, bot: models.Bot, **kwargs: typing.Any) -> ports.ChatBotAgent:
         try:
             agent_cls = _bot_mappings[bot.bot_type]
         except KeyError as exc:
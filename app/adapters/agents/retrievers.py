@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import re
+import typing
+
+from langchain.chains.history_aware_retriever import create_history_aware_retriever
+from langchain_core.documents import Document
+from langchain_core.language_models import LanguageModelLike
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import BasePromptTemplate
+from langchain_core.retrievers import RetrieverLike, RetrieverOutputLike
+from langchain_core.runnables import RunnableBranch, RunnableConfig, RunnableLambda
+
+from app import metrics
+
+from .cache import normalize_message
+
+logger = logging.getLogger(__name__)
+
+RewritePolicy = typing.Literal["always", "references", "speculative"]
+
+rewrites_skipped = metrics.registry.counter(
+    "rag_question_rewrites_skipped_total",
+    "Number of follow-up questions retrieved without the rewrite LLM call",
+)
+speculative_hits = metrics.registry.counter(
+    "rag_speculative_retrieval_hits_total",
+    "Number of speculative retrievals kept as the rewrite matched the question",
+)
+
+# words referring back to the conversation, a question using them needs a rewrite
+REFERENCE_WORDS = frozenset(
+    (
+        "it its it's itself they them their theirs this that these those "
+        "he him his she her hers one ones such same former latter above "
+        "previous earlier aforementioned else more again there then"
+    ).split()
+)
+# short follow-ups like "why?" or "and pricing?" only make sense in context
+MIN_STANDALONE_WORDS = 3
+_word_re = re.compile(r"[\w']+")
+
+
+def needs_rewrite(question: str) -> bool:
+    """
+    Whether the question may refer to the chat history and must be rewritten
+    into a standalone question before retrieval
+    """
+    words = _word_re.findall(question.casefold())
+    if len(words) < MIN_STANDALONE_WORDS or words[0] in ("and", "but", "also"):
+        return True
+    return any(word in REFERENCE_WORDS for word in words)
+
+
+def _has_history(inputs: dict[str, typing.Any]) -> bool:
+    return bool(inputs.get("chat_history"))
+
+
+def _needs_history(inputs: dict[str, typing.Any]) -> bool:
+    if not _has_history(inputs):
+        return False
+    if needs_rewrite(inputs["input"]):
+        return True
+
+    rewrites_skipped.inc()
+    return False
+
+
+def create_rewriting_retriever(
+    llm: LanguageModelLike,
+    retriever: RetrieverLike,
+    prompt: BasePromptTemplate[typing.Any],
+    policy: RewritePolicy = "always",
+) -> RetrieverOutputLike:
+    """
+    Create a chain retrieving documents for a question given the chat history.
+
+    With the `always` policy every follow-up question is rewritten by the LLM
+    as `create_history_aware_retriever` does. The `references` policy sends
+    questions without references to the conversation straight to retrieval.
+    `speculative` rewrites every follow-up like `always`, but retrieves the raw
+    question while the rewrite is in flight, keeping those documents when the
+    rewrite is a no-op.
+    """
+    if policy == "always":
+        return create_history_aware_retriever(llm, retriever, prompt)
+
+    rewrite_chain = prompt | llm | StrOutputParser()
+    if policy == "speculative":
+        retrieve_follow_up: RetrieverOutputLike = RunnableLambda(
+            lambda x: retriever.invoke(rewrite_chain.invoke(x)),
+            afunc=_speculative_retrieve(retriever, rewrite_chain),
+        )
+        # no heuristic, the raw question is retrieved alongside every rewrite
+        is_follow_up = _has_history
+    else:
+        retrieve_follow_up = rewrite_chain | retriever
+        is_follow_up = _needs_history
+
+    return RunnableBranch(
+        (is_follow_up, retrieve_follow_up),
+        (lambda x: x["input"]) | retriever,
+    ).with_config(run_name="chat_retriever_chain")
+
+
+def _speculative_retrieve(
+    retriever: RetrieverLike,
+    rewrite_chain: typing.Any,
+) -> typing.Callable[
+    [dict[str, typing.Any], RunnableConfig], typing.Awaitable[list[Document]]
+]:
+    async def retrieve(
+        inputs: dict[str, typing.Any], config: RunnableConfig
+    ) -> list[Document]:
+        question = inputs["input"]
+        speculative = asyncio.ensure_future(retriever.ainvoke(question, config))
+        try:
+            query = await rewrite_chain.ainvoke(inputs, config)
+        except BaseException:
+            speculative.cancel()
+            raise
+
+        if normalize_message(query) == normalize_message(question):
+            # the rewrite call was made, it is not counted as skipped
+            speculative_hits.inc()
+            return await speculative
+
+        speculative.cancel()
+        logger.debug("Retrieving rewritten question: %s", query)
+        return await retriever.ainvoke(query, config)
+
+    return retrieve
@@ -0,0 +1,72 @@
+import asyncio
+import logging
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage, get_buffer_string
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+from .history import AsyncRedisChatMessageHistory
+
+logger = logging.getLogger(__name__)
+
+summary_prompt = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            "Progressively summarize the lines of conversation provided, "
+            "adding onto the previous summary and returning a new summary. "
+            "Keep names, facts, decisions and open questions the assistant "
+            "may need to continue the conversation.",
+        ),
+        (
+            "human",
+            "Current summary:\n{summary}\n\nNew lines of conversation:\n{new_lines}"
+            "\n\nNew summary:",
+        ),
+    ]
+)
+
+# keep references to running compactions so they are not garbage collected
+_background_tasks: set[asyncio.Task[None]] = set()
+
+
+class HistoryCompactor:
+    """
+    Folds older turns of a chat session into a running summary.
+    Compaction runs as a background task once the session history grows
+    past the threshold, so it never delays the user request.
+    """
+
+    def __init__(
+        self, model: BaseChatModel, threshold: int, keep_messages: int
+    ) -> None:
+        self.threshold = threshold
+        self.keep_messages = keep_messages
+        self._chain = summary_prompt | model | StrOutputParser()
+
+    def schedule(self, history: AsyncRedisChatMessageHistory) -> None:
+        """
+        Schedule compaction of the history on the running event loop
+        """
+        task = asyncio.create_task(self.compact(history))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+    async def compact(self, history: AsyncRedisChatMessageHistory) -> None:
+        """
+        Compact the history, errors are logged and never propagated
+        """
+        try:
+            if await history.acompact(self.summarize, self.keep_messages):
+                logger.info("Compacted chat history %s", history.session_id)
+        except Exception:  # pylint: disable=broad-exception-caught
+            logger.exception("Failed to compact chat history %s", history.session_id)
+
+    async def summarize(self, summary: str | None, messages: list[BaseMessage]) -> str:
+        """
+        Returns a new summary extending the current one with the given messages
+        """
+        return await self._chain.ainvoke(
+            {"summary": summary or "", "new_lines": get_buffer_string(messages)}
+        )
@@ -1,11 +1,44 @@
-from langchain_community.chat_message_histories import RedisChatMessageHistory
+import typing
 
+from app import clients, ports
 from app.config import settings
 
+from .cache import ResponseCache
+from .history import AsyncRedisChatMessageHistory, HistoryWindow
+from .summary import HistoryCompactor
 
-def get_session_history(bot_id: str, session_id: str) -> RedisChatMessageHistory:
+
+def get_session_history(
+    bot_id: str,
+    session_id: str,
+    compactor: HistoryCompactor | None = None,
+    **kwargs: typing.Any,
+) -> AsyncRedisChatMessageHistory:
     """
-    Get session history
+    Get session history, kwargs configure the history window
     """
     session_key = f"{bot_id}_{session_id}"
-    return RedisChatMessageHistory(session_key, url=settings.redis_url)
+    return AsyncRedisChatMessageHistory(
+        session_key,
+        client=clients.app_clients.redis,
+        window=HistoryWindow(**kwargs),
+        compactor=compactor,
+    )
+
+
+def get_response_cache() -> ResponseCache:
+    """
+    Get the chat response cache on the shared redis client
+    """
+    return ResponseCache(
+        clients.app_clients.redis,
+        ttl=settings.response_cache_ttl,
+        max_entries=settings.response_cache_max_entries,
+    )
+
+
+def get_answer_cache() -> ports.AnswerCache:
+    """
+    Get the shared semantic answer cache
+    """
+    return clients.app_clients.answer_cache
@@ -1,3 +1,4 @@
+from .answer_cache import AnswerCache
 from .vector_store import VectorStore
 
-__all__ = ("VectorStore",)
+__all__ = ("AnswerCache", "VectorStore")
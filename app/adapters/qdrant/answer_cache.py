@@ -0,0 +1,159 @@
+import logging
+import time
+import uuid
+
+import qdrant_client
+from langchain_core.embeddings import embeddings
+from qdrant_client.http import models as rest
+
+from app import ports
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# seconds between deletions of expired entries by a worker
+PRUNE_INTERVAL = 60 * 60
+
+
+class AnswerCache(ports.AnswerCache):
+    """
+    Qdrant implementation of the semantic answer cache.
+
+    Questions are stored in a dedicated collection with their answer,
+    entries older than `settings.semantic_cache_ttl` are ignored and
+    periodically deleted when new answers are added.
+    """
+
+    def __init__(
+        self,
+        embedding: embeddings.Embeddings,
+        async_client: qdrant_client.AsyncQdrantClient,
+    ) -> None:
+        self._embedding = embedding
+        self._async_client = async_client
+        self._collection_name = settings.qdrant_answer_cache_collection
+        self._collection_exists = False
+        self._indexed = False
+        self._pruned_at: float | None = None
+
+    async def embed(self, question: str) -> list[float]:
+        return await self._embedding.aembed_query(question)
+
+    async def lookup(
+        self, namespace: str, vector: list[float], threshold: float
+    ) -> str | None:
+        if not await self._has_collection():
+            return None
+
+        points = await self._async_client.search(
+            collection_name=self._collection_name,
+            query_vector=vector,
+            query_filter=rest.Filter(
+                must=[
+                    rest.FieldCondition(
+                        key="namespace", match=rest.MatchValue(value=namespace)
+                    ),
+                    rest.FieldCondition(
+                        key="created_at",
+                        range=rest.Range(gte=time.time() - settings.semantic_cache_ttl),
+                    ),
+                ]
+            ),
+            limit=1,
+            score_threshold=threshold,
+            with_payload=["answer"],
+        )
+        if not points or not points[0].payload:
+            return None
+
+        logger.debug("Semantic cache match with score %s", points[0].score)
+        return str(points[0].payload["answer"])
+
+    async def add(
+        self, namespace: str, question: str, vector: list[float], answer: str
+    ) -> None:
+        if not await self._has_collection():
+            await self._create_collection(vector_size=len(vector))
+        if not self._indexed:
+            await self._create_payload_indexes()
+
+        await self._async_client.upsert(
+            collection_name=self._collection_name,
+            points=[
+                rest.PointStruct(
+                    id=str(uuid.uuid4()),
+                    vector=vector,
+                    payload={
+                        "namespace": namespace,
+                        "question": question,
+                        "answer": answer,
+                        "created_at": time.time(),
+                    },
+                )
+            ],
+        )
+        now = time.monotonic()
+        if self._pruned_at is None or now - self._pruned_at >= PRUNE_INTERVAL:
+            self._pruned_at = now
+            await self._prune()
+
+    async def _prune(self) -> None:
+        """
+        Delete entries past the ttl, served by the `created_at` payload index
+        """
+        try:
+            await self._async_client.delete(
+                collection_name=self._collection_name,
+                points_selector=rest.FilterSelector(
+                    filter=rest.Filter(
+                        must=[
+                            rest.FieldCondition(
+                                key="created_at",
+                                range=rest.Range(
+                                    lt=time.time() - settings.semantic_cache_ttl
+                                ),
+                            )
+                        ]
+                    )
+                ),
+                wait=False,
+            )
+        except Exception:  # pylint: disable=broad-exception-caught
+            logger.exception("Failed to prune the semantic answer cache")
+
+    async def _has_collection(self) -> bool:
+        if not self._collection_exists:
+            self._collection_exists = await self._async_client.collection_exists(
+                self._collection_name
+            )
+        return self._collection_exists
+
+    async def _create_collection(self, vector_size: int) -> None:
+        logger.info("Creating collection %s", self._collection_name)
+        try:
+            await self._async_client.create_collection(
+                collection_name=self._collection_name,
+                vectors_config=rest.VectorParams(
+                    size=vector_size, distance=rest.Distance.COSINE
+                ),
+            )
+        except Exception:  # pylint: disable=broad-exception-caught
+            # another worker may have created it meanwhile
+            if not await self._async_client.collection_exists(self._collection_name):
+                raise
+        self._collection_exists = True
+
+    async def _create_payload_indexes(self) -> None:
+        # creating an existing index is a no-op, collections created before
+        # the `created_at` index get it on their first write
+        await self._async_client.create_payload_index(
+            collection_name=self._collection_name,
+            field_name="namespace",
+            field_schema=rest.PayloadSchemaType.KEYWORD,
+        )
+        await self._async_client.create_payload_index(
+            collection_name=self._collection_name,
+            field_name="created_at",
+            field_schema=rest.PayloadSchemaType.FLOAT,
+        )
+        self._indexed = True
@@ -0,0 +1,80 @@
+"""
+CPU-bound parsing and splitting of documents.
+
+Functions returning a `Split` are run in an executor, possibly a process
+pool, so they only take and return picklable values.
+"""
+
+import functools
+import hashlib
+import json
+import typing
+
+import boto3
+from langchain_community import document_loaders
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+
+
+class Split(typing.NamedTuple):
+    """
+    Chunks of the documents loaded by a single task
+    """
+
+    documents: int
+    chunks: list[Document]
+
+
+def split_documents(docs: list[Document], namespace: str) -> Split:
+    """
+    Split documents into chunks tagged with the namespace and content hash
+    """
+    for doc in docs:
+        doc.metadata["namespace"] = namespace
+    chunks = _get_splitter().split_documents(docs)
+    for chunk in chunks:
+        chunk.metadata["content_hash"] = content_hash(chunk)
+    return Split(documents=len(docs), chunks=chunks)
+
+
+def load_s3_file(
+    bucket: str, key: str, namespace: str, s3_options: dict[str, typing.Any]
+) -> Split:
+    """
+    Download and parse an uploaded file, then split it
+    """
+    loader = document_loaders.S3FileLoader(bucket, key, **s3_options)
+    return split_documents(loader.load(), namespace)
+
+
+def list_s3_keys(
+    bucket: str, prefix: str, s3_options: dict[str, typing.Any]
+) -> list[str]:
+    """
+    List the keys of the files in an S3 directory
+    """
+    s3 = boto3.resource("s3", **s3_options)
+    return [
+        obj.key
+        for obj in s3.Bucket(bucket).objects.filter(Prefix=prefix)
+        # Skip directories
+        if not (obj.size == 0 and obj.key.endswith("/"))
+    ]
+
+
+def content_hash(doc: Document) -> str:
+    """
+    Hash of the chunk content and metadata identifying its point
+    """
+    content = json.dumps([doc.page_content, doc.metadata], sort_keys=True, default=str)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+@functools.cache
+def _get_splitter() -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP
+    )
@@ -1,4 +1,11 @@
+import asyncio
+import collections
+import concurrent.futures
+import dataclasses
+import functools
 import logging
+import typing
+import uuid
 
 import qdrant_client
 from langchain_community import document_loaders
@@ -6,31 +13,87 @@ from langchain_core.documents import Document
 from langchain_core.embeddings import embeddings
 from langchain_core.vectorstores import VectorStoreRetriever
 from langchain_qdrant import Qdrant
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from qdrant_client.http import models as rest
 
 from app import models, ports, typings
 from app.config import settings
 
+from . import loaders
+
 logger = logging.getLogger(__name__)
 
+# number of point ids fetched per scroll request
+SCROLL_PAGE_SIZE = 1000
+# documents split ahead of the indexing, per splitting process
+SPLIT_TASKS_PER_PROCESS = 2
+
+
+@dataclasses.dataclass
+class _IndexRun:
+    """
+    State of a single indexing run of a namespace
+    """
+
+    namespace: str
+    collection_exists: bool
+    on_progress: ports.ProgressCallback | None = None
+    progress: ports.IndexProgress = dataclasses.field(
+        default_factory=ports.IndexProgress
+    )
+    # content hashes of indexed points found in the documents
+    found: set[str] = dataclasses.field(default_factory=set)
+    _report_lock: asyncio.Lock = dataclasses.field(default_factory=asyncio.Lock)
+    collection_lock: asyncio.Lock = dataclasses.field(default_factory=asyncio.Lock)
+
+    async def report(self) -> None:
+        """Report the current progress, one report at a time"""
+        if self.on_progress is not None:
+            async with self._report_lock:
+                await self.on_progress(self.progress)
+
+
+@dataclasses.dataclass(frozen=True)
+class _Source:
+    """
+    Bot fields read while indexing, copied before the first progress report.
+    Reports may commit the session of the bot, expiring its loaded instances.
+    """
+
+    namespace: str
+    data_source: typings.BotDataSource | None
+    documents: typing.AsyncIterable[models.BotDocument]
+
+    @classmethod
+    def from_bot(
+        cls, bot: models.Bot, documents: typing.AsyncIterable[models.BotDocument]
+    ) -> "_Source":
+        """Copy the fields of a bot, its documents are streamed"""
+        return cls(
+            namespace=str(bot.id), data_source=bot.data_source, documents=documents
+        )
+
 
 class VectorStore(ports.VectorStore):
     """
     Qdrant implementation Vector Store class
     """
 
-    def __init__(self, embedding: embeddings.Embeddings) -> None:
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        embedding: embeddings.Embeddings,
+        client: qdrant_client.QdrantClient,
+        async_client: qdrant_client.AsyncQdrantClient,
+        executor: concurrent.futures.Executor | None = None,
+        index_embedding: embeddings.Embeddings | None = None,
+    ) -> None:
         self._embedding = embedding
-        self._text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000, chunk_overlap=200
-        )
+        # embeds the indexed chunks, e.g. rate limited, `embedding` when not set
+        self._index_embedding = index_embedding or embedding
+        # runs the parsing and splitting, the default thread pool when not set
+        self._executor = executor
 
-        self._sync_client = qdrant_client.QdrantClient(
-            url=settings.qdrant_url, api_key=settings.qdrant_api_key, prefer_grpc=True
-        )
-        self._async_client = qdrant_client.AsyncQdrantClient(
-            url=settings.qdrant_url, api_key=settings.qdrant_api_key, prefer_grpc=True
-        )
+        self._sync_client = client
+        self._async_client = async_client
         self._store = Qdrant(
             client=self._sync_client,
             collection_name=settings.qdrant_collection,
@@ -39,50 +102,413 @@ class VectorStore(ports.VectorStore):
         )
 
     @classmethod
-    async def _load_documents(cls, bot: models.Bot) -> list[Document]:
-        if bot.data_source == typings.BotDataSource.web:
-            web_loader = document_loaders.WebBaseLoader(
-                web_paths=[d.content for d in bot.documents],
-            )
-            docs = web_loader.aload()
-        elif bot.data_source == typings.BotDataSource.uploads:
-            s3_loader = document_loaders.S3DirectoryLoader(
-                bucket=settings.s3_uploads_bucket_name,
-                prefix=str(bot.id),
-                region_name=settings.aws_default_region,
-                aws_access_key_id=settings.aws_access_key_id,
-                aws_secret_access_key=settings.aws_secret_access_key,
-                endpoint_url=settings.aws_endpoint_url,
+    async def _split_tasks(
+        cls, source: _Source
+    ) -> typing.AsyncIterator[typing.Callable[[], loaders.Split]]:
+        """
+        Stream the tasks loading and splitting the source documents,
+        one task per document or uploaded file
+        """
+        namespace = source.namespace
+        if source.data_source == typings.BotDataSource.web:
+            async for bot_doc in source.documents:
+                web_loader = document_loaders.WebBaseLoader(web_paths=[bot_doc.content])
+                async for doc in web_loader.alazy_load():
+                    yield functools.partial(loaders.split_documents, [doc], namespace)
+        elif source.data_source == typings.BotDataSource.uploads:
+            s3_options = {
+                "region_name": settings.aws_default_region,
+                "aws_access_key_id": settings.aws_access_key_id,
+                "aws_secret_access_key": settings.aws_secret_access_key,
+                "endpoint_url": settings.aws_endpoint_url,
+            }
+            bucket = settings.s3_uploads_bucket_name
+            keys = await asyncio.to_thread(
+                loaders.list_s3_keys, bucket, namespace, s3_options
             )
-            docs = await s3_loader.aload()
+            for key in keys:
+                yield functools.partial(
+                    loaders.load_s3_file, bucket, key, namespace, s3_options
+                )
+        else:
+            async for bot_doc in source.documents:
+                doc = Document(
+                    page_content=bot_doc.content, metadata=dict(bot_doc.doc_metadata)
+                )
+                yield functools.partial(loaders.split_documents, [doc], namespace)
+
+    async def _iter_chunks(
+        self, run: _IndexRun, source: _Source
+    ) -> typing.AsyncIterator[Document]:
+        """
+        Load and split the documents in the executor, yielding the chunks in
+        the documents order. A few tasks per process run ahead of the chunks
+        consumed, keeping the processes busy with a bounded memory use.
+        """
+        loop = asyncio.get_running_loop()
+        window_size = max(settings.index_processes, 1) * SPLIT_TASKS_PER_PROCESS
+        window: collections.deque[asyncio.Future[loaders.Split]] = collections.deque()
+        try:
+            async for task in self._split_tasks(source):
+                window.append(loop.run_in_executor(self._executor, task))
+                if len(window) < window_size:
+                    continue
+                for chunk in _collect(run, await window.popleft()):
+                    yield chunk
+            while window:
+                for chunk in _collect(run, await window.popleft()):
+                    yield chunk
+        finally:
+            for future in window:
+                future.cancel()
+
+    async def index(
+        self,
+        bot: models.Bot,
+        documents: typing.AsyncIterable[models.BotDocument],
+        rebuild: bool = False,
+        on_progress: ports.ProgressCallback | None = None,
+    ) -> None:
+        """
+        Index the bot documents in its namespace of the shared collection.
+
+        Documents are streamed from their source, split, embedded and upserted
+        in batches, at most `settings.index_max_pending_batches` batches are
+        held in memory at once.
+        Chunks are tracked by content hash, so by default only new or changed
+        chunks are embedded and chunks no longer in the documents are deleted.
+        A rebuild embeds every chunk into a staging namespace and swaps it in
+        once complete, the previous vectors keep serving until then.
+        """
+        source = _Source.from_bot(bot, documents)
+        logger.info("Creating index for %s", bot)
+        collection_exists = await self._async_client.collection_exists(
+            settings.qdrant_collection
+        )
+        run = _IndexRun(
+            namespace=source.namespace,
+            collection_exists=collection_exists,
+            on_progress=on_progress,
+        )
+        points = await self._get_points(run.namespace) if collection_exists else []
+
+        if rebuild:
+            await self._rebuild(run, source, points)
         else:
-            docs = [
-                Document(page_content=d.content, metadata=d.doc_metadata)
-                for d in bot.documents
-            ]
+            await self._update(run, source, points)
 
-        for doc in docs:
-            doc.metadata.update({"namespace": str(bot.id)})
-        return docs
+        if not run.collection_exists:
+            logger.info("No documents to index for bot %s", source.namespace)
+        await run.report()
 
-    async def index(self, bot: models.Bot) -> None:
-        documents = await self._load_documents(bot)
-        logger.info("Creating index for %s using documents: %s", bot, documents)
+    async def _update(
+        self, run: _IndexRun, source: _Source, points: list[tuple[str, str]]
+    ) -> None:
+        """
+        Embed the new chunks of the namespace and delete the stale ones
+        """
+        existing: dict[str, str] = {}
+        stale_ids: list[str] = []
+        for content_hash, point_id in points:
+            if content_hash in existing:
+                stale_ids.append(point_id)
+            else:
+                existing[content_hash] = point_id
 
-        splits = self._text_splitter.split_documents(documents)
+        # add before deleting, so the bot keeps answering while indexing
+        added = await self._add(
+            run, run.namespace, self._iter_chunks(run, source), existing=existing
+        )
+        stale_ids.extend(
+            point_id
+            for content_hash, point_id in existing.items()
+            if content_hash not in run.found
+        )
+        await self._delete(run, stale_ids)
+        logger.info(
+            "Document indexing successful, %s chunks added, %s unchanged, %s deleted",
+            added,
+            len(run.found),
+            len(stale_ids),
+        )
 
-        await Qdrant.afrom_documents(
-            documents=splits,
-            embedding=self._embedding,
+    async def _rebuild(
+        self, run: _IndexRun, source: _Source, points: list[tuple[str, str]]
+    ) -> None:
+        """
+        Blue/green rebuild of the namespace through a staging namespace
+        """
+        staging_namespace = f"{run.namespace}:staging-{uuid.uuid4().hex}"
+        old_ids = [point_id for _, point_id in points]
+
+        try:
+            added = await self._add(
+                run, staging_namespace, self._iter_chunks(run, source)
+            )
+        except Exception:
+            if run.collection_exists:
+                await self._async_client.delete(
+                    collection_name=settings.qdrant_collection,
+                    points_selector=rest.FilterSelector(
+                        filter=_namespace_filter(staging_namespace)
+                    ),
+                )
+            raise
+
+        if not run.collection_exists:
+            return None
+
+        # the new points serve alongside the old ones until those are deleted
+        await self._async_client.set_payload(
             collection_name=settings.qdrant_collection,
-            url=settings.qdrant_url,
-            api_key=settings.qdrant_api_key,
-            prefer_grpc=True,
-            force_recreate=settings.qdrant_recreate_collection,
+            payload={"namespace": run.namespace},
+            key="metadata",
+            points=rest.FilterSelector(filter=_namespace_filter(staging_namespace)),
         )
-        logger.info("Document indexing successful")
+        await self._delete(run, old_ids)
+        logger.info(
+            "Document index rebuilt, %s chunks added, %s deleted",
+            added,
+            len(old_ids),
+        )
+
+    async def _add(
+        self,
+        run: _IndexRun,
+        namespace: str,
+        chunks: typing.AsyncIterator[Document],
+        existing: typing.Container[str] = (),
+    ) -> int:
+        """
+        Embed and upsert the chunks not `existing` yet in batches,
+        returns the number of chunks added.
+
+        Up to `settings.index_concurrency` batches are embedded at once and
+        each batch is upserted while the next ones embed. Reading chunks waits
+        while `settings.index_max_pending_batches` batches are in flight,
+        bounding the memory used whatever the size of the documents.
+        """
+        embedding = asyncio.Semaphore(settings.index_concurrency)
+        pending = asyncio.Semaphore(settings.index_max_pending_batches)
+        tasks: set[asyncio.Task[None]] = set()
+
+        async def add_batch(batch: list[Document]) -> None:
+            try:
+                async with embedding:
+                    vectors = await self._index_embedding.aembed_documents(
+                        [doc.page_content for doc in batch]
+                    )
+                run.progress.chunks_embedded += len(batch)
+                await self._ensure_collection(run, len(vectors[0]))
+                await self._upsert(namespace, batch, vectors)
+                run.progress.chunks_upserted += len(batch)
+                await run.report()
+            finally:
+                pending.release()
+
+        added = 0
+        try:
+            async for batch in self._batches(run, chunks, existing):
+                await pending.acquire()
+                # raise the failure of a finished batch before reading further
+                for task in [task for task in tasks if task.done()]:
+                    tasks.discard(task)
+                    task.result()
+                tasks.add(asyncio.create_task(add_batch(batch)))
+                added += len(batch)
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        return added
+
+    @classmethod
+    async def _batches(
+        cls,
+        run: _IndexRun,
+        chunks: typing.AsyncIterator[Document],
+        existing: typing.Container[str],
+    ) -> typing.AsyncIterator[list[Document]]:
+        # chunks are keyed by hash, duplicates map to the same point anyway
+        batch: dict[str, Document] = {}
+        async for chunk in chunks:
+            content_hash = chunk.metadata["content_hash"]
+            if content_hash in existing:
+                run.found.add(content_hash)
+                continue
+
+            batch[content_hash] = chunk
+            if len(batch) >= settings.index_batch_size:
+                yield list(batch.values())
+                batch = {}
+        if batch:
+            yield list(batch.values())
+
+    async def _upsert(
+        self, namespace: str, docs: list[Document], vectors: list[list[float]]
+    ) -> None:
+        points = []
+        for doc, vector in zip(docs, vectors):
+            doc.metadata["namespace"] = namespace
+            point_key = f"{namespace}:{doc.metadata['content_hash']}"
+            points.append(
+                rest.PointStruct(
+                    id=str(uuid.uuid5(uuid.NAMESPACE_OID, point_key)),
+                    vector=vector,
+                    # the payload layout read by the langchain retriever
+                    payload={
+                        "page_content": doc.page_content,
+                        "metadata": doc.metadata,
+                    },
+                )
+            )
+
+        await self._async_client.upsert(
+            collection_name=settings.qdrant_collection, points=points
+        )
+
+    async def _delete(self, run: _IndexRun, point_ids: list[str]) -> None:
+        if point_ids:
+            await self._async_client.delete(
+                collection_name=settings.qdrant_collection,
+                points_selector=rest.PointIdsList(points=list(point_ids)),
+            )
+            run.progress.chunks_deleted += len(point_ids)
+            await run.report()
+
+    async def _get_points(self, namespace: str) -> list[tuple[str, str]]:
+        """
+        Get the content hash and id of all points indexed for the namespace.
+        Points indexed without a content hash use their id, so they are replaced.
+        """
+        points: list[tuple[str, str]] = []
+        offset: rest.ExtendedPointId | None = None
+        while True:
+            records, offset = await self._async_client.scroll(
+                collection_name=settings.qdrant_collection,
+                scroll_filter=_namespace_filter(namespace),
+                limit=SCROLL_PAGE_SIZE,
+                offset=offset,
+                with_payload=["metadata.content_hash"],
+                with_vectors=False,
+            )
+            for record in records:
+                metadata = (record.payload or {}).get("metadata") or {}
+                point_id = str(record.id)
+                points.append((metadata.get("content_hash", point_id), point_id))
+            if offset is None:
+                return points
+
+    async def bootstrap(self) -> None:
+        collection_name = settings.qdrant_collection
+        if await self._async_client.collection_exists(collection_name):
+            logger.info("Updating collection %s", collection_name)
+            await self._async_client.update_collection(
+                collection_name=collection_name,
+                vectors_config={
+                    "": rest.VectorParamsDiff(on_disk=settings.qdrant_on_disk_vectors)
+                },
+                hnsw_config=_hnsw_config(),
+                quantization_config=_quantization_config() or rest.Disabled.DISABLED,
+            )
+        else:
+            vector_size = settings.qdrant_vector_size or len(
+                await self._embedding.aembed_query("vector size")
+            )
+            await self._create_collection(vector_size)
+
+        await self._create_payload_index()
+
+    async def _ensure_collection(self, run: _IndexRun, vector_size: int) -> None:
+        """
+        Create the collection using the shared client if it does not exist yet
+        """
+        async with run.collection_lock:
+            if run.collection_exists:
+                return None
+            await self._create_collection(vector_size)
+            await self._create_payload_index()
+            run.collection_exists = True
+
+    async def _create_collection(self, vector_size: int) -> None:
+        logger.info("Creating collection %s", settings.qdrant_collection)
+        try:
+            await self._async_client.create_collection(
+                collection_name=settings.qdrant_collection,
+                vectors_config=rest.VectorParams(
+                    size=vector_size,
+                    distance=rest.Distance.COSINE,
+                    on_disk=settings.qdrant_on_disk_vectors,
+                ),
+                hnsw_config=_hnsw_config(),
+                quantization_config=_quantization_config(),
+            )
+        except Exception:  # pylint: disable=broad-exception-caught
+            # another worker may have created it meanwhile
+            if not await self._async_client.collection_exists(
+                settings.qdrant_collection
+            ):
+                raise
+
+    async def _create_payload_index(self) -> None:
+        """
+        Index the namespace every retrieval filters on
+        """
+        try:
+            await self._async_client.create_payload_index(
+                collection_name=settings.qdrant_collection,
+                field_name="metadata.namespace",
+                field_schema=rest.PayloadSchemaType.KEYWORD,
+            )
+        except Exception:  # pylint: disable=broad-exception-caught
+            # another worker may have created it meanwhile
+            collection = await self._async_client.get_collection(
+                settings.qdrant_collection
+            )
+            if "metadata.namespace" not in collection.payload_schema:
+                raise
 
     def get_retriever(self, namespace: str) -> VectorStoreRetriever:
-        return self._store.as_retriever(
-            search_kwargs={"filter": {"namespace": namespace}}
+        search_kwargs: dict[str, typing.Any] = {"filter": {"namespace": namespace}}
+        if settings.qdrant_quantization:
+            # search the quantized vectors, rescoring the top results
+            search_kwargs["search_params"] = rest.SearchParams(
+                quantization=rest.QuantizationSearchParams(
+                    rescore=True,
+                    oversampling=settings.qdrant_quantization_oversampling,
+                )
+            )
+        return self._store.as_retriever(search_kwargs=search_kwargs)
+
+
+def _collect(run: _IndexRun, split: loaders.Split) -> list[Document]:
+    run.progress.documents_loaded += split.documents
+    run.progress.chunks_total += len(split.chunks)
+    return split.chunks
+
+
+def _namespace_filter(namespace: str) -> rest.Filter:
+    return rest.Filter(
+        must=[
+            rest.FieldCondition(
+                key="metadata.namespace", match=rest.MatchValue(value=namespace)
+            )
+        ]
+    )
+
+
+def _hnsw_config() -> rest.HnswConfigDiff:
+    return rest.HnswConfigDiff(
+        m=settings.qdrant_hnsw_m, ef_construct=settings.qdrant_hnsw_ef_construct
+    )
+
+
+def _quantization_config() -> rest.ScalarQuantization | None:
+    if not settings.qdrant_quantization:
+        return None
+    return rest.ScalarQuantization(
+        scalar=rest.ScalarQuantizationConfig(
+            type=rest.ScalarType.INT8, quantile=0.99, always_ram=True
         )
+    )
@@ -0,0 +1,14 @@
+from .bot_config_cache import BotConfigCache
+from .embeddings import CachedEmbeddings
+from .job_queue import JobQueue
+from .lock import LockManager
+from .rate_limiter import RateLimitedEmbeddings, RateLimiter
+
+__all__ = (
+    "BotConfigCache",
+    "CachedEmbeddings",
+    "JobQueue",
+    "LockManager",
+    "RateLimitedEmbeddings",
+    "RateLimiter",
+)
@@ -0,0 +1,248 @@
+import asyncio
+import collections
+import dataclasses
+import datetime
+import enum
+import json
+import logging
+import time
+import typing
+import uuid
+
+from redis import asyncio as aioredis
+
+from app import metrics, models, ports
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "bot_config_invalidations"
+# seconds to wait before subscribing again after losing the connection
+RESUBSCRIBE_DELAY = 1.0
+
+local_hits = metrics.registry.counter(
+    "bot_config_cache_local_hits_total",
+    "Number of bot configurations served from the in-process cache",
+)
+redis_hits = metrics.registry.counter(
+    "bot_config_cache_redis_hits_total",
+    "Number of bot configurations served from the redis cache",
+)
+cache_misses = metrics.registry.counter(
+    "bot_config_cache_misses_total",
+    "Number of bot configurations loaded from the database",
+)
+local_hit_age = metrics.registry.counter(
+    "bot_config_cache_local_hit_age_seconds_total",
+    "Summed age of the bot configurations served from the in-process cache",
+)
+invalidations_received = metrics.registry.counter(
+    "bot_config_cache_invalidations_received_total",
+    "Number of bot configuration invalidations received by the process",
+)
+invalidation_lag = metrics.registry.counter(
+    "bot_config_cache_invalidation_lag_seconds_total",
+    "Summed delay between publishing and receiving invalidations",
+)
+
+
+@dataclasses.dataclass(frozen=True)
+class _Entry:
+    version: int
+    cached_at: float
+    data: dict[str, typing.Any]
+
+
+class BotConfigCache(  # pylint: disable=too-many-instance-attributes
+    ports.BotConfigCache
+):
+    """
+    Two-tier cache of bot configurations, an in-process LRU in front of
+    entries shared by all processes in Redis.
+
+    Each bot has a version in Redis incremented on invalidation, entries
+    cached with an older version are ignored, so a request which loaded the
+    configuration before an update cannot cache it again afterwards.
+    Invalidations are published to every process, in-process entries also
+    expire after `local_ttl` seconds in case a message is missed.
+    """
+
+    def __init__(
+        self,
+        client: aioredis.Redis,
+        max_size: int,
+        ttl: int,
+        local_ttl: int,
+    ) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.local_ttl = local_ttl
+        self._client = client
+        self._local: collections.OrderedDict[uuid.UUID, _Entry] = (
+            collections.OrderedDict()
+        )
+        # latest version announced per bot, older entries are not cached
+        self._min_versions: dict[uuid.UUID, int] = {}
+        self._listener: asyncio.Task[None] | None = None
+        self._subscribed = False
+
+    async def get_or_load(
+        self, bot_id: uuid.UUID, load: typing.Callable[[], typing.Awaitable[models.Bot]]
+    ) -> models.Bot:
+        self._start_listener()
+        entry = self._get_local(bot_id)
+        if entry is not None:
+            local_hits.inc()
+            local_hit_age.inc(time.time() - entry.cached_at)
+            return _load_bot(entry.data)
+
+        data, version = await typing.cast(
+            typing.Awaitable[list[bytes | None]],
+            self._client.mget(_key(bot_id), _version_key(bot_id)),
+        )
+        current_version = int(version or 0)
+        if data is not None:
+            cached = json.loads(data)
+            if cached["version"] == current_version:
+                redis_hits.inc()
+                self._set_local(bot_id, _Entry(**cached))
+                return _load_bot(cached["data"])
+
+        cache_misses.inc()
+        bot = await load()
+        entry = _Entry(
+            version=current_version, cached_at=time.time(), data=_dump_bot(bot)
+        )
+        await self._client.set(
+            _key(bot_id), json.dumps(dataclasses.asdict(entry)), ex=self.ttl
+        )
+        self._set_local(bot_id, entry)
+        return bot
+
+    async def invalidate(self, bot_id: uuid.UUID) -> None:
+        async with self._client.pipeline(transaction=True) as pipe:
+            pipe.incr(_version_key(bot_id))
+            pipe.expire(_version_key(bot_id), self.ttl)
+            pipe.delete(_key(bot_id))
+            version, *_ = await pipe.execute()
+
+        self._evict(bot_id, version)
+        message = {"bot_id": str(bot_id), "version": version, "sent_at": time.time()}
+        await self._client.publish(INVALIDATION_CHANNEL, json.dumps(message))
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+        self._listener = None
+
+    def _get_local(self, bot_id: uuid.UUID) -> _Entry | None:
+        entry = self._local.get(bot_id)
+        if entry is None:
+            return None
+        if time.time() - entry.cached_at > self.local_ttl:
+            del self._local[bot_id]
+            return None
+
+        self._local.move_to_end(bot_id)
+        return entry
+
+    def _set_local(self, bot_id: uuid.UUID, entry: _Entry) -> None:
+        # without the subscription, invalidations of the entry could be missed
+        if not self._subscribed or entry.version < self._min_versions.get(bot_id, 0):
+            return
+
+        self._min_versions.pop(bot_id, None)
+        self._local[bot_id] = entry
+        self._local.move_to_end(bot_id)
+        while len(self._local) > self.max_size:
+            self._local.popitem(last=False)
+
+    def _evict(self, bot_id: uuid.UUID, version: int) -> None:
+        self._local.pop(bot_id, None)
+        self._min_versions[bot_id] = max(version, self._min_versions.get(bot_id, 0))
+        while len(self._min_versions) > self.max_size:
+            del self._min_versions[next(iter(self._min_versions))]
+
+    def _on_invalidation(self, data: bytes) -> None:
+        message = json.loads(data)
+        invalidations_received.inc()
+        invalidation_lag.inc(max(time.time() - message["sent_at"], 0))
+        self._evict(uuid.UUID(message["bot_id"]), message["version"])
+
+    def _start_listener(self) -> None:
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def _listen(self) -> None:
+        """
+        Evict the in-process entries invalidated by any process
+        """
+        while True:
+            try:
+                async with self._client.pubsub() as pubsub:
+                    await pubsub.subscribe(INVALIDATION_CHANNEL)
+                    self._subscribed = True
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self._on_invalidation(message["data"])
+            except Exception:  # pylint: disable=broad-exception-caught
+                logger.exception("Bot config invalidations subscription failed")
+            finally:
+                # invalidations may be missed until subscribed again
+                self._subscribed = False
+                self._local.clear()
+            await asyncio.sleep(RESUBSCRIBE_DELAY)
+
+
+def _key(bot_id: uuid.UUID) -> str:
+    return f"bot_config:{bot_id}"
+
+
+def _version_key(bot_id: uuid.UUID) -> str:
+    return f"bot_config_version:{bot_id}"
+
+
+def _dump_bot(bot: models.Bot) -> dict[str, typing.Any]:
+    return {
+        **_dump_model(bot),
+        "contexts": [_dump_model(context) for context in bot.contexts],
+    }
+
+
+def _load_bot(data: dict[str, typing.Any]) -> models.Bot:
+    bot = _load_model(models.Bot, data)
+    bot.contexts = [
+        _load_model(models.BotContext, context) for context in data["contexts"]
+    ]
+    return bot
+
+
+_Model = typing.TypeVar("_Model", models.Bot, models.BotContext)
+
+
+def _dump_model(instance: models.Bot | models.BotContext) -> dict[str, typing.Any]:
+    data = {}
+    for column in instance.__table__.columns:
+        value = getattr(instance, column.key)
+        if isinstance(value, (datetime.datetime, uuid.UUID)):
+            value = str(value)
+        elif isinstance(value, enum.Enum):
+            value = value.value
+        data[column.key] = value
+    return data
+
+
+def _load_model(model: type[_Model], data: dict[str, typing.Any]) -> _Model:
+    values = {}
+    for column in model.__table__.columns:
+        value = data.get(column.key)
+        python_type = column.type.python_type
+        if value is not None and python_type is datetime.datetime:
+            value = datetime.datetime.fromisoformat(value)
+        elif value is not None and issubclass(python_type, (uuid.UUID, enum.Enum)):
+            value = python_type(value)
+        values[column.key] = value
+    return model(**values)
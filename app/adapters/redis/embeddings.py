@@ -0,0 +1,131 @@
+import hashlib
+import logging
+import struct
+import time
+import typing
+
+from langchain_core.embeddings import Embeddings
+from redis import asyncio as aioredis
+
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+EmbeddingDType = typing.Literal["float32", "float16"]
+
+_struct_formats: dict[EmbeddingDType, str] = {"float32": "f", "float16": "e"}
+
+# pops the least recently used entries past the limit and deletes their vectors
+# in one atomic step, so concurrent writers cannot leave orphaned vectors
+_EVICT_SCRIPT = """
+local overflow = redis.call("ZCARD", KEYS[1]) - tonumber(ARGV[1])
+if overflow <= 0 then
+    return 0
+end
+local evicted = redis.call("ZPOPMIN", KEYS[1], overflow)
+for i = 1, #evicted, 2 do
+    redis.call("DEL", evicted[i])
+end
+return #evicted / 2
+"""
+
+cache_hits = metrics.registry.counter(
+    "embedding_cache_hits_total", "Number of texts embedded from the embedding cache"
+)
+cache_misses = metrics.registry.counter(
+    "embedding_cache_misses_total", "Number of texts sent to the embedding model"
+)
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings cached in Redis by model and text hash, so identical texts
+    are embedded once across bots and re-indexes.
+
+    Vectors are stored as packed float32 or float16 values. At most
+    `max_entries` vectors are kept, evicting the least recently used ones.
+    Only the async API is cached, the sync API calls the model directly.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        client: aioredis.Redis,
+        max_entries: int,
+        dtype: EmbeddingDType = "float32",
+    ) -> None:
+        self.embeddings = embeddings
+        self.max_entries = max_entries
+        self.dtype = dtype
+        self._client = client
+        model = getattr(embeddings, "model", type(embeddings).__name__)
+        self._key_prefix = f"embedding_cache:{model}:{dtype}:"
+        self._index_key = f"embedding_cache_index:{model}:{dtype}"
+        self._evict = client.register_script(_EVICT_SCRIPT)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+
+        keys = [self._key(text) for text in texts]
+        cached = await typing.cast(
+            typing.Awaitable[list[bytes | None]], self._client.mget(keys)
+        )
+        vectors: dict[str, list[float]] = {
+            key: self._decode(value)
+            for key, value in zip(keys, cached)
+            if value is not None
+        }
+
+        missing = {key: text for key, text in zip(keys, texts) if key not in vectors}
+        cache_hits.inc(len(texts) - len(missing))
+        cache_misses.inc(len(missing))
+        if missing:
+            embedded = await self.embeddings.aembed_documents(list(missing.values()))
+            vectors.update(zip(missing, embedded))
+
+        await self._store(vectors, new_keys=list(missing))
+        return [vectors[key] for key in keys]
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return (await self.aembed_documents([text]))[0]
+
+    def _key(self, text: str) -> str:
+        return self._key_prefix + hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    async def _store(
+        self, vectors: dict[str, list[float]], new_keys: list[str]
+    ) -> None:
+        """
+        Store new vectors and mark all the used ones as recently used,
+        evicting the least recently used past `max_entries`
+        """
+        now = time.time()
+        async with self._client.pipeline(transaction=False) as pipe:
+            if new_keys:
+                pipe.mset({key: self._encode(vectors[key]) for key in new_keys})
+            pipe.zadd(self._index_key, dict.fromkeys(vectors, now))
+            pipe.zcard(self._index_key)
+            results = await pipe.execute()
+
+        overflow = results[-1] - self.max_entries
+        if overflow <= 0:
+            return None
+
+        evicted = await self._evict(keys=[self._index_key], args=[self.max_entries])
+        if evicted:
+            logger.debug("Evicted %s cached embeddings", evicted)
+
+    def _encode(self, vector: list[float]) -> bytes:
+        return struct.pack(f"<{len(vector)}{_struct_formats[self.dtype]}", *vector)
+
+    def _decode(self, value: bytes) -> list[float]:
+        fmt = _struct_formats[self.dtype]
+        count = len(value) // struct.calcsize(fmt)
+        return list(struct.unpack(f"<{count}{fmt}", value))
@@ -0,0 +1,162 @@
+import dataclasses
+import json
+import logging
+import time
+import typing
+import uuid
+
+from redis import asyncio as aioredis
+
+from app import ports
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# seconds a failed job is kept for inspection
+DEAD_JOB_TTL = 60 * 60 * 24 * 7
+# ids of the most recent dead jobs kept in the dead-letter list
+DEAD_JOBS_MAX = 1000
+
+
+class JobQueue(ports.JobQueue):
+    """
+    Redis implementation of a reliable job queue.
+
+    Reserving atomically moves a job id from the pending to the processing
+    list and records its visibility deadline in a sorted set. Jobs still
+    processing past their deadline, e.g. after a worker crash, are moved back
+    to the pending list by `requeue_expired`. Failed jobs are retried with
+    an exponential backoff until `settings.job_max_attempts`, then listed as
+    dead, keeping the last `DEAD_JOBS_MAX` ids and their data for `DEAD_JOB_TTL`.
+    """
+
+    def __init__(self, client: aioredis.Redis, name: str = "jobs") -> None:
+        self._client = client
+        self._pending_key = f"{name}:pending"
+        self._processing_key = f"{name}:processing"
+        self._deadlines_key = f"{name}:deadlines"
+        self._dead_key = f"{name}:dead"
+        self._job_key_prefix = f"{name}:job:"
+
+    async def enqueue(self, name: str, payload: dict[str, typing.Any]) -> ports.Job:
+        job = ports.Job(id=str(uuid.uuid4()), name=name, payload=payload)
+        async with self._client.pipeline(transaction=True) as pipe:
+            pipe.set(self._job_key(job.id), _dumps(job))
+            pipe.lpush(self._pending_key, job.id)
+            await pipe.execute()
+
+        logger.info("Enqueued job %s: %s", job.id, job.name)
+        return job
+
+    async def reserve(self, timeout: float) -> ports.Job | None:
+        job_id = await typing.cast(
+            typing.Awaitable[bytes | None],
+            self._client.blmove(
+                self._pending_key,
+                self._processing_key,
+                timeout,  # type: ignore[arg-type]
+                "RIGHT",
+                "LEFT",
+            ),
+        )
+        if job_id is None:
+            return None
+
+        async with self._client.pipeline(transaction=False) as pipe:
+            pipe.zadd(self._deadlines_key, {job_id: _deadline()})
+            pipe.get(self._job_key(job_id.decode()))
+            _, data = await pipe.execute()
+
+        if data is None:
+            logger.warning("Dropping job %s without data", job_id)
+            await self._remove(job_id.decode())
+            return None
+
+        job = ports.Job(**json.loads(data))
+        job.attempts += 1
+        await self._client.set(self._job_key(job.id), _dumps(job))
+        return job
+
+    async def extend(self, job: ports.Job) -> None:
+        await self._client.zadd(self._deadlines_key, {job.id: _deadline()}, xx=True)
+
+    async def ack(self, job: ports.Job) -> None:
+        await self._remove(job.id)
+
+    async def fail(self, job: ports.Job, error: str) -> bool:
+        job.error = error
+        if job.attempts >= settings.job_max_attempts:
+            async with self._client.pipeline(transaction=True) as pipe:
+                pipe.lrem(self._processing_key, 1, job.id)
+                pipe.zrem(self._deadlines_key, job.id)
+                pipe.set(self._job_key(job.id), _dumps(job), ex=DEAD_JOB_TTL)
+                pipe.lpush(self._dead_key, job.id)
+                pipe.ltrim(self._dead_key, 0, DEAD_JOBS_MAX - 1)
+                await pipe.execute()
+            return False
+
+        # keep the job processing until the backoff expires, then it is requeued
+        backoff = settings.job_retry_backoff * 2 ** (job.attempts - 1)
+        async with self._client.pipeline(transaction=True) as pipe:
+            pipe.set(self._job_key(job.id), _dumps(job))
+            pipe.zadd(self._deadlines_key, {job.id: time.time() + backoff})
+            await pipe.execute()
+        return True
+
+    async def requeue_expired(self) -> int:
+        # ids are returned as bytes, typed as str for the commands they are passed to
+        job_ids = await typing.cast(
+            typing.Awaitable[list[str]],
+            self._client.lrange(self._processing_key, 0, -1),
+        )
+        if not job_ids:
+            return 0
+
+        deadlines = await typing.cast(
+            typing.Awaitable[list[float | None]],
+            self._client.zmscore(self._deadlines_key, job_ids),
+        )
+        now = time.time()
+        count = 0
+        for job_id, deadline in zip(job_ids, deadlines):
+            if deadline is None:
+                # reserved by a worker which has not set the deadline yet
+                await self._client.zadd(
+                    self._deadlines_key, {job_id: _deadline()}, nx=True
+                )
+                continue
+            if deadline > now:
+                continue
+
+            # only the worker removing the job from processing requeues it
+            if await typing.cast(
+                typing.Awaitable[int],
+                self._client.lrem(self._processing_key, 1, job_id),
+            ):
+                async with self._client.pipeline(transaction=True) as pipe:
+                    pipe.zrem(self._deadlines_key, job_id)
+                    pipe.rpush(self._pending_key, job_id)
+                    await pipe.execute()
+                count += 1
+
+        if count:
+            logger.info("Requeued %s expired jobs", count)
+        return count
+
+    def _job_key(self, job_id: str) -> str:
+        return self._job_key_prefix + job_id
+
+    async def _remove(self, job_id: str) -> None:
+        async with self._client.pipeline(transaction=True) as pipe:
+            pipe.lrem(self._processing_key, 1, job_id)
+            pipe.zrem(self._deadlines_key, job_id)
+            pipe.delete(self._job_key(job_id))
+            await pipe.execute()
+
+
+def _deadline() -> float:
+    return time.time() + settings.job_visibility_timeout
+
+
+def _dumps(job: ports.Job) -> str:
+    return json.dumps(dataclasses.asdict(job))
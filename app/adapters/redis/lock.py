@@ -0,0 +1,52 @@
+import asyncio
+import contextlib
+import logging
+import typing
+
+from redis import asyncio as aioredis
+from redis import exceptions as redis_exceptions
+
+from app import ports
+
+logger = logging.getLogger(__name__)
+
+
+class LockManager(ports.LockManager):
+    """
+    Redis implementation of distributed locks.
+
+    A held lock expires after `timeout` seconds and is refreshed in the
+    background, so the lock of a crashed process is released while long
+    running holders keep it.
+    """
+
+    def __init__(self, client: aioredis.Redis, timeout: float) -> None:
+        self.timeout = timeout
+        self._client = client
+
+    @contextlib.asynccontextmanager
+    async def hold(  # pylint: disable=invalid-overridden-method
+        self, name: str
+    ) -> typing.AsyncIterator[None]:
+        lock = self._client.lock(
+            f"lock:{name}", timeout=self.timeout, thread_local=False
+        )
+        await lock.acquire()
+        refresh = asyncio.create_task(self._refresh(lock))
+        try:
+            yield
+        finally:
+            refresh.cancel()
+            try:
+                await lock.release()
+            except redis_exceptions.LockError:
+                logger.warning("Lock %s expired before it was released", name)
+
+    async def _refresh(self, lock: aioredis.lock.Lock) -> None:
+        while True:
+            await asyncio.sleep(self.timeout / 3)
+            try:
+                await lock.reacquire()
+            except redis_exceptions.LockError:
+                logger.warning("Lost lock %s", lock.name)
+                return
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import typing
+
+from langchain_core.embeddings import Embeddings
+from redis import asyncio as aioredis
+
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+rate_limit_waits = metrics.registry.counter(
+    "rate_limit_waits_total", "Number of calls delayed by the client-side rate limiter"
+)
+
+# Refills the request and token buckets for the time elapsed since the last
+# call and takes the cost of the call, a bucket with a zero capacity is
+# unlimited. Returns the seconds to wait before retrying, the buckets are left
+# untouched when the call has to wait.
+_ACQUIRE_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'ts', 'requests', 'tokens')
+local elapsed = math.max(now - (tonumber(state[1]) or now), 0)
+local wait = 0
+local levels = {}
+for i = 1, 2 do
+    local capacity = tonumber(ARGV[i * 2 - 1])
+    local cost = math.min(tonumber(ARGV[i * 2]), capacity)
+    local level = tonumber(state[i + 1]) or capacity
+    level = math.min(capacity, level + elapsed * capacity / 60)
+    if capacity > 0 and level < cost then
+        wait = math.max(wait, (cost - level) * 60 / capacity)
+    end
+    levels[i] = level - cost
+end
+if wait > 0 then
+    return tostring(wait)
+end
+redis.call('HSET', KEYS[1], 'ts', now, 'requests', levels[1], 'tokens', levels[2])
+redis.call('EXPIRE', KEYS[1], 120)
+return '0'
+"""
+
+# rough number of characters per token of English text
+CHARS_PER_TOKEN = 4
+
+
+class RateLimiter:
+    """
+    Token bucket limiting the requests and tokens sent per minute to an API,
+    shared by all processes through Redis.
+
+    Both buckets refill continuously up to their per minute capacity, so
+    bursts are allowed up to the capacity and the sustained rate stays below
+    it. A limit of 0 disables the bucket.
+    """
+
+    def __init__(
+        self,
+        client: aioredis.Redis,
+        name: str,
+        requests_per_minute: int,
+        tokens_per_minute: int,
+    ) -> None:
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._key = f"rate_limit:{name}"
+        self._script = client.register_script(_ACQUIRE_SCRIPT)
+
+    async def acquire(self, tokens: int) -> None:
+        """
+        Wait until a request using `tokens` tokens fits in both buckets
+        """
+        while True:
+            wait = await self._script(
+                keys=[self._key],
+                args=[self.requests_per_minute, 1, self.tokens_per_minute, tokens],
+            )
+            if float(wait) <= 0:
+                return None
+
+            rate_limit_waits.inc()
+            logger.debug("Rate limited %s, waiting %ss", self._key, wait)
+            await asyncio.sleep(float(wait))
+
+
+class RateLimitedEmbeddings(Embeddings):
+    """
+    Embeddings sending one request per call through a rate limiter.
+    Tokens are estimated from the text length, only the async API is limited.
+    """
+
+    def __init__(self, embeddings: Embeddings, rate_limiter: RateLimiter) -> None:
+        self.embeddings = embeddings
+        self.rate_limiter = rate_limiter
+        # the wrapped model, so caches in front of this one share its entries
+        self.model = getattr(embeddings, "model", type(embeddings).__name__)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+
+        await self.rate_limiter.acquire(_estimate_tokens(texts))
+        return await self.embeddings.aembed_documents(texts)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        await self.rate_limiter.acquire(_estimate_tokens([text]))
+        return await self.embeddings.aembed_query(text)
+
+
+def _estimate_tokens(texts: typing.Iterable[str]) -> int:
+    return sum(len(text) // CHARS_PER_TOKEN + 1 for text in texts)
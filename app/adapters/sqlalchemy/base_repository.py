@@ -1,9 +1,12 @@
 import typing
 
+import sqlalchemy as sa
 from fastapi import HTTPException
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+T = typing.TypeVar("T")
+
 
 class BaseRepository:
     """
@@ -24,3 +27,24 @@ class BaseRepository:
             await self._session.refresh(model)
         except IntegrityError as exc:
             raise HTTPException(status_code=409, detail="Database conflicts") from exc
+
+    async def _insert_many(
+        self, model_cls: type[T], rows: typing.Sequence[dict[str, typing.Any]]
+    ) -> list[T]:
+        """
+        Insert rows with multi-row INSERT ... RETURNING statements and commit,
+        returning the inserted models detached from the session
+        """
+        stmt = sa.insert(model_cls).returning(model_cls)
+        try:
+            db_execute = await self._session.scalars(stmt, rows)
+            models = list(db_execute.all())
+            # keep the returned values readable once the commit expires the session
+            for model in models:
+                self._session.expunge(model)
+            await self._session.commit()
+        except IntegrityError as exc:
+            await self._session.rollback()
+            raise HTTPException(status_code=409, detail="Database conflicts") from exc
+
+        return models
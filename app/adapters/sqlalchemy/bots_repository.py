@@ -1,10 +1,14 @@
+import datetime
+import functools
 import typing
 import uuid
 
 import sqlalchemy as sa
 from sqlalchemy import orm
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app import exceptions, models, ports
+from app import exceptions, models, ports, typings
+from app.config import settings
 
 from .base_repository import BaseRepository
 
@@ -12,14 +16,27 @@ from .base_repository import BaseRepository
 class BotRepository(ports.BotRepository, BaseRepository):
     """
     SQLAlchemy implementation of bots repository.
+    Bot configurations read for chatting go through `config_cache` when set,
+    saving or deleting a bot invalidates its entry.
     """
 
+    def __init__(
+        self, session: AsyncSession, config_cache: ports.BotConfigCache | None = None
+    ) -> None:
+        super().__init__(session)
+        self._config_cache = config_cache
+
     async def save(self, bot: models.Bot) -> models.Bot:
         await self._save(bot)
+        if self._config_cache is not None:
+            await self._config_cache.invalidate(bot.id)
         return bot
 
     async def delete(self, bot: models.Bot) -> None:
+        bot_id = bot.id
         await self._delete(bot)
+        if self._config_cache is not None:
+            await self._config_cache.invalidate(bot_id)
 
     async def get_all(self) -> list[models.Bot]:
         stmt = sa.select(models.Bot).options(orm.selectinload(models.Bot.contexts))
@@ -28,23 +45,78 @@ class BotRepository(ports.BotRepository, BaseRepository):
 
         return typing.cast(list[models.Bot], results)
 
-    async def get_by_id(self, pk: uuid.UUID) -> models.Bot:
+    async def get_page(
+        self,
+        limit: int,
+        after: tuple[datetime.datetime, uuid.UUID] | None = None,
+        fields: typing.Collection[str] | None = None,
+    ) -> list[models.Bot]:
+        table = models.Bot.__table__
+        # served by the (created_at, id) index, the cost does not grow with offsets
+        stmt = (
+            sa.select(models.Bot).order_by(table.c.created_at, table.c.id).limit(limit)
+        )
+        if after is not None:
+            created_at, pk = after
+            stmt = stmt.where(
+                sa.tuple_(table.c.created_at, table.c.id)
+                > sa.tuple_(
+                    sa.literal(created_at, table.c.created_at.type),
+                    sa.literal(pk, table.c.id.type),
+                )
+            )
+        if fields is None or "contexts" in fields:
+            stmt = stmt.options(orm.selectinload(models.Bot.contexts))
+        if fields is not None:
+            columns = [
+                getattr(models.Bot, c.key)
+                for c in table.c
+                if c.key in fields or c.key == "created_at"
+            ]
+            stmt = stmt.options(orm.load_only(*columns))
+        db_execute = await self._session.execute(stmt)
+        results = db_execute.scalars().all()
+
+        return typing.cast(list[models.Bot], results)
+
+    async def get_by_id(self, pk: uuid.UUID, documents: bool = True) -> models.Bot:
         table = models.Bot.__table__
         stmt = (
             sa.select(models.Bot)
             .where(table.c.id == pk)
-            .options(
-                orm.selectinload(models.Bot.contexts),
-                orm.selectinload(models.Bot.documents),
-            )
+            .options(orm.selectinload(models.Bot.contexts))
             .execution_options(populate_existing=True)
         )
+        if documents:
+            stmt = stmt.options(orm.selectinload(models.Bot.documents))
         db_execute = await self._session.execute(stmt)
         if not (instance := db_execute.scalars().unique().one_or_none()):
             raise exceptions.DoesNotExist("Bot does not exist")
 
         return instance
 
+    async def get_config_by_id(self, pk: uuid.UUID) -> models.Bot:
+        if self._config_cache is not None:
+            return await self._config_cache.get_or_load(
+                pk, functools.partial(self._get_config_by_id, pk)
+            )
+        return await self._get_config_by_id(pk)
+
+    async def _get_config_by_id(self, pk: uuid.UUID) -> models.Bot:
+        table = models.Bot.__table__
+        # documents are not loaded, chatting only needs the bot row and contexts
+        stmt = (
+            sa.select(models.Bot)
+            .where(table.c.id == pk)
+            .options(orm.selectinload(models.Bot.contexts))
+            .execution_options(populate_existing=True)
+        )
+        db_execute = await self._session.execute(stmt)
+        if not (instance := db_execute.scalars().one_or_none()):
+            raise exceptions.DoesNotExist("Bot does not exist")
+
+        return instance
+
     async def get_for_update(self, pk: uuid.UUID) -> models.Bot:
         table = models.Bot.__table__
         stmt = (
@@ -61,3 +133,91 @@ class BotRepository(ports.BotRepository, BaseRepository):
             raise exceptions.DoesNotExist("Bot does not exist")
 
         return instance
+
+    async def exists(self, pk: uuid.UUID) -> bool:
+        table = models.Bot.__table__
+        stmt = sa.select(table.c.id).where(table.c.id == pk)
+        return await self._session.scalar(stmt) is not None
+
+    async def lock(self, pk: uuid.UUID) -> None:
+        table = models.Bot.__table__
+        stmt = sa.select(table.c.id).where(table.c.id == pk).with_for_update()
+        if await self._session.scalar(stmt) is None:
+            raise exceptions.DoesNotExist("Bot does not exist")
+
+    async def add_documents(
+        self,
+        bot_id: uuid.UUID,
+        documents: typing.Sequence[models.BotDocument],
+        check_bot: bool = True,
+    ) -> list[models.BotDocument]:
+        if check_bot and not await self.exists(bot_id):
+            raise exceptions.DoesNotExist("Bot does not exist")
+        if not documents:
+            return []
+
+        rows = [
+            {
+                "id": doc.id or uuid.uuid4(),
+                "bot_id": bot_id,
+                "content": doc.content,
+                "doc_metadata": doc.doc_metadata or {},
+                "filename": doc.filename,
+                "content_type": doc.content_type,
+            }
+            for doc in documents
+        ]
+        return await self._insert_many(models.BotDocument, rows)
+
+    async def iter_documents(  # pylint: disable=invalid-overridden-method
+        self, bot_id: uuid.UUID
+    ) -> typing.AsyncIterator[models.BotDocument]:
+        table = models.BotDocument.__table__
+        stmt = (
+            sa.select(models.BotDocument)
+            .where(table.c.bot_id == bot_id)
+            .order_by(table.c.created_at, table.c.id)
+            .execution_options(yield_per=settings.index_documents_page_size)
+        )
+        # a server side cursor, rows are fetched a page at a time
+        async for doc in await self._session.stream_scalars(stmt):
+            yield doc
+
+    async def save_index_job(self, job: models.BotIndexJob) -> models.BotIndexJob:
+        await self._save(job)
+        return job
+
+    async def get_index_job(
+        self, bot_id: uuid.UUID, pk: uuid.UUID
+    ) -> models.BotIndexJob:
+        table = models.BotIndexJob.__table__
+        stmt = (
+            sa.select(models.BotIndexJob)
+            .where(table.c.id == pk, table.c.bot_id == bot_id)
+            .execution_options(populate_existing=True)
+        )
+        db_execute = await self._session.execute(stmt)
+        if not (instance := db_execute.scalars().one_or_none()):
+            raise exceptions.DoesNotExist("Index job does not exist")
+
+        return instance
+
+    async def get_active_index_jobs(
+        self, bot_id: uuid.UUID
+    ) -> list[models.BotIndexJob]:
+        table = models.BotIndexJob.__table__
+        stmt = (
+            sa.select(models.BotIndexJob)
+            .where(
+                table.c.bot_id == bot_id,
+                table.c.state.in_(
+                    [typings.IndexJobState.queued, typings.IndexJobState.running]
+                ),
+            )
+            .order_by(table.c.created_at)
+            .execution_options(populate_existing=True)
+        )
+        db_execute = await self._session.execute(stmt)
+        results = db_execute.scalars().all()
+
+        return typing.cast(list[models.BotIndexJob], results)
@@ -1,6 +1,8 @@
 from .agent import BotAgentRepository, ChatBotAgent
+from .lock import LockManager
 
 __all__ = (
     "BotAgentRepository",
     "ChatBotAgent",
+    "LockManager",
 )
@@ -33,6 +33,12 @@ class ChatBotAgent(ports.ChatBotAgent):
         self._history[(str(self._bot.id), session_id)].append(message)
         yield from self._results.splitlines()
 
+    async def astream(  # pylint: disable=invalid-overridden-method
+        self, session_id: str, message: str
+    ) -> typing.AsyncGenerator[str, None]:
+        for chunk in self.stream(session_id, message):
+            yield chunk
+
 
 class BotAgentRepository(ports.BotAgentRepository):
     """
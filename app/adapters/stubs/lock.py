@@ -0,0 +1,24 @@
+import asyncio
+import collections
+import contextlib
+import typing
+
+from app import ports
+
+
+class LockManager(ports.LockManager):
+    """
+    Stub lock manager, locks are only shared within the process
+    """
+
+    def __init__(self) -> None:
+        self.locks: collections.defaultdict[str, asyncio.Lock] = (
+            collections.defaultdict(asyncio.Lock)
+        )
+
+    @contextlib.asynccontextmanager
+    async def hold(  # pylint: disable=invalid-overridden-method
+        self, name: str
+    ) -> typing.AsyncIterator[None]:
+        async with self.locks[name]:
+            yield
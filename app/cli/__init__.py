@@ -1,8 +1,12 @@
 import typer
 
 from .fixtures import app as fixture_app
+from .vector_store import app as vector_store_app
+from .worker import worker
 
 
 def setup_commands(app: typer.Typer) -> None:
     """Setup app commands"""
     app.add_typer(fixture_app, name="fixtures")
+    app.add_typer(vector_store_app, name="vector-store")
+    app.command("worker", help="Run the background job worker")(worker)
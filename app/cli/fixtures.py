@@ -23,8 +23,7 @@ async def _load_bots(session: AsyncSession) -> None:
         bots_data = json.load(fp)
 
     bots_repo = sqlalchemy.BotRepository(session)
-    embedding = deps.get_embeddings()
-    vector_store = deps.get_vector_store(embedding)
+    vector_store = deps.get_vector_store()
 
     logging.info("Loading %s bots into the database.", len(bots_data))
 
@@ -55,8 +54,8 @@ async def _load_bots(session: AsyncSession) -> None:
             continue
 
         # index bots with documents
-        bot_db = await bots_repo.get_by_id(bot.id)
-        await vector_store.index(bot_db)
+        bot_db = await bots_repo.get_by_id(bot.id, documents=False)
+        await vector_store.index(bot_db, bots_repo.iter_documents(bot.id))
 
 
 async def _create_test_user(session: AsyncSession) -> None:
@@ -0,0 +1,29 @@
+import asyncio
+import logging
+
+import typer
+
+from app import clients
+
+app = typer.Typer()
+
+logger = logging.getLogger(__name__)
+
+
+async def main() -> None:
+    """
+    Main entry point to provision the vector store
+    """
+    try:
+        await clients.app_clients.vector_store.bootstrap()
+    finally:
+        await clients.app_clients.close()
+
+
+@app.command("bootstrap", help="Create or update the vector store collection")
+def bootstrap() -> None:
+    """
+    Command to provision the vector store collection
+    """
+    asyncio.run(main())
+    logger.info("Vector store bootstrap successful")
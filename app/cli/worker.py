@@ -0,0 +1,45 @@
+import asyncio
+import logging
+import signal
+
+import typer
+
+from app import clients, db, tasks
+from app.config import settings
+from app.worker import Worker
+
+logger = logging.getLogger(__name__)
+
+
+async def main(concurrency: int) -> None:
+    """
+    Main entry point to run the job worker until SIGINT or SIGTERM
+    """
+    # restart the clients set up by manage.py with the splitting processes,
+    # the web workers do not index so they go without them
+    await clients.app_clients.close()
+    clients.app_clients.init(settings, process_pool=True)
+    job_worker = Worker(
+        clients.app_clients.job_queue, tasks=tasks.tasks, concurrency=concurrency
+    )
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, job_worker.stop)
+
+    try:
+        await job_worker.run()
+    finally:
+        await clients.app_clients.close()
+        await db.async_db.close()
+
+
+def worker(
+    concurrency: int = typer.Option(
+        settings.worker_concurrency, help="Number of jobs run concurrently"
+    )
+) -> None:
+    """
+    Command to run the background job worker
+    """
+    asyncio.run(main(concurrency))
+    logger.info("Worker stopped")
@@ -0,0 +1,216 @@
+"""
+Process-wide clients shared by all requests.
+"""
+
+import concurrent.futures
+import logging
+import multiprocessing
+
+import httpx
+import qdrant_client
+from langchain_core.embeddings import embeddings
+from langchain_openai import OpenAIEmbeddings
+from redis import asyncio as aioredis
+
+from app import config, ports
+from app.adapters import qdrant, redis
+
+logger = logging.getLogger(__name__)
+
+
+class AppClients:  # pylint: disable=too-many-instance-attributes
+    """
+    Manages the lifecycle of long-lived external clients (LLM embeddings,
+    vector store, answer cache, redis, the job queue and locks) so connections
+    are pooled instead of created per request.
+    """
+
+    def __init__(self) -> None:
+        self._http_client: httpx.Client | None = None
+        self._http_async_client: httpx.AsyncClient | None = None
+        self._qdrant_client: qdrant_client.QdrantClient | None = None
+        self._async_qdrant_client: qdrant_client.AsyncQdrantClient | None = None
+        self._embeddings: embeddings.Embeddings | None = None
+        self._vector_store: ports.VectorStore | None = None
+        self._answer_cache: ports.AnswerCache | None = None
+        self._redis: aioredis.Redis | None = None
+        self._job_queue: ports.JobQueue | None = None
+        self._lock_manager: ports.LockManager | None = None
+        self._bot_config_cache: ports.BotConfigCache | None = None
+        self._process_pool: concurrent.futures.ProcessPoolExecutor | None = None
+
+    def init(self, cfg: config.Settings, process_pool: bool = False) -> None:
+        """
+        Initialize shared clients, with the processes splitting documents
+        when `process_pool` is set, only the job worker indexes documents
+        """
+        self._http_client = httpx.Client()
+        self._http_async_client = httpx.AsyncClient()
+        self._qdrant_client = qdrant_client.QdrantClient(
+            url=cfg.qdrant_url, api_key=cfg.qdrant_api_key, prefer_grpc=True
+        )
+        self._async_qdrant_client = qdrant_client.AsyncQdrantClient(
+            url=cfg.qdrant_url, api_key=cfg.qdrant_api_key, prefer_grpc=True
+        )
+        redis_client = aioredis.Redis.from_url(
+            cfg.redis_url, max_connections=cfg.redis_max_connections
+        )
+        self._redis = redis_client
+        self._job_queue = redis.JobQueue(redis_client)
+        self._lock_manager = redis.LockManager(redis_client, timeout=cfg.lock_timeout)
+        if cfg.bot_config_cache_size > 0:
+            self._bot_config_cache = redis.BotConfigCache(
+                redis_client,
+                max_size=cfg.bot_config_cache_size,
+                ttl=cfg.bot_config_cache_ttl,
+                local_ttl=cfg.bot_config_cache_local_ttl,
+            )
+        self._embeddings = OpenAIEmbeddings(
+            openai_api_key=cfg.openai_api_key,  # type: ignore[call-arg]
+            http_client=self._http_client,
+            http_async_client=self._http_async_client,
+        )
+        # only indexing is rate limited, so a large job never delays chat queries
+        index_embeddings: embeddings.Embeddings = self._embeddings
+        if cfg.embedding_requests_per_minute or cfg.embedding_tokens_per_minute:
+            index_embeddings = redis.RateLimitedEmbeddings(
+                index_embeddings,
+                redis.RateLimiter(
+                    redis_client,
+                    name="embeddings",
+                    requests_per_minute=cfg.embedding_requests_per_minute,
+                    tokens_per_minute=cfg.embedding_tokens_per_minute,
+                ),
+            )
+        if cfg.embedding_cache_max_entries > 0:
+            # both caches store the same model entries in redis
+            self._embeddings = redis.CachedEmbeddings(
+                self._embeddings,
+                client=redis_client,
+                max_entries=cfg.embedding_cache_max_entries,
+                dtype=cfg.embedding_cache_dtype,
+            )
+            index_embeddings = redis.CachedEmbeddings(
+                index_embeddings,
+                client=redis_client,
+                max_entries=cfg.embedding_cache_max_entries,
+                dtype=cfg.embedding_cache_dtype,
+            )
+        if process_pool and cfg.index_processes > 0:
+            # spawned, forking would copy the threads of the grpc clients
+            self._process_pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=cfg.index_processes,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        self._vector_store = qdrant.VectorStore(
+            embedding=self._embeddings,
+            index_embedding=index_embeddings,
+            client=self._qdrant_client,
+            async_client=self._async_qdrant_client,
+            executor=self._process_pool,
+        )
+        self._answer_cache = qdrant.AnswerCache(
+            embedding=self._embeddings, async_client=self._async_qdrant_client
+        )
+
+    @property
+    def embeddings(self) -> embeddings.Embeddings:
+        """
+        Get shared LLM embeddings instance
+        """
+        if self._embeddings is None:
+            raise RuntimeError("AppClients is not initialized")
+        return self._embeddings
+
+    @property
+    def vector_store(self) -> ports.VectorStore:
+        """
+        Get shared vector store instance
+        """
+        if self._vector_store is None:
+            raise RuntimeError("AppClients is not initialized")
+        return self._vector_store
+
+    @property
+    def answer_cache(self) -> ports.AnswerCache:
+        """
+        Get shared semantic answer cache instance
+        """
+        if self._answer_cache is None:
+            raise RuntimeError("AppClients is not initialized")
+        return self._answer_cache
+
+    @property
+    def redis(self) -> aioredis.Redis:
+        """
+        Get shared asyncio redis client
+        """
+        if self._redis is None:
+            raise RuntimeError("AppClients is not initialized")
+        return self._redis
+
+    @property
+    def job_queue(self) -> ports.JobQueue:
+        """
+        Get shared background job queue
+        """
+        if self._job_queue is None:
+            raise RuntimeError("AppClients is not initialized")
+        return self._job_queue
+
+    @property
+    def lock_manager(self) -> ports.LockManager:
+        """
+        Get shared distributed lock manager
+        """
+        if self._lock_manager is None:
+            raise RuntimeError("AppClients is not initialized")
+        return self._lock_manager
+
+    @property
+    def bot_config_cache(self) -> ports.BotConfigCache | None:
+        """
+        Get shared bot configuration cache, None when disabled
+        """
+        if self._redis is None:
+            raise RuntimeError("AppClients is not initialized")
+        return self._bot_config_cache
+
+    async def close(self) -> None:
+        """
+        Close shared clients and release their connections
+        """
+        if self._vector_store is None:
+            logger.warning("AppClients is not initialized")
+            return None
+
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+        if self._bot_config_cache is not None:
+            await self._bot_config_cache.close()
+        if self._redis is not None:
+            await self._redis.aclose()
+        if self._async_qdrant_client is not None:
+            await self._async_qdrant_client.close()
+        if self._qdrant_client is not None:
+            self._qdrant_client.close()
+        if self._http_async_client is not None:
+            await self._http_async_client.aclose()
+        if self._http_client is not None:
+            self._http_client.close()
+
+        self._http_client = None
+        self._http_async_client = None
+        self._qdrant_client = None
+        self._async_qdrant_client = None
+        self._embeddings = None
+        self._vector_store = None
+        self._answer_cache = None
+        self._redis = None
+        self._job_queue = None
+        self._lock_manager = None
+        self._process_pool = None
+        self._bot_config_cache = None
+
+
+app_clients: AppClients = AppClients()
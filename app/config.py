@@ -37,13 +37,78 @@ class Settings(BaseSettings):
     # openai config
     openai_api_key: str | None = None
     openai_model: str = "gpt-4o"
+    # when RAG bots rewrite follow-up questions before retrieval:
+    # always, only when they reference the conversation, or speculatively
+    rag_rewrite_policy: typing.Literal["always", "references", "speculative"] = "always"
+    # model rewriting follow-up questions, the bot model when not set
+    rag_rewrite_model: str | None = None
+    # max number of initialized agents kept in memory per worker, 0 disables caching
+    agent_cache_size: int = 128
+    # compact chat sessions into a running summary past this many messages, 0 disables
+    history_summary_threshold: int = 0
+    history_summary_keep_messages: int = 10
+    history_summary_model: str = "gpt-4o-mini"
+    # seconds between client disconnect checks while waiting on the LLM
+    disconnect_poll_interval: float = 0.5
+    # response cache of bots with `response_cache` enabled, max entries are per bot
+    response_cache_ttl: int = 60 * 60  # seconds
+    response_cache_max_entries: int = 1000
+    semantic_cache_ttl: int = 60 * 60 * 24  # seconds
+
+    # bots returned per page of the bots list, and the max `limit` accepted
+    bots_page_size: int = 50
+    bots_max_page_size: int = 500
+    # documents written per transaction by the NDJSON import, and the max line size
+    document_import_batch_size: int = 500
+    document_import_max_line_size: int = 10 * 1024 * 1024  # bytes
+
+    # background jobs, consumed by `manage.py worker`
+    worker_concurrency: int = 2
+    job_visibility_timeout: int = 300  # seconds
+    job_max_attempts: int = 3
+    job_retry_backoff: int = 10  # seconds, doubled on each attempt
+    lock_timeout: int = 30  # seconds, held locks are refreshed before expiring
+    # index jobs still queued after this long are considered lost by the queue
+    index_job_queued_timeout: int = 60 * 60  # seconds
 
     redis_url: str = "redis://localhost:6379/0"
+    redis_max_connections: int = 50
+    # bot configurations cached for chat requests per process, 0 disables the cache
+    bot_config_cache_size: int = 1000
+    bot_config_cache_ttl: int = 3600  # seconds, entries shared in redis
+    # seconds entries are kept per process, bounds staleness of missed invalidations
+    bot_config_cache_local_ttl: int = 60
+    # max number of embeddings cached in redis, 0 disables the cache,
+    # a 1536 dimensions float32 vector takes about 6 KB
+    embedding_cache_max_entries: int = 0
+    embedding_cache_dtype: typing.Literal["float32", "float16"] = "float32"
+    # client-side limits shared by all workers, 0 disables the limit
+    embedding_requests_per_minute: int = 3_000
+    embedding_tokens_per_minute: int = 1_000_000
+    # chunks embedded per request, and requests in flight while indexing a bot
+    index_batch_size: int = 64
+    index_concurrency: int = 4
+    # batches held in memory while indexing, bounds the worker memory use
+    index_max_pending_batches: int = 8
+    # documents fetched from the database per round trip while indexing
+    index_documents_page_size: int = 100
+    # processes of the job worker parsing and splitting documents,
+    # 0 uses the default thread pool
+    index_processes: int = 2
     # Qdrant vectorstore config
     qdrant_url: str = "http://localhost:6333"
     qdrant_api_key: str | None = None
     qdrant_collection: str = "documents"
-    qdrant_recreate_collection: bool = False
+    qdrant_answer_cache_collection: str = "answer_cache"
+    # documents collection provisioning, applied by `manage.py vector-store bootstrap`
+    qdrant_bootstrap_on_startup: bool = False
+    qdrant_vector_size: int | None = None  # probed from the embeddings when not set
+    qdrant_hnsw_m: int = 16
+    qdrant_hnsw_ef_construct: int = 100
+    qdrant_on_disk_vectors: bool = False
+    # int8 scalar quantization, searches rescore the oversampled top results
+    qdrant_quantization: bool = False
+    qdrant_quantization_oversampling: float = 2.0
     # aws
     aws_default_region: str = "us-east-1"
     aws_access_key_id: str | None = None
@@ -4,11 +4,10 @@ from fastapi import Depends
 from fastapi.security import OAuth2PasswordBearer
 from jwt import InvalidTokenError
 from langchain_core.embeddings import embeddings
-from langchain_openai import OpenAIEmbeddings
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app import db, exceptions, models, ports
-from app.adapters import agents, aws, qdrant, sqlalchemy
+from app import clients, db, exceptions, models, ports
+from app.adapters import agents, aws, sqlalchemy
 from app.config import settings
 from app.helpers import auth
 
@@ -24,9 +23,21 @@ async def get_db_session() -> typing.AsyncIterator[AsyncSession]:
 DBSession = typing.Annotated[AsyncSession, Depends(get_db_session)]
 
 
-async def get_bot_repo(session: DBSession) -> ports.BotRepository:
+def get_bot_config_cache() -> ports.BotConfigCache | None:
+    """Dependency to get the shared bot configuration cache, None when disabled"""
+    return clients.app_clients.bot_config_cache
+
+
+BotConfigCache = typing.Annotated[
+    ports.BotConfigCache | None, Depends(get_bot_config_cache)
+]
+
+
+async def get_bot_repo(
+    session: DBSession, config_cache: BotConfigCache
+) -> ports.BotRepository:
     """dependency to create new bot repository"""
-    return sqlalchemy.BotRepository(session)
+    return sqlalchemy.BotRepository(session, config_cache=config_cache)
 
 
 BotRepository = typing.Annotated[ports.BotRepository, Depends(get_bot_repo)]
@@ -76,9 +87,12 @@ async def get_current_user(
 CurrentUser = typing.Annotated[models.User, Depends(get_current_user)]
 
 
+_bot_agent_repo = agents.BotAgentRepository(cache_size=settings.agent_cache_size)
+
+
 async def get_bot_agent_repo() -> ports.BotAgentRepository:
-    """Dependency to create new chatbot agent repository"""
-    return agents.BotAgentRepository()
+    """Dependency to get the shared chatbot agent repository"""
+    return _bot_agent_repo
 
 
 BotAgentRepository = typing.Annotated[
@@ -87,21 +101,37 @@ BotAgentRepository = typing.Annotated[
 
 
 def get_embeddings() -> embeddings.Embeddings:
-    """Dependency to get LLM embeddings"""
-    return OpenAIEmbeddings(openai_api_key=settings.openai_api_key)  # type: ignore[call-arg]
+    """Dependency to get the shared LLM embeddings"""
+    return clients.app_clients.embeddings
 
 
 Embeddings = typing.Annotated[embeddings.Embeddings, Depends(get_embeddings)]
 
 
-def get_vector_store(embedding: Embeddings) -> ports.VectorStore:
-    """Dependency to create a new vector store"""
-    return qdrant.VectorStore(embedding=embedding)
+def get_vector_store() -> ports.VectorStore:
+    """Dependency to get the shared vector store"""
+    return clients.app_clients.vector_store
 
 
 VectorStore = typing.Annotated[ports.VectorStore, Depends(get_vector_store)]
 
 
+def get_job_queue() -> ports.JobQueue:
+    """Dependency to get the shared background job queue"""
+    return clients.app_clients.job_queue
+
+
+JobQueue = typing.Annotated[ports.JobQueue, Depends(get_job_queue)]
+
+
+def get_lock_manager() -> ports.LockManager:
+    """Dependency to get the shared distributed lock manager"""
+    return clients.app_clients.lock_manager
+
+
+LockManager = typing.Annotated[ports.LockManager, Depends(get_lock_manager)]
+
+
 def get_file_storage() -> ports.FileStorage:
     """Dependency to get file storage instance"""
     return aws.FileStorage(bucket_name=settings.s3_uploads_bucket_name)
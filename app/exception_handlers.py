@@ -1,4 +1,5 @@
 import logging
+import typing
 
 import fastapi
 from fastapi import status
@@ -22,7 +23,7 @@ async def default_exception_handler(
     status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
     headers = None
     message = "Internal server error"
-    details = None
+    details: typing.Any = None
     if isinstance(exc, fastapi.exceptions.HTTPException):
         status_code = exc.status_code
         headers = exc.headers
@@ -34,6 +35,14 @@ async def default_exception_handler(
         status_code = status.HTTP_400_BAD_REQUEST
         message = "Request validation errors"
         details = exc.errors()
+    elif isinstance(exc, exceptions.ClientDisconnected):
+        # non standard status code used by proxies for closed client requests
+        status_code = 499
+        message = str(exc)
+    elif isinstance(exc, exceptions.ImportInterrupted):
+        status_code = exc.status_code
+        message = str(exc)
+        details = exc.summary
     elif isinstance(exc, exceptions.AuthenticationError):
         status_code = status.HTTP_401_UNAUTHORIZED
         message = str(exc)
@@ -59,6 +68,8 @@ def override_exception_handlers(app: fastapi.FastAPI) -> None:
     @app.exception_handler(ValidationError)
     @app.exception_handler(exceptions.DoesNotExist)
     @app.exception_handler(exceptions.AuthenticationError)
+    @app.exception_handler(exceptions.ClientDisconnected)
+    @app.exception_handler(exceptions.ImportInterrupted)
     @app.exception_handler(HTTPException)
     async def http_exception_handler(
         request: fastapi.Request, exc: Exception | HTTPException
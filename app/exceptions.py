@@ -1,3 +1,6 @@
+import typing
+
+
 class DoesNotExist(RuntimeError):
     """
     Exception raised when query returns no record.
@@ -8,3 +11,29 @@ class AuthenticationError(RuntimeError):
     """
     Exception raised when user authentication fails.
     """
+
+
+class ClientDisconnected(RuntimeError):
+    """
+    Exception raised when the client disconnects before the response is ready.
+    """
+
+
+class LineTooLong(ValueError):
+    """
+    Exception raised when a line of a streamed body exceeds the size limit.
+    """
+
+
+class ImportInterrupted(RuntimeError):
+    """
+    Exception raised when an import fails after some of its batches were written,
+    `summary` describes the data written before the failure.
+    """
+
+    def __init__(
+        self, message: str, status_code: int, summary: dict[str, typing.Any]
+    ) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+        self.summary = summary
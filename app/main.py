@@ -5,7 +5,7 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 
-from app import db, logging_config
+from app import clients, db, logging_config
 from app.config import settings
 from app.exception_handlers import override_exception_handlers
 from app.middlewares import setup_middlewares
@@ -21,7 +21,11 @@ async def lifespan(_: FastAPI) -> typing.AsyncIterator[None]:
     To understand more, read https://fastapi.tiangolo.com/advanced/events/
     """
     db.async_db.init(settings)
+    clients.app_clients.init(settings)
+    if settings.qdrant_bootstrap_on_startup:
+        await clients.app_clients.vector_store.bootstrap()
     yield
+    await clients.app_clients.close()
     await db.async_db.close()
 
 
@@ -0,0 +1,56 @@
+"""
+Lightweight in-process metrics.
+Values are per worker process and reset on restart.
+"""
+
+import threading
+
+
+class Counter:
+    """
+    Monotonically increasing counter
+    """
+
+    def __init__(self, name: str, description: str) -> None:
+        self.name = name
+        self.description = description
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def value(self) -> float:
+        """Current counter value"""
+        return self._value
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Increment counter by the given amount"""
+        with self._lock:
+            self._value += amount
+
+
+class MetricsRegistry:
+    """
+    Registry holding all the counters of the process
+    """
+
+    def __init__(self) -> None:
+        self._counters: dict[str, Counter] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, description: str = "") -> Counter:
+        """
+        Get or create a counter with the given name
+        """
+        with self._lock:
+            if name not in self._counters:
+                self._counters[name] = Counter(name, description)
+            return self._counters[name]
+
+    def snapshot(self) -> dict[str, float]:
+        """
+        Returns the current value of all counters
+        """
+        return {name: c.value for name, c in sorted(self._counters.items())}
+
+
+registry: MetricsRegistry = MetricsRegistry()
@@ -1,18 +1,24 @@
 import logging
 import typing
 
+import anyio
 import fastapi
 import starlette.routing
 import structlog
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
+from starlette.datastructures import Headers
 from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.middleware.gzip import GZipResponder
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from app import exception_handlers
 from app.utils import AsyncElapsedTimer
 
 logger = logging.getLogger(__name__)
 
+DISCONNECTED_SCOPE_KEY = "app.disconnected"
+
 NextCall = typing.Callable[
     [fastapi.Request], typing.Awaitable[fastapi.responses.StreamingResponse]
 ]
@@ -94,6 +100,97 @@ async def catch_exceptions_middleware(
     return response
 
 
+class _StreamingGZipResponder(GZipResponder):
+    """
+    GZip responder that leaves server-sent events uncompressed,
+    otherwise compressed chunks are buffered and tokens are not flushed.
+    """
+
+    passthrough = False
+
+    async def send_with_gzip(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            content_type = Headers(raw=message["headers"]).get("content-type", "")
+            self.passthrough = content_type.startswith("text/event-stream")
+
+        if self.passthrough:
+            await self.send(message)
+        else:
+            await super().send_with_gzip(message)
+
+
+class StreamingGZipMiddleware(GZipMiddleware):
+    """
+    GZip middleware that does not compress server-sent events.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            headers = Headers(scope=scope)
+            if "gzip" in headers.get("Accept-Encoding", ""):
+                responder = _StreamingGZipResponder(
+                    self.app, self.minimum_size, compresslevel=self.compresslevel
+                )
+                await responder(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+class DisconnectWatcherMiddleware:
+    """
+    Middleware that watches the raw ASGI receive for `http.disconnect`
+    once the request body is read, `BaseHTTPMiddleware` wraps receive
+    so `Request.is_disconnected` never sees the disconnect downstream.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        disconnected = anyio.Event()
+        scope[DISCONNECTED_SCOPE_KEY] = disconnected
+        watching = False
+
+        async def watch() -> None:
+            while (await receive())["type"] != "http.disconnect":
+                pass
+            disconnected.set()
+
+        async with anyio.create_task_group() as task_group:
+
+            async def watched_receive() -> Message:
+                nonlocal watching
+                if watching:
+                    # the watcher owns receive once the body is consumed
+                    await disconnected.wait()
+                    return {"type": "http.disconnect"}
+
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    disconnected.set()
+                elif not message.get("more_body", False):
+                    watching = True
+                    task_group.start_soon(watch)
+                return message
+
+            await self.app(scope, watched_receive, send)
+            task_group.cancel_scope.cancel()
+
+
+async def is_disconnected(request: fastapi.Request) -> bool:
+    """
+    Check whether the client disconnected, as seen by `DisconnectWatcherMiddleware`
+    """
+    disconnected: anyio.Event | None = request.scope.get(DISCONNECTED_SCOPE_KEY)
+    if disconnected is None:
+        return await request.is_disconnected()
+    return disconnected.is_set()
+
+
 def setup_middlewares(app: fastapi.FastAPI) -> None:
     """
     Setup middlewares for fastapi application
@@ -105,5 +202,7 @@ def setup_middlewares(app: fastapi.FastAPI) -> None:
         allow_methods=["*"],
         allow_headers=["*"],
     )
-    app.add_middleware(GZipMiddleware)
+    app.add_middleware(StreamingGZipMiddleware)
     app.add_middleware(BaseHTTPMiddleware, dispatch=catch_exceptions_middleware)
+    # outermost, so it sees the receive of the server
+    app.add_middleware(DisconnectWatcherMiddleware)
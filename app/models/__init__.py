@@ -1,4 +1,4 @@
-from .bots import Bot, BotContext, BotDocument
+from .bots import Bot, BotContext, BotDocument, BotIndexJob
 from .users import User
 
-__all__ = ("Bot", "BotContext", "BotDocument", "User")
+__all__ = ("Bot", "BotContext", "BotDocument", "BotIndexJob", "User")
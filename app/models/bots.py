@@ -1,3 +1,4 @@
+import datetime
 import typing
 import uuid
 
@@ -9,6 +10,7 @@ from sqlalchemy.orm import Mapped, mapped_column
 from app import typings
 from app.config import settings
 from app.db import BaseModel
+from app.utils import utcnow
 
 
 class Bot(BaseModel):
@@ -17,6 +19,8 @@ class Bot(BaseModel):
     """
 
     __tablename__ = "bots"
+    # keyset pagination of the bots list
+    __table_args__ = (sa.Index("ix_bots_created_at_id", "created_at", "id"),)
 
     name: Mapped[str] = mapped_column(sa.String(100), index=True, unique=True)
     avatar: Mapped[str] = mapped_column(
@@ -46,6 +50,15 @@ class Bot(BaseModel):
         index=True,
         default=False,
     )
+    # chat history window sent to the model, unbounded when not set
+    history_max_messages: Mapped[int | None]
+    history_max_tokens: Mapped[int | None]
+    # serve repeated questions from the response cache, meant for deterministic bots
+    response_cache: Mapped[bool] = mapped_column(
+        default=False, server_default=sa.false()
+    )
+    # answer first questions similar to a previous one above this score, off when unset
+    semantic_cache_threshold: Mapped[float | None]
 
     contexts: Mapped[list["BotContext"]] = orm.relationship(
         back_populates="bot", cascade="all, delete"
@@ -71,6 +84,16 @@ class Bot(BaseModel):
             "model_kwargs": {"top_p": self.top_p / 100},
         }
 
+    def get_history_params(self) -> dict[str, typing.Any]:
+        """
+        Returns the chat history window configuration for this bot.
+        """
+        return {
+            "max_messages": self.history_max_messages,
+            "max_tokens": self.history_max_tokens,
+            "model_name": self.get_model_name(),
+        }
+
     def get_context_prompts(self) -> list[tuple[str, str]]:
         """
         Prepare bot context prompts and ensure RAG based bots have the required prompts.
@@ -117,3 +140,49 @@ class BotDocument(BaseModel):
 
     bot_id: Mapped[uuid.UUID] = mapped_column(sa.ForeignKey("bots.id"))
     bot: Mapped[Bot] = orm.relationship(back_populates="documents")
+
+
+class BotIndexJob(BaseModel):
+    """Model to store the state and progress of bot indexing jobs"""
+
+    __tablename__ = "bot_index_jobs"
+
+    state: Mapped[typings.IndexJobState] = mapped_column(
+        sa.Enum(typings.IndexJobState, native_enum=False, length=36),
+        default=typings.IndexJobState.queued,
+        index=True,
+    )
+    rebuild: Mapped[bool] = mapped_column(default=False)
+    documents_loaded: Mapped[int] = mapped_column(default=0)
+    chunks_total: Mapped[int] = mapped_column(default=0)
+    chunks_embedded: Mapped[int] = mapped_column(default=0)
+    chunks_upserted: Mapped[int] = mapped_column(default=0)
+    chunks_deleted: Mapped[int] = mapped_column(default=0)
+    started_at: Mapped[datetime.datetime | None] = mapped_column(
+        sa.DateTime(timezone=True)
+    )
+    finished_at: Mapped[datetime.datetime | None] = mapped_column(
+        sa.DateTime(timezone=True)
+    )
+    error: Mapped[str | None] = mapped_column(sa.Text())
+
+    bot_id: Mapped[uuid.UUID] = mapped_column(sa.ForeignKey("bots.id"), index=True)
+
+    def mark_failed(self, error: str) -> None:
+        """
+        Mark the job as failed with the given error.
+        """
+        self.state = typings.IndexJobState.failed
+        self.error = error
+        self.finished_at = utcnow()
+
+    @property
+    def throughput(self) -> float | None:
+        """
+        Returns the number of chunks embedded per second.
+        """
+        if self.started_at is None:
+            return None
+
+        elapsed = ((self.finished_at or utcnow()) - self.started_at).total_seconds()
+        return self.chunks_embedded / elapsed if elapsed > 0 else None
@@ -1,14 +1,25 @@
 from .agents import BotAgentRepository, ChatBotAgent
+from .answer_cache import AnswerCache
+from .bot_config_cache import BotConfigCache
 from .bots_repository import BotRepository
 from .file_storage import FileStorage
+from .job_queue import Job, JobQueue
+from .lock import LockManager
 from .users_repository import UserRepository
-from .vector_store import VectorStore
+from .vector_store import IndexProgress, ProgressCallback, VectorStore
 
 __all__ = (
+    "AnswerCache",
     "BotAgentRepository",
+    "BotConfigCache",
     "BotRepository",
     "ChatBotAgent",
     "FileStorage",
+    "IndexProgress",
+    "Job",
+    "JobQueue",
+    "LockManager",
+    "ProgressCallback",
     "UserRepository",
     "VectorStore",
 )
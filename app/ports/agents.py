@@ -29,6 +29,14 @@ class ChatBotAgent(abc.ABC):
         """Streams the agent response for a given message"""
         raise NotImplementedError()
 
+    @abc.abstractmethod
+    def astream(
+        self, session_id: str, message: str
+    ) -> typing.AsyncGenerator[str, None]:
+        """Asynchronously streams the agent response for a given message,
+        implemented as an async generator"""
+        raise NotImplementedError()
+
 
 class BotAgentRepository(abc.ABC):
     """
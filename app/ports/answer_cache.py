@@ -0,0 +1,32 @@
+import abc
+
+
+class AnswerCache(abc.ABC):
+    """
+    Abstract class for semantic answer caches.
+    """
+
+    @abc.abstractmethod
+    async def embed(self, question: str) -> list[float]:
+        """
+        Embed a question to look it up
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def lookup(
+        self, namespace: str, vector: list[float], threshold: float
+    ) -> str | None:
+        """
+        Get the answer of the most similar question above the similarity threshold
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def add(
+        self, namespace: str, question: str, vector: list[float], answer: str
+    ) -> None:
+        """
+        Store the answer of an embedded question
+        """
+        raise NotImplementedError()
@@ -0,0 +1,35 @@
+import abc
+import typing
+import uuid
+
+from app import models
+
+
+class BotConfigCache(abc.ABC):
+    """
+    Abstract class for caches of the bot configuration read when chatting.
+    """
+
+    @abc.abstractmethod
+    async def get_or_load(
+        self, bot_id: uuid.UUID, load: typing.Callable[[], typing.Awaitable[models.Bot]]
+    ) -> models.Bot:
+        """
+        Get the cached bot configuration, calling `load` to fetch and cache it
+        on a miss
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def invalidate(self, bot_id: uuid.UUID) -> None:
+        """
+        Drop the bot configuration from the cache of every process
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def close(self) -> None:
+        """
+        Stop listening to invalidations
+        """
+        raise NotImplementedError()
@@ -1,4 +1,6 @@
 import abc
+import datetime
+import typing
 import uuid
 
 from app import models
@@ -25,8 +27,27 @@ class BotRepository(abc.ABC):
         raise NotImplementedError()
 
     @abc.abstractmethod
-    async def get_by_id(self, pk: uuid.UUID) -> models.Bot:
+    async def get_page(
+        self,
+        limit: int,
+        after: tuple[datetime.datetime, uuid.UUID] | None = None,
+        fields: typing.Collection[str] | None = None,
+    ) -> list[models.Bot]:
+        """Returns up to `limit` bot models ordered by (created_at, id),
+        starting after the given key. When `fields` are given only those
+        columns are loaded, and contexts only when listed"""
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def get_by_id(self, pk: uuid.UUID, documents: bool = True) -> models.Bot:
         """Returns bot a single bot model from database
+        based on pk or raises 404 if not found, with its documents unless
+        `documents` is false"""
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def get_config_by_id(self, pk: uuid.UUID) -> models.Bot:
+        """Returns the bot configuration with its contexts, without documents,
         based on pk or raises 404 if not found"""
         raise NotImplementedError()
 
@@ -34,3 +55,54 @@ class BotRepository(abc.ABC):
     async def get_for_update(self, pk: uuid.UUID) -> models.Bot:
         """Fetches and locks a bot model from database"""
         raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def exists(self, pk: uuid.UUID) -> bool:
+        """Returns whether the bot exists, without loading it"""
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def lock(self, pk: uuid.UUID) -> None:
+        """Locks the bot row until the transaction ends without loading it,
+        raises 404 if not found"""
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def add_documents(
+        self,
+        bot_id: uuid.UUID,
+        documents: typing.Sequence[models.BotDocument],
+        check_bot: bool = True,
+    ) -> list[models.BotDocument]:
+        """Inserts documents of the bot without loading its existing documents,
+        raises 404 if the bot is not found. Bulk imports checking the bot up
+        front skip the query with `check_bot`, a missing bot then raises 409"""
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def iter_documents(
+        self, bot_id: uuid.UUID
+    ) -> typing.AsyncIterator[models.BotDocument]:
+        """Streams the documents of the bot a page at a time, the session
+        must not be committed until the iteration ends"""
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def save_index_job(self, job: models.BotIndexJob) -> models.BotIndexJob:
+        """Save bot index job model to database"""
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def get_index_job(
+        self, bot_id: uuid.UUID, pk: uuid.UUID
+    ) -> models.BotIndexJob:
+        """Returns an index job of the bot from database
+        based on pk or raises 404 if not found"""
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def get_active_index_jobs(
+        self, bot_id: uuid.UUID
+    ) -> list[models.BotIndexJob]:
+        """Returns the queued and running index jobs of the bot, oldest first"""
+        raise NotImplementedError()
@@ -0,0 +1,63 @@
+import abc
+import dataclasses
+import typing
+
+
+@dataclasses.dataclass
+class Job:
+    """
+    A unit of background work, `name` selects the task to run with `payload`
+    """
+
+    id: str
+    name: str
+    payload: dict[str, typing.Any] = dataclasses.field(default_factory=dict)
+    attempts: int = 0
+    error: str | None = None
+
+
+class JobQueue(abc.ABC):
+    """
+    Abstract class for durable job queues.
+
+    A reserved job is invisible to other workers until it is acked, failed
+    or its visibility timeout expires, after which it is requeued.
+    """
+
+    @abc.abstractmethod
+    async def enqueue(self, name: str, payload: dict[str, typing.Any]) -> Job:
+        """
+        Add a new job to the queue
+        """
+
+    @abc.abstractmethod
+    async def reserve(self, timeout: float) -> Job | None:
+        """
+        Wait up to `timeout` seconds for the next job and reserve it
+        """
+
+    @abc.abstractmethod
+    async def extend(self, job: Job) -> None:
+        """
+        Extend the visibility timeout of a reserved job still running
+        """
+
+    @abc.abstractmethod
+    async def ack(self, job: Job) -> None:
+        """
+        Remove a completed job from the queue
+        """
+
+    @abc.abstractmethod
+    async def fail(self, job: Job, error: str) -> bool:
+        """
+        Schedule a retry of a failed job,
+        returns False when it has no attempts left and is dead
+        """
+
+    @abc.abstractmethod
+    async def requeue_expired(self) -> int:
+        """
+        Requeue reserved jobs past their visibility timeout,
+        returns the number of requeued jobs
+        """
@@ -0,0 +1,16 @@
+import abc
+import typing
+
+
+class LockManager(abc.ABC):
+    """
+    Abstract class for locks shared by all the app processes.
+    """
+
+    @abc.abstractmethod
+    def hold(self, name: str) -> typing.AsyncContextManager[None]:
+        """
+        Wait for the named lock and hold it while the context is entered,
+        the lock is kept alive until the context exits
+        """
+        raise NotImplementedError()
@@ -1,19 +1,53 @@
 import abc
+import dataclasses
+import typing
 
 from langchain_core.vectorstores import VectorStoreRetriever
 
 from app import models
 
 
+@dataclasses.dataclass
+class IndexProgress:
+    """
+    Progress of an indexing run
+    """
+
+    documents_loaded: int = 0
+    chunks_total: int = 0
+    chunks_embedded: int = 0
+    chunks_upserted: int = 0
+    chunks_deleted: int = 0
+
+
+ProgressCallback = typing.Callable[[IndexProgress], typing.Awaitable[None]]
+
+
 class VectorStore(abc.ABC):
     """
     Abstract class for vector stores.
     """
 
     @abc.abstractmethod
-    async def index(self, bot: models.Bot) -> None:
+    async def index(
+        self,
+        bot: models.Bot,
+        documents: typing.AsyncIterable[models.BotDocument],
+        rebuild: bool = False,
+        on_progress: ProgressCallback | None = None,
+    ) -> None:
+        """
+        Create a vector index for the given bot model from its `documents`,
+        streamed so they are not all held in memory,
+        a rebuild re-embeds all documents instead of only the changed ones.
+        `on_progress` is awaited as the indexing progresses.
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def bootstrap(self) -> None:
         """
-        Create a vector index for the given bot model
+        Provision the vector store, creating or updating its collection
         """
         raise NotImplementedError()
 
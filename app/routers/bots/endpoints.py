@@ -1,10 +1,31 @@
+import asyncio
+import contextlib
+import datetime
+import functools
+import json
 import logging
+import typing
 import uuid
 
 import fastapi
+import pydantic
 from fastapi import APIRouter, status
+from fastapi.responses import StreamingResponse
+from starlette.requests import ClientDisconnect
 
-from app import deps, models, ports
+from app import (
+    deps,
+    exceptions,
+    metrics,
+    middlewares,
+    models,
+    ports,
+    tasks,
+    typings,
+    utils,
+)
+from app.config import settings
+from app.routers import common_schemas as common
 from app.routers.bots import schemas
 
 router = APIRouter(
@@ -12,6 +33,14 @@ router = APIRouter(
 )
 logger = logging.getLogger(__name__)
 
+chat_cancelled = metrics.registry.counter(
+    "chat_requests_cancelled_total",
+    "Number of chat requests cancelled because the client disconnected",
+)
+
+# rejected lines detailed in a document import summary, the rest are only counted
+DOCUMENT_IMPORT_MAX_ERRORS = 100
+
 
 @router.post(
     "/",
@@ -28,6 +57,10 @@ async def create_bot(
         welcome_message=data.welcome_message,
         avatar=data.avatar,
         data_source=data.data_source,
+        history_max_messages=data.history_max_messages,
+        history_max_tokens=data.history_max_tokens,
+        response_cache=data.response_cache,
+        semantic_cache_threshold=data.semantic_cache_threshold,
     )
     for ctx in data.contexts:
         bot.contexts.append(models.BotContext(role=ctx.role, content=ctx.content))
@@ -39,15 +72,54 @@ async def create_bot(
     return schemas.BotOutput.model_validate(bot)
 
 
-@router.get(
-    "/",
-)
-async def list_bots(bot_repo: deps.BotRepository) -> list[schemas.BotOutput]:
+@router.get("/", response_model_exclude_unset=True)
+async def list_bots(
+    bot_repo: deps.BotRepository,
+    limit: typing.Annotated[
+        int, fastapi.Query(ge=1, le=settings.bots_max_page_size)
+    ] = settings.bots_page_size,
+    cursor: str | None = None,
+    fields: typing.Annotated[
+        str | None,
+        fastapi.Query(description="Comma separated fields to return, all if not set"),
+    ] = None,
+) -> schemas.BotPage:
     """
-    Endpoint to fetch lists of bots
+    Endpoint to fetch a page of bots ordered by creation,
+    pass the returned `next_cursor` to fetch the following page
     """
-    bots = await bot_repo.get_all()
-    return [schemas.BotOutput.model_validate(bot) for bot in bots]
+    try:
+        after = common.decode_cursor(cursor) if cursor else None
+    except ValueError as exc:
+        raise fastapi.HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)
+        ) from exc
+
+    names = list(schemas.BotListItem.model_fields)
+    if fields is not None:
+        requested = {"id", *filter(None, (f.strip() for f in fields.split(",")))}
+        if unknown := requested.difference(names):
+            raise fastapi.HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown fields: {', '.join(sorted(unknown))}",
+            )
+        names = [name for name in names if name in requested]
+
+    bots = await bot_repo.get_page(
+        limit + 1, after=after, fields=names if fields is not None else None
+    )
+    next_cursor = None
+    if len(bots) > limit:
+        bots = bots[:limit]
+        next_cursor = common.encode_cursor(bots[-1].created_at, bots[-1].id)
+
+    items = [
+        schemas.BotListItem.model_validate(
+            {name: getattr(bot, name) for name in names}, from_attributes=True
+        )
+        for bot in bots
+    ]
+    return schemas.BotPage(items=items, next_cursor=next_cursor)
 
 
 @router.get(
@@ -65,28 +137,95 @@ async def get_bot(
     return schemas.BotOutput.model_validate(bot)
 
 
+async def get_chat_agent(
+    bot_id: uuid.UUID,
+    bot_repo: deps.BotRepository,
+    agent_repo: deps.BotAgentRepository,
+    vector_store: deps.VectorStore,
+) -> ports.ChatBotAgent:
+    """
+    Dependency to get the agent of the bot to chat with
+    """
+    bot = await bot_repo.get_config_by_id(bot_id)
+    return agent_repo.get_agent(bot, vector_store=vector_store)
+
+
+ChatAgent = typing.Annotated[ports.ChatBotAgent, fastapi.Depends(get_chat_agent)]
+
+
 @router.post(
     "/{bot_id}/chat/",
 )
 async def chat_bot(
+    request: fastapi.Request,
     bot_id: uuid.UUID,
     data: schemas.ChatMessage,
-    bot_repo: deps.BotRepository,
-    agent_repo: deps.BotAgentRepository,
-    vector_store: deps.VectorStore,
+    chatbot_agent: ChatAgent,
 ) -> schemas.ChatOutput:
     """
     Endpoint to fetch lists of bots
     """
-    bot = await bot_repo.get_by_id(bot_id)
-    chatbot_agent = agent_repo.get_agent(bot, vector_store=vector_store)
+    try:
+        content = await utils.cancel_on_disconnect(
+            functools.partial(middlewares.is_disconnected, request),
+            chatbot_agent.invoke(session_id=data.session_id, message=data.message),
+            poll_interval=settings.disconnect_poll_interval,
+        )
+    except exceptions.ClientDisconnected:
+        chat_cancelled.inc()
+        logger.info("Cancelled chat with %s, client disconnected", bot_id)
+        raise
 
-    content = await chatbot_agent.invoke(
-        session_id=data.session_id, message=data.message
-    )
     return schemas.ChatOutput(content=content)
 
 
+async def _chat_events(
+    chunks: typing.AsyncGenerator[str, None]
+) -> typing.AsyncIterator[str]:
+    """
+    Format agent response chunks as server-sent events.
+    The response is cancelled when the client disconnects,
+    which also cancels the underlying LLM stream.
+    """
+    try:
+        async with contextlib.aclosing(chunks):
+            async for chunk in chunks:
+                if chunk:
+                    output = schemas.ChatOutput(content=chunk)
+                    yield f"data: {output.model_dump_json()}\n\n"
+    except (asyncio.CancelledError, GeneratorExit):
+        chat_cancelled.inc()
+        logger.info("Cancelled chat stream, client disconnected")
+        raise
+    except Exception:  # pylint: disable=broad-exception-caught
+        logger.exception("Chat stream failed")
+        error = {"message": "Internal server error"}
+        yield f"event: error\ndata: {json.dumps(error)}\n\n"
+        return
+
+    yield "event: done\ndata: {}\n\n"
+
+
+@router.post(
+    "/{bot_id}/chat/stream/",
+    response_class=StreamingResponse,
+    responses={status.HTTP_200_OK: {"content": {"text/event-stream": {}}}},
+)
+async def chat_bot_stream(
+    data: schemas.ChatMessage,
+    chatbot_agent: ChatAgent,
+) -> StreamingResponse:
+    """
+    Endpoint to stream a chat response as server-sent events
+    """
+    chunks = chatbot_agent.astream(session_id=data.session_id, message=data.message)
+    return StreamingResponse(
+        _chat_events(chunks),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post("/{bot_id}/documents/", status_code=status.HTTP_201_CREATED)
 async def create_bot_documents(
     bot_id: uuid.UUID,
@@ -94,61 +233,199 @@ async def create_bot_documents(
     bot_repo: deps.BotRepository,
 ) -> list[schemas.BotDocumentOutput]:
     """
-    Endpoint to fetch lists of bots
+    Endpoint to add documents to a bot
     """
-    bot = await bot_repo.get_for_update(bot_id)
-    doc_ids = []
-    for doc in data:
-        bot_doc = models.BotDocument(
-            id=uuid.uuid4(),
-            content=doc.content,
-            filename=doc.filename,
-            content_type=doc.content_type,
-            doc_metadata=doc.metadata,
-        )
+    docs = await bot_repo.add_documents(
+        bot_id,
+        [
+            models.BotDocument(
+                content=doc.content,
+                filename=doc.filename,
+                content_type=doc.content_type,
+                doc_metadata=doc.metadata,
+            )
+            for doc in data
+        ],
+    )
+    return [schemas.BotDocumentOutput.model_validate(doc) for doc in docs]
 
-        bot.documents.append(bot_doc)
-        doc_ids.append(bot_doc.id)
 
-    await bot_repo.save(bot)
+@router.post(
+    "/{bot_id}/documents/import/",
+    status_code=status.HTTP_201_CREATED,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/x-ndjson": {
+                    "schema": schemas.BotDocumentCreate.model_json_schema()
+                }
+            },
+        }
+    },
+)
+async def import_bot_documents(
+    request: fastapi.Request,
+    bot_id: uuid.UUID,
+    bot_repo: deps.BotRepository,
+) -> schemas.BotDocumentImportOutput:
+    """
+    Endpoint to import bot documents from a newline delimited JSON stream.
 
-    bot = await bot_repo.get_by_id(bot_id)
-    return [
-        schemas.BotDocumentOutput.model_validate(doc)
-        for doc in bot.documents
-        if doc.id in doc_ids
-    ]
+    The body is parsed line by line and written in fixed-size batches, each
+    committed on its own, so memory use does not depend on the import size.
+    Invalid lines are skipped and reported in the summary. When the import
+    fails midway the error details hold the summary of the committed batches.
+    """
+    # fails before reading the body when the bot does not exist
+    if not await bot_repo.exists(bot_id):
+        raise exceptions.DoesNotExist("Bot does not exist")
 
+    errors: list[schemas.BotDocumentImportError] = []
+    summary = schemas.BotDocumentImportOutput()
+    summary.errors = errors
+    batch: list[models.BotDocument] = []
 
-async def index_bot_documents_task(
-    bot: models.Bot,
-    vector_store: ports.VectorStore,
-    bot_repo: ports.BotRepository,
-) -> None:
-    """
-    Background task to index bot documents
-    """
-    logger.info("Indexing documents for %s", bot)
+    async def write_batch() -> None:
+        # a bot deleted meanwhile fails the insert on its foreign key
+        await bot_repo.add_documents(bot_id, batch, check_bot=False)
+        summary.imported += len(batch)
+        summary.batches += 1
+        batch.clear()
+        logger.debug("Imported %s documents to %s", summary.imported, bot_id)
 
-    await vector_store.index(bot)
+    lines = utils.aiter_lines(
+        request.stream(), max_line_size=settings.document_import_max_line_size
+    )
+    line_no = 0
+    try:
+        async for line in lines:
+            line_no += 1
+            if not line.strip():
+                continue
+            try:
+                doc = schemas.BotDocumentCreate.model_validate_json(line)
+            except pydantic.ValidationError as exc:
+                summary.failed += 1
+                if len(errors) < DOCUMENT_IMPORT_MAX_ERRORS:
+                    error = exc.errors(include_url=False)[0]
+                    errors.append(
+                        schemas.BotDocumentImportError(
+                            line=line_no, message=error["msg"]
+                        )
+                    )
+                continue
 
-    bot_for_update = await bot_repo.get_for_update(bot.id)
-    bot_for_update.data_indexed = True
+            batch.append(
+                models.BotDocument(
+                    content=doc.content,
+                    filename=doc.filename,
+                    content_type=doc.content_type,
+                    doc_metadata=doc.metadata,
+                )
+            )
+            if len(batch) >= settings.document_import_batch_size:
+                await write_batch()
+        if batch:
+            await write_batch()
+    except exceptions.LineTooLong as exc:
+        # committed batches stay imported, the summary tells where to resume
+        raise exceptions.ImportInterrupted(
+            f"Line {line_no + 1}: {exc}",
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            summary=summary.model_dump(),
+        ) from exc
+    except fastapi.HTTPException as exc:
+        raise exceptions.ImportInterrupted(
+            str(exc.detail), status_code=exc.status_code, summary=summary.model_dump()
+        ) from exc
+    except ClientDisconnect as exc:
+        logger.info(
+            "Import of documents to %s interrupted after %s documents,"
+            " client disconnected",
+            bot_id,
+            summary.imported,
+        )
+        raise exceptions.ClientDisconnected("Client disconnected") from exc
+    except Exception as exc:
+        logger.exception("Import of documents to %s failed", bot_id)
+        raise exceptions.ImportInterrupted(
+            "Internal server error",
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            summary=summary.model_dump(),
+        ) from exc
 
-    await bot_repo.save(bot_for_update)
+    logger.info(
+        "Imported %s documents to %s, %s lines rejected",
+        summary.imported,
+        bot_id,
+        summary.failed,
+    )
+    return summary
 
 
 @router.post("/{bot_id}/index/", status_code=status.HTTP_202_ACCEPTED)
 async def index_bot_documents(
     bot_id: uuid.UUID,
     bot_repo: deps.BotRepository,
-    vector_store: deps.VectorStore,
-    background_tasks: fastapi.BackgroundTasks,
+    job_queue: deps.JobQueue,
+    rebuild: bool = False,
 ) -> schemas.BotDocumentIndexOutput:
     """
-    Endpoint to trigger indexing of bot documents
+    Endpoint to queue indexing of bot documents,
+    `rebuild` re-embeds all documents instead of only the changed ones.
+
+    Requests are coalesced per bot: while a job is waiting in the queue new
+    requests attach to it, so at most one run follows the running one.
     """
-    bot = await bot_repo.get_by_id(bot_id)
-    background_tasks.add_task(index_bot_documents_task, bot, vector_store, bot_repo)
+    # locking the bot serializes concurrent requests and the worker start
+    await bot_repo.lock(bot_id)
+    active_jobs = await bot_repo.get_active_index_jobs(bot_id)
+    queued = [j for j in active_jobs if j.state == typings.IndexJobState.queued]
+    lost_before = utils.utcnow() - datetime.timedelta(
+        seconds=settings.index_job_queued_timeout
+    )
+    for job in [j for j in queued if j.created_at < lost_before]:
+        # never picked up, e.g. the message was lost or dead-lettered
+        job.mark_failed("Index job was not started by a worker")
+        await bot_repo.save_index_job(job)
+        logger.warning("Index job %s of bot %s was lost", job.id, bot_id)
+        queued.remove(job)
+    if queued:
+        job = queued[0]
+        if rebuild and not job.rebuild:
+            job.rebuild = True
+            await bot_repo.save_index_job(job)
+        logger.info("Coalesced index request of bot %s into job %s", bot_id, job.id)
+        return schemas.BotDocumentIndexOutput(id=bot_id, completed=False, job_id=job.id)
+
+    job = await bot_repo.save_index_job(
+        models.BotIndexJob(bot_id=bot_id, rebuild=rebuild)
+    )
+    job_id = job.id
+    try:
+        await job_queue.enqueue(
+            tasks.INDEX_BOT_DOCUMENTS,
+            {"bot_id": str(bot_id), "index_job_id": str(job_id)},
+        )
+    except Exception as exc:
+        # later requests must not coalesce into a job that never runs
+        job.mark_failed(repr(exc))
+        await bot_repo.save_index_job(job)
+        raise
+
+    return schemas.BotDocumentIndexOutput(id=bot_id, completed=False, job_id=job_id)
+
+
+@router.get("/{bot_id}/index/{job_id}/")
+async def get_bot_index_job(
+    bot_id: uuid.UUID,
+    job_id: uuid.UUID,
+    bot_repo: deps.BotRepository,
+) -> schemas.BotIndexJobOutput:
+    """
+    Endpoint to retrieve the state and progress of an indexing job
+    """
+    job = await bot_repo.get_index_job(bot_id, job_id)
 
-    return schemas.BotDocumentIndexOutput(id=bot_id, completed=False)
+    return schemas.BotIndexJobOutput.model_validate(job)
@@ -1,3 +1,4 @@
+import datetime
 import typing
 import uuid
 
@@ -26,6 +27,10 @@ class BotCreate(common.BaseInputSchema):
     welcome_message: str | None = pydantic.Field(None, max_length=255)
     contexts: list[BotContextCreate] = pydantic.Field(default_factory=list)
     data_source: str | None = pydantic.Field(None, max_length=100)
+    history_max_messages: int | None = pydantic.Field(None, ge=1)
+    history_max_tokens: int | None = pydantic.Field(None, ge=1)
+    response_cache: bool = False
+    semantic_cache_threshold: float | None = pydantic.Field(None, gt=0, le=1)
 
 
 class BotDocumentCreate(common.BaseInputSchema):
@@ -39,6 +44,28 @@ class BotDocumentCreate(common.BaseInputSchema):
     metadata: dict[str, typing.Any] = pydantic.Field(default_factory=dict)
 
 
+class BotDocumentImportError(common.BaseOutputSchema):
+    """
+    Schema for returning a rejected line of a document import
+    """
+
+    line: int
+    message: str
+
+
+class BotDocumentImportOutput(common.BaseOutputSchema):
+    """
+    Schema for returning the summary of a document import
+    """
+
+    imported: int = 0
+    failed: int = 0
+    batches: int = 0
+    errors: list[BotDocumentImportError] = pydantic.Field(
+        default_factory=list, description="First rejected lines"
+    )
+
+
 class BotContextOutput(common.BaseModelOutput, BotContextCreate):
     """
     Schema for returning bot context
@@ -72,9 +99,49 @@ class BotOutput(common.BaseModelOutput):
     temperature: int
     top_p: int
     max_tokens: int
+    history_max_messages: int | None = None
+    history_max_tokens: int | None = None
+    response_cache: bool = False
+    semantic_cache_threshold: float | None = None
     documents: list[BotDocumentOutput] = pydantic.Field(default_factory=list)
 
 
+class BotListItem(common.BaseOutputSchema):
+    """
+    Schema for returning bots in a list, only the requested fields are set
+    """
+
+    id: uuid.UUID
+    created_at: datetime.datetime | None = None
+    updated_at: datetime.datetime | None = None
+    name: str | None = None
+    avatar: str | None = None
+    welcome_message: str | None = None
+    data_source: typings.BotDataSource | None = None
+    contexts: list[BotContextOutput] | None = None
+    data_indexed: bool | None = None
+    bot_type: typings.BotType | None = None
+    bot_model: typings.BotModelTypes | None = None
+    temperature: int | None = None
+    top_p: int | None = None
+    max_tokens: int | None = None
+    history_max_messages: int | None = None
+    history_max_tokens: int | None = None
+    response_cache: bool | None = None
+    semantic_cache_threshold: float | None = None
+
+
+class BotPage(common.BaseOutputSchema):
+    """
+    Schema for returning a page of bots
+    """
+
+    items: list[BotListItem]
+    next_cursor: str | None = pydantic.Field(
+        None, description="Cursor of the next page, None on the last page"
+    )
+
+
 class ChatMessage(common.BaseInputSchema):
     """
     Schema for chat message
@@ -99,3 +166,25 @@ class BotDocumentIndexOutput(common.BaseOutputSchema):
 
     id: uuid.UUID
     completed: bool
+    job_id: uuid.UUID | None = None
+
+
+class BotIndexJobOutput(common.BaseModelOutput):
+    """
+    Schema for returning bot index jobs
+    """
+
+    bot_id: uuid.UUID
+    state: typings.IndexJobState
+    rebuild: bool
+    documents_loaded: int
+    chunks_total: int
+    chunks_embedded: int
+    chunks_upserted: int
+    chunks_deleted: int
+    started_at: datetime.datetime | None = None
+    finished_at: datetime.datetime | None = None
+    error: str | None = None
+    throughput: float | None = pydantic.Field(
+        None, description="Chunks embedded per second"
+    )
@@ -1,3 +1,4 @@
+import base64
 import datetime
 import uuid
 
@@ -34,3 +35,24 @@ class BaseModelOutput(BaseOutputSchema):
     id: uuid.UUID
     created_at: datetime.datetime
     updated_at: datetime.datetime
+
+
+def encode_cursor(created_at: datetime.datetime, pk: uuid.UUID) -> str:
+    """
+    Encode the (created_at, id) key of the last item of a page as an opaque cursor
+    """
+    raw = f"{created_at.isoformat()}|{pk}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime.datetime, uuid.UUID]:
+    """
+    Decode a cursor built by `encode_cursor`, raises ValueError when malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+        created_at, pk = raw.split("|")
+        return datetime.datetime.fromisoformat(created_at), uuid.UUID(pk)
+    except ValueError as exc:
+        raise ValueError("Invalid cursor") from exc
@@ -1,5 +1,7 @@
 from fastapi import APIRouter
 
+from app import metrics
+
 router = APIRouter(tags=["Health checks"])
 
 
@@ -7,3 +9,9 @@ router = APIRouter(tags=["Health checks"])
 async def healthz() -> str:
     """Health check endpoint"""
     return "ok"
+
+
+@router.get("/metrics/", include_in_schema=False)
+async def get_metrics() -> dict[str, float]:
+    """Returns in-process metrics of the serving worker"""
+    return metrics.registry.snapshot()
@@ -0,0 +1,77 @@
+"""
+Background tasks run by the job worker.
+"""
+
+import dataclasses
+import logging
+import typing
+import uuid
+
+from app import db, deps, ports, typings, utils
+from app.adapters import sqlalchemy
+
+logger = logging.getLogger(__name__)
+
+Task = typing.Callable[[dict[str, typing.Any]], typing.Awaitable[None]]
+
+INDEX_BOT_DOCUMENTS = "index_bot_documents"
+
+
+async def index_bot_documents(payload: dict[str, typing.Any]) -> None:
+    """
+    Task to index bot documents, recording the progress on the index job.
+    Runs of a bot are serialized by a distributed lock, so a follow-up job
+    waits for the running one instead of indexing the same documents twice.
+    """
+    bot_id = uuid.UUID(payload["bot_id"])
+    job_id = uuid.UUID(payload["index_job_id"])
+    async with (
+        deps.get_lock_manager().hold(f"index_bot:{bot_id}"),
+        db.async_db.session() as session,
+        # progress reports commit `session`, which would close the documents cursor
+        db.async_db.session() as documents_session,
+    ):
+        bot_repo = sqlalchemy.BotRepository(
+            session, config_cache=deps.get_bot_config_cache()
+        )
+        # the bot lock orders the start with requests coalescing into the job
+        await bot_repo.lock(bot_id)
+        job = await bot_repo.get_index_job(bot_id, job_id)
+        if job.state == typings.IndexJobState.completed:
+            logger.info("Index job %s is already completed", job_id)
+            return
+
+        job.state = typings.IndexJobState.running
+        job.started_at = utils.utcnow()
+        job.finished_at = None
+        await bot_repo.save_index_job(job)
+
+        bot = await bot_repo.get_by_id(bot_id, documents=False)
+        documents = sqlalchemy.BotRepository(documents_session).iter_documents(bot_id)
+        logger.info("Indexing documents for %s", bot)
+
+        async def on_progress(progress: ports.IndexProgress) -> None:
+            for field, value in dataclasses.asdict(progress).items():
+                setattr(job, field, value)
+            await bot_repo.save_index_job(job)
+
+        try:
+            await deps.get_vector_store().index(
+                bot, documents, rebuild=job.rebuild, on_progress=on_progress
+            )
+        except Exception as exc:
+            job.mark_failed(repr(exc))
+            await bot_repo.save_index_job(job)
+            raise
+
+        await bot_repo.lock(bot_id)
+        bot.data_indexed = True
+        await bot_repo.save(bot)
+
+        job.state = typings.IndexJobState.completed
+        job.error = None
+        job.finished_at = utils.utcnow()
+        await bot_repo.save_index_job(job)
+
+
+tasks: dict[str, Task] = {INDEX_BOT_DOCUMENTS: index_bot_documents}
@@ -29,3 +29,12 @@ class BotContextRole(str, enum.Enum):
     system = "system"
     user = "user"
     assistant = "assistant"
+
+
+class IndexJobState(str, enum.Enum):
+    """Enum for bot indexing job states."""
+
+    queued = "queued"
+    running = "running"
+    completed = "completed"
+    failed = "failed"
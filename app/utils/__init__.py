@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import datetime
 import time
 import typing
@@ -7,8 +8,11 @@ import typing
 import boto3
 from mypy_boto3_s3.client import S3Client
 
+from app import exceptions
 from app.config import settings
 
+T = typing.TypeVar("T")
+
 
 def utcnow() -> datetime.datetime:
     """Generates timezone-aware UTC datetime."""
@@ -48,3 +52,50 @@ def get_s3_client() -> S3Client:
         endpoint_url=settings.aws_endpoint_url,
     )
     return typing.cast(S3Client, client)
+
+
+async def cancel_on_disconnect(
+    is_disconnected: typing.Callable[[], typing.Awaitable[bool]],
+    awaitable: typing.Awaitable[T],
+    poll_interval: float,
+) -> T:
+    """
+    Await the given awaitable, cancelling it when the client disconnects
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await is_disconnected():
+                raise exceptions.ClientDisconnected("Client disconnected")
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+async def aiter_lines(
+    chunks: typing.AsyncIterable[bytes], max_line_size: int
+) -> typing.AsyncIterator[bytes]:
+    """
+    Split a byte stream into lines, buffering at most one line,
+    raises LineTooLong when a line is longer than `max_line_size` bytes
+    """
+    buffer = bytearray()
+    async for chunk in chunks:
+        buffer.extend(chunk)
+        start = 0
+        while (end := buffer.find(b"\n", start)) != -1:
+            if end - start > max_line_size:
+                raise exceptions.LineTooLong(
+                    f"Line is longer than {max_line_size} bytes"
+                )
+            yield bytes(buffer[start:end])
+            start = end + 1
+        del buffer[:start]
+        if len(buffer) > max_line_size:
+            raise exceptions.LineTooLong(f"Line is longer than {max_line_size} bytes")
+
+    if buffer:
+        yield bytes(buffer)
@@ -0,0 +1,98 @@
+"""
+Worker process consuming the background job queue.
+"""
+
+import asyncio
+import logging
+import typing
+
+from app import metrics, ports
+from app.config import settings
+from app.tasks import Task
+
+logger = logging.getLogger(__name__)
+
+jobs_completed = metrics.registry.counter(
+    "jobs_completed_total", "Number of background jobs completed"
+)
+jobs_failed = metrics.registry.counter(
+    "jobs_failed_total", "Number of background job attempts that failed"
+)
+
+# seconds between checks for jobs past their visibility timeout
+REQUEUE_INTERVAL = 5.0
+
+
+class Worker:
+    """
+    Runs jobs from the queue with bounded concurrency.
+    Running jobs keep extending their visibility timeout, stopping the worker
+    lets them complete while no new job is reserved.
+    """
+
+    def __init__(
+        self,
+        queue: ports.JobQueue,
+        tasks: typing.Mapping[str, Task],
+        concurrency: int = 1,
+    ) -> None:
+        self.concurrency = concurrency
+        self._queue = queue
+        self._tasks = tasks
+        self._stopping = asyncio.Event()
+
+    def stop(self) -> None:
+        """Stop reserving new jobs"""
+        logger.info("Stopping worker")
+        self._stopping.set()
+
+    async def run(self) -> None:
+        """Consume jobs until the worker is stopped"""
+        logger.info("Starting worker with concurrency %s", self.concurrency)
+        await asyncio.gather(
+            self._requeue_expired(),
+            *(self._consume() for _ in range(self.concurrency)),
+        )
+
+    async def _consume(self) -> None:
+        while not self._stopping.is_set():
+            job = await self._queue.reserve(timeout=1)
+            if job is not None:
+                await self.process(job)
+
+    async def process(self, job: ports.Job) -> None:
+        """Run a reserved job, then ack or fail it"""
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            task = self._tasks[job.name]
+            logger.info(
+                "Running job %s: %s, attempt %s", job.id, job.name, job.attempts
+            )
+            await task(job.payload)
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            jobs_failed.inc()
+            logger.exception("Job %s failed", job.id)
+            if not await self._queue.fail(job, repr(exc)):
+                logger.error("Job %s has no attempts left", job.id)
+        else:
+            jobs_completed.inc()
+            await self._queue.ack(job)
+        finally:
+            heartbeat.cancel()
+
+    async def _heartbeat(self, job: ports.Job) -> None:
+        interval = settings.job_visibility_timeout / 3
+        while True:
+            await asyncio.sleep(interval)
+            await self._queue.extend(job)
+
+    async def _requeue_expired(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                await self._queue.requeue_expired()
+            except Exception:  # pylint: disable=broad-exception-caught
+                logger.exception("Failed to requeue expired jobs")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), REQUEUE_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
@@ -14,6 +14,9 @@ case "$1" in
         poetry run python manage.py fixtures load
         poetry run gunicorn -c ./gunicorn_conf.py app.main:app
         ;;
+    worker)
+        poetry run python manage.py worker
+        ;;
     manage)
         poetry run python manage.py "$2"
         ;;
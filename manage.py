@@ -1,6 +1,6 @@
 import typer
 
-from app import db, logging_config
+from app import clients, db, logging_config
 from app.cli import setup_commands
 from app.config import settings
 
@@ -12,4 +12,5 @@ setup_commands(app)
 
 if __name__ == "__main__":
     db.async_db.init(settings)
+    clients.app_clients.init(settings)
     app()
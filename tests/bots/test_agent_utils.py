@@ -1,36 +1,234 @@
-from unittest.mock import patch
+import asyncio
+import datetime
+import json
+from unittest import mock
 
 import pytest
-from langchain_community.chat_message_histories import RedisChatMessageHistory
+from langchain_core.messages import (
+    AIMessage,
+    HumanMessage,
+    SystemMessage,
+    message_to_dict,
+)
+from redis import asyncio as aioredis
 
-from app.adapters.agents import utils
-from app.config import settings
+from app import clients
+from app.adapters.agents import cache, history, summary, utils
 
 
 @pytest.fixture
-def mock_redis_chat_message_history():
-    with patch.object(RedisChatMessageHistory, "__init__") as mock_init:
-        mock_init.return_value = None
-        yield mock_init
+def mock_redis():
+    redis = mock.MagicMock(spec=aioredis.Redis)
+    redis.lrange = mock.AsyncMock(return_value=[])
+    redis.delete = mock.AsyncMock()
+    redis.eval = mock.AsyncMock(return_value=1)
+    redis.get = mock.AsyncMock(return_value=None)
+    pipe = mock.MagicMock()
+    pipe.execute = mock.AsyncMock()
+    redis.pipeline.return_value.__aenter__ = mock.AsyncMock(return_value=pipe)
+    redis.pipeline.return_value.__aexit__ = mock.AsyncMock(return_value=None)
 
+    with mock.patch.object(clients.app_clients, "_redis", redis):
+        yield redis
 
-def test_get_session_history(mock_redis_chat_message_history):
+
+async def test_get_session_history(mock_redis):
     """
     Test get_session_history function
     """
     bot_id = "test_bot"
     session_id = "1234"
 
-    session_key = f"{bot_id}_{session_id}"
-    expected_url = settings.redis_url
-
     # Call the function
-    history = utils.get_session_history(bot_id, session_id)
+    session_history = utils.get_session_history(bot_id, session_id)
+
+    assert isinstance(session_history, history.AsyncRedisChatMessageHistory)
+    assert session_history.key == f"message_store:{bot_id}_{session_id}"
+
+
+async def test_can_read_and_write_history(mock_redis):
+    session_history = utils.get_session_history("test_bot", "1234")
+    messages = [HumanMessage(content="Hello bot"), AIMessage(content="Hi, user")]
+    # messages are stored newest first
+    mock_redis.lrange.return_value = [
+        json.dumps(message_to_dict(m)).encode() for m in messages[::-1]
+    ]
+
+    assert await session_history.aget_messages() == messages
+    mock_redis.lrange.assert_awaited_once_with(session_history.key, 0, -1)
+
+    await session_history.aadd_messages(messages)
+    pipe = mock_redis.pipeline.return_value.__aenter__.return_value
+    assert pipe.lpush.call_count == len(messages)
+    pipe.execute.assert_awaited_once()
+
+
+async def test_sync_history_api_runs_on_the_event_loop(mock_redis):
+    session_history = utils.get_session_history("test_bot", "1234")
+
+    # calling the sync api on the loop itself would block it
+    with pytest.raises(RuntimeError):
+        session_history.clear()
+
+    # executor threads are handed back to the event loop
+    messages = await asyncio.to_thread(lambda: session_history.messages)
+    assert messages == []
+    mock_redis.lrange.assert_awaited_once()
+
+
+def _store_messages(mock_redis, count: int) -> list:
+    messages = []
+    for idx in range(count):
+        messages.append(HumanMessage(content=f"question {idx}"))
+        messages.append(AIMessage(content=f"answer {idx}"))
+    # messages are stored newest first
+    items = [json.dumps(message_to_dict(m)).encode() for m in messages[::-1]]
+
+    async def lrange(key, start, stop):
+        return items[start:] if stop == -1 else items[start : stop + 1]
+
+    mock_redis.lrange.side_effect = lrange
+    return messages
+
+
+async def test_history_window_max_messages(mock_redis):
+    messages = _store_messages(mock_redis, 30)
+    session_history = utils.get_session_history("test_bot", "1234", max_messages=5)
+
+    result = await session_history.aget_messages()
+
+    # window starts with the user question
+    assert result == messages[-4:]
+    mock_redis.lrange.assert_awaited_once_with(session_history.key, 0, 4)
+
+
+async def test_history_window_max_tokens(mock_redis):
+    messages = _store_messages(mock_redis, 30)
+    session_history = utils.get_session_history("test_bot", "1234", max_tokens=250)
+
+    with mock.patch.object(
+        history.AsyncRedisChatMessageHistory, "_count_tokens", return_value=10
+    ):
+        result = await session_history.aget_messages()
+
+    assert result == messages[-25:][1:]
+    # pages through the list instead of reading it all
+    assert mock_redis.lrange.await_count == 2
+    assert all(call.args[2] != -1 for call in mock_redis.lrange.await_args_list)
+
+
+def test_bot_history_params(bot) -> None:
+    bot.history_max_messages = 10
+    bot.history_max_tokens = 1000
+
+    params = bot.get_history_params()
+
+    assert params["max_messages"] == 10
+    assert params["max_tokens"] == 1000
+    assert params["model_name"] == bot.get_model_name()
+
 
-    # Assert function calls
-    mock_redis_chat_message_history.assert_called_once_with(
-        session_key, url=expected_url
+async def test_history_includes_running_summary(mock_redis):
+    messages = _store_messages(mock_redis, 1)
+    mock_redis.get.return_value = b"user asked about pricing"
+    session_history = utils.get_session_history("test_bot", "1234")
+
+    result = await session_history.aget_messages()
+
+    assert isinstance(result[0], SystemMessage)
+    assert "user asked about pricing" in result[0].content
+    assert result[1:] == messages
+    mock_redis.get.assert_awaited_once_with(session_history.summary_key)
+
+
+async def test_can_compact_history(mock_redis):
+    messages = _store_messages(mock_redis, 10)
+    mock_redis.set = mock.AsyncMock(return_value=True)
+    mock_redis.llen = mock.AsyncMock(return_value=len(messages))
+    summarize = mock.AsyncMock(return_value="new summary")
+    session_history = utils.get_session_history("test_bot", "1234")
+
+    assert await session_history.acompact(summarize, keep_messages=4)
+
+    summarize.assert_awaited_once_with(None, messages[:-4])
+    pipe = mock_redis.pipeline.return_value.__aenter__.return_value
+    pipe.set.assert_called_once_with(session_history.summary_key, "new summary")
+    # only the compacted messages are trimmed from the tail
+    pipe.ltrim.assert_called_once_with(session_history.key, 0, -17)
+    # the lock is released only while it still holds the token set above
+    token = mock_redis.set.await_args.args[1]
+    mock_redis.eval.assert_awaited_once_with(
+        history._RELEASE_LOCK_SCRIPT, 1, f"{session_history.summary_key}:lock", token
+    )
+
+    # another worker holds the lock
+    mock_redis.set.return_value = None
+    assert not await session_history.acompact(summarize, keep_messages=4)
+
+
+async def test_compaction_is_scheduled_past_threshold(mock_redis):
+    compactor = mock.MagicMock(spec=summary.HistoryCompactor)
+    compactor.threshold = 2
+    pipe = mock_redis.pipeline.return_value.__aenter__.return_value
+    session_history = utils.get_session_history("test_bot", "1234", compactor=compactor)
+
+    pipe.execute.return_value = [1, 2]
+    await session_history.aadd_messages([HumanMessage("Hi"), AIMessage("Hello")])
+    compactor.schedule.assert_not_called()
+
+    pipe.execute.return_value = [3, 4]
+    await session_history.aadd_messages([HumanMessage("Hi"), AIMessage("Hello")])
+    compactor.schedule.assert_called_once_with(session_history)
+
+
+async def test_compactor_runs_in_background(mock_redis):
+    compactor = summary.HistoryCompactor(
+        model=mock.MagicMock(), threshold=2, keep_messages=2
     )
+    session_history = mock.MagicMock(spec=history.AsyncRedisChatMessageHistory)
+    session_history.session_id = "test_bot_1234"
+    session_history.acompact = mock.AsyncMock(side_effect=RuntimeError("failed"))
+
+    compactor.schedule(session_history)
+    await asyncio.gather(*summary._background_tasks)
+
+    session_history.acompact.assert_awaited_once_with(compactor.summarize, 2)
+
+
+def test_response_cache_key() -> None:
+    updated_at = datetime.datetime.now(datetime.timezone.utc)
+    history_window = [HumanMessage(content="Hi"), AIMessage(content="Hello")]
+
+    key = cache.ResponseCache.make_key("bot", updated_at, "What is  the price?", [])
+
+    assert key.startswith("response_cache:bot:")
+    # normalized messages share the same entry
+    assert key == cache.ResponseCache.make_key(
+        "bot", updated_at, " what is the PRICE? ", []
+    )
+    # editing the bot or a different history window changes the key
+    assert key != cache.ResponseCache.make_key(
+        "bot", updated_at + datetime.timedelta(seconds=1), "What is the price?", []
+    )
+    assert key != cache.ResponseCache.make_key(
+        "bot", updated_at, "What is the price?", history_window
+    )
+
+
+async def test_response_cache_get_and_set(mock_redis):
+    response_cache = utils.get_response_cache()
+    hits = cache.cache_hits.value
+    pipe = mock_redis.pipeline.return_value.__aenter__.return_value
+    pipe.execute.return_value = [True, 1, 0, [b"old-key"], True]
+
+    assert await response_cache.aget("key") is None
+    mock_redis.get.return_value = b"Hi, user"
+    assert await response_cache.aget("key") == "Hi, user"
+    assert cache.cache_hits.value == hits + 1
+
+    await response_cache.aset("bot", "key", "Hi, user")
 
-    # Assert return type (optional)
-    assert isinstance(history, RedisChatMessageHistory)
+    pipe.set.assert_called_once_with("key", "Hi, user", ex=response_cache.ttl)
+    # entries past the per bot limit are evicted
+    pipe.delete.assert_called_once_with(b"old-key")
+    pipe.zrem.assert_called_once_with(cache.ResponseCache.index_key("bot"), b"old-key")
@@ -1,14 +1,22 @@
+import asyncio
 import contextlib
+import datetime
+import json
+import typing
 import uuid
 from unittest import mock
 
+import fastapi
 import pytest
 from fastapi import status
 from httpx import AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app import deps, models, ports, typings
+from app import deps, models, ports, tasks, typings
 from app.adapters import sqlalchemy, stubs
+from app.config import settings
+from app.routers.bots import endpoints
+from app.utils import utcnow
 from tests import context, factories
 
 pytestmark = pytest.mark.asyncio
@@ -74,7 +82,58 @@ async def test_can_lists_bot(
     assert response.status_code == status.HTTP_200_OK, response.text
 
     data = response.json()
-    assert len(data) == len(bots)
+    assert len(data["items"]) == len(bots)
+    assert data["next_cursor"] is None
+
+
+async def test_can_page_through_bots(
+    client: AsyncClient, db_session: AsyncSession, bot_factory, auth_token
+) -> None:
+    repo = sqlalchemy.BotRepository(db_session)
+    bots = bot_factory.create_batch(5)
+    bot_ids = [str(bot.id) for bot in bots]
+    for bot in bots:
+        await repo.save(bot)
+
+    seen: list[str] = []
+    params: dict[str, str | int] = {"limit": 2}
+    for _ in range(3):
+        response = await client.get(f"{base_path}/", params=params)
+        assert response.status_code == status.HTTP_200_OK, response.text
+        data = response.json()
+        assert len(data["items"]) <= 2
+        seen.extend(item["id"] for item in data["items"])
+        if data["next_cursor"] is None:
+            break
+        params["cursor"] = data["next_cursor"]
+
+    assert seen == bot_ids
+    assert data["next_cursor"] is None
+
+
+async def test_can_list_bot_fields(
+    client: AsyncClient, bot_db: models.Bot, auth_token
+) -> None:
+    bot_id, bot_name = str(bot_db.id), bot_db.name
+
+    response = await client.get(f"{base_path}/", params={"fields": "name"})
+
+    assert response.status_code == status.HTTP_200_OK, response.text
+    assert response.json()["items"] == [{"id": bot_id, "name": bot_name}]
+
+    response = await client.get(f"{base_path}/", params={"fields": "name,documents"})
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST, response.text
+    assert response.json()["message"] == "Unknown fields: documents"
+
+
+@pytest.mark.parametrize("params", [{"cursor": "invalid"}, {"limit": 0}])
+async def test_list_bots_validation_errors(
+    client: AsyncClient, auth_token, params: dict[str, str | int]
+) -> None:
+    response = await client.get(f"{base_path}/", params=params)
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST, response.text
 
 
 async def test_can_get_bot(client: AsyncClient, bot_db: models.Bot, auth_token) -> None:
@@ -122,6 +181,111 @@ async def test_can_chat_with_bot(
     assert data["content"] == expected
 
 
+def _http_scope(path: str, body: bytes) -> dict[str, typing.Any]:
+    """ASGI scope of a POST request, to drive the app without a test client"""
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "server": ("test", 80),
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [
+            (b"host", b"test"),
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+    }
+
+
+async def test_chat_is_cancelled_on_disconnect(
+    app: fastapi.FastAPI, bot_db: models.Bot, auth_token
+) -> None:
+    cancelled = asyncio.Event()
+
+    class SlowChatBotAgent(stubs.ChatBotAgent):
+        async def invoke(self, session_id: str, message: str) -> str:
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+            return await super().invoke(session_id, message)
+
+    payload = {"message": "Hello bot", "session_id": str(uuid.uuid4())}
+    body = json.dumps(payload).encode("utf-8")
+    scope = _http_scope(f"{base_path}/{bot_db.id}/chat/", body)
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+
+    async def receive() -> dict[str, typing.Any]:
+        if messages:
+            return messages.pop(0)
+        # the client goes away while the agent is still running
+        await asyncio.sleep(0.1)
+        return {"type": "http.disconnect"}
+
+    sent: list[dict[str, typing.Any]] = []
+
+    async def send(message: dict[str, typing.Any]) -> None:
+        sent.append(message)
+
+    agent_repo = stubs.BotAgentRepository(SlowChatBotAgent(bot_db, results="Hi"))
+    before = endpoints.chat_cancelled.value
+    vector_store = mock.MagicMock(spec=ports.VectorStore)
+    with (
+        context.use_dependency(deps.get_bot_agent_repo, lambda: agent_repo),
+        context.use_dependency(deps.get_vector_store, lambda: vector_store),
+        mock.patch.object(endpoints.settings, "disconnect_poll_interval", 0.01),
+    ):
+        await asyncio.wait_for(app(scope, receive, send), timeout=2)
+
+    assert cancelled.is_set()
+    assert endpoints.chat_cancelled.value == before + 1
+    assert sent[0]["status"] == 499
+
+
+@pytest.mark.parametrize("message,expected", [("Hello bot", "Hi,\nuser")])
+async def test_can_stream_chat_with_bot(
+    client: AsyncClient,
+    bot_db: models.Bot,
+    auth_token,
+    message: str,
+    expected: str,
+) -> None:
+    payload = {"message": message, "session_id": str(uuid.uuid4())}
+
+    stub_chatbot = stubs.ChatBotAgent(bot_db, results=expected)
+    vector_store = mock.MagicMock(spec=ports.VectorStore)
+
+    agent_repo = stubs.BotAgentRepository(stub_chatbot)
+    async with contextlib.AsyncExitStack() as stack:
+        stack.enter_context(
+            context.use_dependency(deps.get_bot_agent_repo, lambda: agent_repo)
+        )
+        stack.enter_context(
+            context.use_dependency(deps.get_vector_store, lambda: vector_store)
+        )
+
+        response = await client.post(
+            f"{base_path}/{bot_db.id}/chat/stream/",
+            json=payload,
+            headers={"Accept-Encoding": "gzip"},
+        )
+
+    assert response.status_code == status.HTTP_200_OK, response.text
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert "content-encoding" not in response.headers
+
+    events = response.text.split("\n\n")
+    assert events[0] == 'data: {"content":"Hi,"}'
+    assert events[1] == 'data: {"content":"user"}'
+    assert events[2] == "event: done\ndata: {}"
+
+
 async def test_can_create_bot_documents(
     client: AsyncClient,
     auth_token,
@@ -156,30 +320,351 @@ async def test_can_create_bot_documents(
     ]
     assert payload == expected_docs
 
+    response = await client.post(f"{base_path}/{uuid.uuid4()}/documents/", json=payload)
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND, response.text
+
+
+async def test_can_import_bot_documents(
+    client: AsyncClient, db_session: AsyncSession, auth_token, bot_db: models.Bot
+) -> None:
+    bot_id = bot_db.id
+    lines = [
+        json.dumps({"content": f"doc {i}", "metadata": {"i": i}}) for i in range(5)
+    ]
+    lines.insert(2, json.dumps({"filename": "missing content"}))
+    lines.insert(4, "")
+    lines.append("not json")
+    body = "\n".join(lines).encode("utf-8")
+
+    with mock.patch.object(endpoints.settings, "document_import_batch_size", 2):
+        response = await client.post(
+            f"{base_path}/{bot_id}/documents/import/",
+            content=body,
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+
+    assert response.status_code == status.HTTP_201_CREATED, response.text
+    data = response.json()
+    assert data["imported"] == 5
+    assert data["batches"] == 3
+    assert data["failed"] == 2
+    assert [e["line"] for e in data["errors"]] == [3, 8]
+
+    bot = await sqlalchemy.BotRepository(db_session).get_by_id(bot_id)
+    assert sorted(d.content for d in bot.documents) == [f"doc {i}" for i in range(5)]
+
+
+async def test_import_bot_documents_errors(
+    client: AsyncClient, auth_token, bot_db: models.Bot
+) -> None:
+    bot_id = bot_db.id
+    body = json.dumps({"content": "doc"}).encode("utf-8")
+
+    response = await client.post(
+        f"{base_path}/{uuid.uuid4()}/documents/import/", content=body
+    )
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND, response.text
+
+    # the lines before the long one are committed and reported
+    lines = [json.dumps({"content": c}) for c in ("a", "b", "c" * 100, "d")]
+    body = "\n".join(lines).encode("utf-8")
+    with (
+        mock.patch.object(endpoints.settings, "document_import_max_line_size", 32),
+        mock.patch.object(endpoints.settings, "document_import_batch_size", 1),
+    ):
+        response = await client.post(
+            f"{base_path}/{bot_id}/documents/import/", content=body
+        )
+
+    assert (
+        response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    ), response.text
+    data = response.json()
+    assert data["message"] == "Line 3: Line is longer than 32 bytes"
+    assert data["detail"]["imported"] == 2
+    assert data["detail"]["batches"] == 2
+
+
+async def test_import_bot_documents_client_disconnect(
+    app: fastapi.FastAPI, client: AsyncClient, auth_token, bot_db: models.Bot
+) -> None:
+    bot_id = bot_db.id
+    lines = [json.dumps({"content": c}) + "\n" for c in ("a", "b", "c")]
+    body = "".join(lines).encode("utf-8")
+    messages = [
+        {"type": "http.request", "body": body, "more_body": True},
+        # the client aborts the upload
+        {"type": "http.disconnect"},
+    ]
+
+    async def receive() -> dict[str, typing.Any]:
+        return messages.pop(0)
+
+    sent: list[dict[str, typing.Any]] = []
+
+    async def send(message: dict[str, typing.Any]) -> None:
+        sent.append(message)
+
+    path = f"{base_path}/{bot_id}/documents/import/"
+    with mock.patch.object(endpoints.settings, "document_import_batch_size", 2):
+        await app(_http_scope(path, body * 2), receive, send)
+
+    # not reported as a server error
+    assert sent[0]["status"] == 499
+    # the batches written before the disconnect stay imported
+    response = await client.get(f"{base_path}/{bot_id}/")
+    assert len(response.json()["documents"]) == 2
+
+
+@pytest.fixture
+def worker_deps():
+    """Dependencies of the tasks run by the job worker"""
+    with (
+        mock.patch.object(deps, "get_lock_manager", return_value=stubs.LockManager()),
+        mock.patch.object(deps, "get_bot_config_cache", return_value=None),
+    ):
+        yield
+
 
 async def test_can_index_bot(
     client: AsyncClient,
     auth_token,
     bot_db: models.Bot,
+    worker_deps,
 ) -> None:
+    bot_id = bot_db.id
+    job_queue = mock.MagicMock(spec=ports.JobQueue)
     vector_store = mock.MagicMock(spec=ports.VectorStore)
 
-    async with contextlib.AsyncExitStack() as stack:
-        stack.enter_context(
-            context.use_dependency(deps.get_vector_store, lambda: vector_store)
+    with context.use_dependency(deps.get_job_queue, lambda: job_queue):
+        response = await client.post(f"{base_path}/{bot_id}/index/", json={})
+
+    assert response.status_code == status.HTTP_202_ACCEPTED, response.text
+    data = response.json()
+    assert data["completed"] is False
+    job_id = data["job_id"]
+    job_queue.enqueue.assert_awaited_once_with(
+        tasks.INDEX_BOT_DOCUMENTS, {"bot_id": str(bot_id), "index_job_id": job_id}
+    )
+
+    response = await client.get(f"{base_path}/{bot_id}/index/{job_id}/")
+
+    assert response.status_code == status.HTTP_200_OK, response.text
+    assert response.json()["state"] == "queued"
+
+    async def index(bot, documents, rebuild, on_progress):
+        # streamed by the worker from its own session
+        assert [doc async for doc in documents] == []
+        await on_progress(
+            ports.IndexProgress(
+                documents_loaded=2, chunks_total=3, chunks_embedded=3, chunks_upserted=3
+            )
         )
 
-        response = await client.post(f"{base_path}/{bot_db.id}/index/", json={})
+    vector_store.index.side_effect = index
 
-    vector_store.index.assert_called_once()
+    # the worker runs the queued job
+    with mock.patch.object(deps, "get_vector_store", return_value=vector_store):
+        await tasks.index_bot_documents(job_queue.enqueue.await_args.args[1])
 
-    assert response.status_code == status.HTTP_202_ACCEPTED, response.text
+    vector_store.index.assert_awaited_once()
+
+    response = await client.get(f"{base_path}/{bot_id}/index/{job_id}/")
+
+    assert response.status_code == status.HTTP_200_OK, response.text
     data = response.json()
-    assert data["completed"] is False
+    assert data["state"] == "completed"
+    assert data["documents_loaded"] == 2
+    assert data["chunks_embedded"] == 3
+    assert data["chunks_upserted"] == 3
+    assert data["started_at"] is not None
+    assert data["finished_at"] is not None
+    assert data["throughput"] > 0
+    assert data["error"] is None
 
     # test index is completed
-    response = await client.get(f"{base_path}/{bot_db.id}/")
+    response = await client.get(f"{base_path}/{bot_id}/")
 
     assert response.status_code == status.HTTP_200_OK, response.text
     data = response.json()
     assert data["data_indexed"] is True
+
+
+async def test_failed_index_job_records_error(
+    client: AsyncClient,
+    auth_token,
+    bot_db: models.Bot,
+    worker_deps,
+) -> None:
+    bot_id = bot_db.id
+    job_queue = mock.MagicMock(spec=ports.JobQueue)
+    vector_store = mock.MagicMock(spec=ports.VectorStore)
+    vector_store.index.side_effect = RuntimeError("qdrant is down")
+
+    with context.use_dependency(deps.get_job_queue, lambda: job_queue):
+        response = await client.post(f"{base_path}/{bot_id}/index/", json={})
+    job_id = response.json()["job_id"]
+
+    with (
+        mock.patch.object(deps, "get_vector_store", return_value=vector_store),
+        pytest.raises(RuntimeError),
+    ):
+        await tasks.index_bot_documents(job_queue.enqueue.await_args.args[1])
+
+    response = await client.get(f"{base_path}/{bot_id}/index/{job_id}/")
+
+    assert response.status_code == status.HTTP_200_OK, response.text
+    data = response.json()
+    assert data["state"] == "failed"
+    assert "qdrant is down" in data["error"]
+
+
+async def test_index_requests_are_coalesced(
+    client: AsyncClient,
+    auth_token,
+    bot_db: models.Bot,
+    db_session: AsyncSession,
+) -> None:
+    bot_id = bot_db.id
+    job_queue = mock.MagicMock(spec=ports.JobQueue)
+    path = f"{base_path}/{bot_id}/index/"
+
+    with context.use_dependency(deps.get_job_queue, lambda: job_queue):
+        first = (await client.post(path, json={})).json()["job_id"]
+        # a second request attaches to the job waiting in the queue
+        second = (await client.post(path, params={"rebuild": True})).json()["job_id"]
+
+        assert second == first
+        job_queue.enqueue.assert_awaited_once()
+        response = await client.get(f"{base_path}/{bot_id}/index/{first}/")
+        assert response.json()["rebuild"] is True
+
+        # once the job runs, exactly one follow-up job is queued
+        repo = sqlalchemy.BotRepository(db_session)
+        job = await repo.get_index_job(bot_id, uuid.UUID(first))
+        job.state = typings.IndexJobState.running
+        await repo.save_index_job(job)
+
+        follow_up = (await client.post(path, json={})).json()["job_id"]
+        attached = (await client.post(path, json={})).json()["job_id"]
+
+    assert follow_up != first
+    assert attached == follow_up
+    assert job_queue.enqueue.await_count == 2
+
+
+async def test_index_request_replaces_lost_jobs(
+    client: AsyncClient,
+    auth_token,
+    bot_db: models.Bot,
+    db_session: AsyncSession,
+) -> None:
+    bot_id = bot_db.id
+    job_queue = mock.MagicMock(spec=ports.JobQueue)
+    path = f"{base_path}/{bot_id}/index/"
+    repo = sqlalchemy.BotRepository(db_session)
+    lost = await repo.save_index_job(
+        models.BotIndexJob(
+            bot_id=bot_id,
+            created_at=utcnow()
+            - datetime.timedelta(seconds=settings.index_job_queued_timeout + 1),
+        )
+    )
+    lost_id = lost.id
+
+    with context.use_dependency(deps.get_job_queue, lambda: job_queue):
+        response = await client.post(path, json={})
+
+    assert response.json()["job_id"] != str(lost_id)
+    job_queue.enqueue.assert_awaited_once()
+    response = await client.get(f"{base_path}/{bot_id}/index/{lost_id}/")
+    assert response.json()["state"] == typings.IndexJobState.failed
+
+
+async def test_index_job_fails_when_enqueue_fails(
+    client: AsyncClient,
+    auth_token,
+    bot_db: models.Bot,
+    db_session: AsyncSession,
+) -> None:
+    bot_id = bot_db.id
+    job_queue = mock.MagicMock(spec=ports.JobQueue)
+    job_queue.enqueue.side_effect = ConnectionError("redis is down")
+    path = f"{base_path}/{bot_id}/index/"
+
+    with context.use_dependency(deps.get_job_queue, lambda: job_queue):
+        response = await client.post(path, json={})
+
+        assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
+
+        # the failed job is not coalesced into
+        job_queue.enqueue.side_effect = None
+        response = await client.post(path, json={})
+
+    assert response.status_code == status.HTTP_202_ACCEPTED, response.text
+    jobs = await sqlalchemy.BotRepository(db_session).get_active_index_jobs(bot_id)
+    assert [str(j.id) for j in jobs] == [response.json()["job_id"]]
+    assert job_queue.enqueue.await_count == 2
+
+
+async def test_completed_index_job_is_not_run_again(
+    client: AsyncClient,
+    auth_token,
+    bot_db: models.Bot,
+    db_session: AsyncSession,
+    worker_deps,
+) -> None:
+    bot_id = bot_db.id
+    repo = sqlalchemy.BotRepository(db_session)
+    job = await repo.save_index_job(
+        models.BotIndexJob(bot_id=bot_id, state=typings.IndexJobState.completed)
+    )
+    vector_store = mock.MagicMock(spec=ports.VectorStore)
+
+    with mock.patch.object(deps, "get_vector_store", return_value=vector_store):
+        await tasks.index_bot_documents(
+            {"bot_id": str(bot_id), "index_job_id": str(job.id)}
+        )
+
+    vector_store.index.assert_not_called()
+
+
+async def test_get_unknown_index_job(
+    client: AsyncClient,
+    auth_token,
+    bot_db: models.Bot,
+) -> None:
+    response = await client.get(f"{base_path}/{bot_db.id}/index/{uuid.uuid4()}/")
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND, response.text
+
+
+async def test_chat_stream_is_cancelled_on_disconnect() -> None:
+    closed = asyncio.Event()
+
+    async def chunks():
+        try:
+            yield "Hi,"
+            await asyncio.sleep(10)
+            yield "user"
+        finally:
+            closed.set()
+
+    cancelled = endpoints.chat_cancelled.value
+    events = endpoints._chat_events(chunks())
+
+    async def consume():
+        async for _ in events:
+            pass
+
+    task = asyncio.create_task(consume())
+    await asyncio.sleep(0.01)
+    task.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert closed.is_set()
+    assert endpoints.chat_cancelled.value == cancelled + 1
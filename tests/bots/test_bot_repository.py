@@ -1,8 +1,14 @@
+import uuid
+
 import pytest
+import sqlalchemy as sa
+from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app import exceptions
+from app import exceptions, models
 from app.adapters import sqlalchemy
+from app.config import settings
+from app.utils import utcnow
 
 
 @pytest.mark.asyncio
@@ -37,3 +43,122 @@ async def test_bot_get_all(db_session: AsyncSession, bot_factory) -> None:
 
     bot_lists = await repo.get_all()
     assert len(bot_lists) == len(bots)
+
+
+@pytest.mark.asyncio
+async def test_bot_get_config_skips_documents(
+    db_session: AsyncSession, bot, bot_context
+) -> None:
+    repo = sqlalchemy.BotRepository(db_session)
+    context_content = bot_context.content
+    bot.contexts = [bot_context]
+    bot.documents = [models.BotDocument(content="test content", doc_metadata={})]
+    bot = await repo.save(bot)
+    bot_id = bot.id
+    db_session.expunge_all()
+
+    config = await repo.get_config_by_id(bot_id)
+
+    assert [c.content for c in config.contexts] == [context_content]
+    assert config.documents == []
+    assert len((await repo.get_by_id(bot_id)).documents) == 1
+
+    with pytest.raises(exceptions.DoesNotExist, match="Bot does not exist"):
+        await repo.get_config_by_id(uuid.uuid4())
+
+
+@pytest.mark.asyncio
+async def test_bot_iter_documents(db_session: AsyncSession, bot, monkeypatch) -> None:
+    monkeypatch.setattr(settings, "index_documents_page_size", 2)
+    repo = sqlalchemy.BotRepository(db_session)
+    bot.documents = [
+        models.BotDocument(content=f"content {idx}", doc_metadata={})
+        for idx in range(5)
+    ]
+    bot = await repo.save(bot)
+    bot_id = bot.id
+    db_session.expunge_all()
+
+    assert (await repo.get_by_id(bot_id, documents=False)).documents == []
+    contents = [doc.content async for doc in repo.iter_documents(bot_id)]
+    assert sorted(contents) == [f"content {idx}" for idx in range(5)]
+    assert [doc async for doc in repo.iter_documents(uuid.uuid4())] == []
+
+
+@pytest.mark.asyncio
+async def test_bot_get_page(db_session: AsyncSession, bot_factory) -> None:
+    repo = sqlalchemy.BotRepository(db_session)
+    created_at = utcnow()
+    bots = bot_factory.create_batch(5, created_at=created_at)
+    bot_ids = sorted(bot.id for bot in bots)
+    for bot in bots:
+        await repo.save(bot)
+    db_session.expunge_all()
+
+    # ties on created_at are broken by id
+    first_page = await repo.get_page(3)
+    assert [b.id for b in first_page] == bot_ids[:3]
+
+    last = first_page[-1]
+    second_page = await repo.get_page(3, after=(last.created_at, last.id))
+    assert [b.id for b in second_page] == bot_ids[3:]
+
+
+@pytest.mark.asyncio
+async def test_bot_get_page_loads_only_fields(
+    db_session: AsyncSession, bot, bot_context
+) -> None:
+    repo = sqlalchemy.BotRepository(db_session)
+    bot.contexts = [bot_context]
+    await repo.save(bot)
+    db_session.expunge_all()
+
+    (page_bot,) = await repo.get_page(10, fields=["id", "name"])
+
+    unloaded = sa.inspect(page_bot).unloaded
+    assert "contexts" in unloaded
+    assert "welcome_message" in unloaded
+    assert "name" not in unloaded
+    assert "created_at" not in unloaded
+
+
+@pytest.mark.asyncio
+async def test_bot_add_documents(db_session: AsyncSession, bot) -> None:
+    repo = sqlalchemy.BotRepository(db_session)
+    bot.documents = [models.BotDocument(content="existing", doc_metadata={})]
+    await repo.save(bot)
+    bot_id = bot.id
+
+    docs = await repo.add_documents(
+        bot_id,
+        [
+            models.BotDocument(content=f"new {i}", doc_metadata={"i": i})
+            for i in range(3)
+        ],
+    )
+
+    assert [(d.content, d.doc_metadata, d.bot_id) for d in docs] == [
+        (f"new {i}", {"i": i}, bot_id) for i in range(3)
+    ]
+    assert all(d.id and d.created_at for d in docs)
+    assert len((await repo.get_by_id(bot_id)).documents) == 4
+
+    with pytest.raises(exceptions.DoesNotExist, match="Bot does not exist"):
+        await repo.add_documents(uuid.uuid4(), [models.BotDocument(content="test")])
+    # without the check the foreign key rejects the documents
+    with pytest.raises(HTTPException) as excinfo:
+        await repo.add_documents(
+            uuid.uuid4(), [models.BotDocument(content="test")], check_bot=False
+        )
+    assert excinfo.value.status_code == 409
+
+
+@pytest.mark.asyncio
+async def test_bot_lock(db_session: AsyncSession, bot) -> None:
+    repo = sqlalchemy.BotRepository(db_session)
+    await repo.save(bot)
+
+    await repo.lock(bot.id)
+
+    with pytest.raises(exceptions.DoesNotExist, match="Bot does not exist"):
+        await repo.lock(uuid.uuid4())
@@ -1,14 +1,24 @@
+import datetime
 from unittest import mock
 
 import pytest
-from langchain_core.messages import AIMessage
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
 from langchain_core.runnables.history import RunnableWithMessageHistory
 
 from app import models, ports, typings
 from app.adapters import agents, stubs
+from app.adapters.agents import cache
+from app.adapters.agents import repository as agent_repository
+from app.adapters.agents import utils
 from tests import contracts
 
 
+async def _aiter(items):
+    for item in items:
+        yield item
+
+
 class TestStubChatBotAgents(contracts.ChatBotAgentContract):
     def chatbot(self, bot: models.Bot, results: str) -> ports.ChatBotAgent:
         return stubs.ChatBotAgent(bot, results=results)
@@ -23,6 +33,9 @@ class TestLangChainChatBotAgents(contracts.ChatBotAgentContract):
         chain.stream.return_value = [
             AIMessage(content=line) for line in results.splitlines()
         ]
+        chain.astream.side_effect = lambda *args, **kwargs: _aiter(
+            AIMessageChunk(content=line) for line in results.splitlines()
+        )
 
         agent._chain = chain
         return agent
@@ -38,6 +51,10 @@ class TestLangChainRAGAgents(contracts.ChatBotAgentContract):
         chain = mock.MagicMock(spec=RunnableWithMessageHistory)
         chain.ainvoke.return_value = {"answer": results}
         chain.stream.return_value = [{"answer": line} for line in results.splitlines()]
+        chain.astream.side_effect = lambda *args, **kwargs: _aiter(
+            [{"input": "question"}, {"context": []}]
+            + [{"answer": line} for line in results.splitlines()]
+        )
 
         agent._chain = chain
         return agent
@@ -61,3 +78,98 @@ def test_can_get_agent_from_stubs(bot: models.Bot) -> None:
 
     agent = repo.get_agent(bot, vector_store=mock.MagicMock(spec=ports.VectorStore))
     assert agent == stub_agent
+
+
+def test_agent_repo_caches_agents(bot: models.Bot, bot_factory) -> None:
+    repo = agents.BotAgentRepository(cache_size=1)
+    hits = agent_repository.cache_hits.value
+    misses = agent_repository.cache_misses.value
+
+    agent = repo.get_agent(bot)
+    assert repo.get_agent(bot) is agent
+    assert agent_repository.cache_hits.value == hits + 1
+    assert agent_repository.cache_misses.value == misses + 1
+
+    # editing the bot invalidates the cached agent
+    bot.updated_at = datetime.datetime.now(datetime.timezone.utc)
+    updated_agent = repo.get_agent(bot)
+    assert updated_agent is not agent
+    assert repo.get_agent(bot) is updated_agent
+
+    # least recently used agent is evicted
+    repo.get_agent(bot_factory())
+    assert repo.get_agent(bot) is not updated_agent
+
+
+def test_agent_repo_without_cache(bot: models.Bot) -> None:
+    repo = agents.BotAgentRepository()
+
+    assert repo.get_agent(bot) is not repo.get_agent(bot)
+
+
+async def test_agent_serves_cached_response(bot: models.Bot) -> None:
+    bot.response_cache = True
+    agent = agents.ChatBotAgent(bot)
+    chain = mock.MagicMock(spec=RunnableWithMessageHistory)
+    chain.ainvoke.return_value = AIMessage(content="Hi, user")
+    agent._chain = chain
+
+    response_cache = mock.MagicMock(spec=cache.ResponseCache)
+    response_cache.make_key.return_value = "key"
+    response_cache.aget = mock.AsyncMock(return_value=None)
+    response_cache.aset = mock.AsyncMock()
+    session_history = mock.MagicMock(spec=BaseChatMessageHistory)
+    session_history.aget_messages = mock.AsyncMock(return_value=[])
+    session_history.aadd_messages = mock.AsyncMock()
+
+    with (
+        mock.patch.object(utils, "get_response_cache", return_value=response_cache),
+        mock.patch.object(agent, "_get_session_history", return_value=session_history),
+    ):
+        assert await agent.invoke("1234", "Hello bot") == "Hi, user"
+        response_cache.aset.assert_awaited_once_with(str(bot.id), "key", "Hi, user")
+
+        response_cache.aget.return_value = "Hi, user"
+        assert await agent.invoke("1234", "Hello bot") == "Hi, user"
+
+    # the LLM is only called on a cache miss
+    chain.ainvoke.assert_awaited_once()
+    session_history.aadd_messages.assert_awaited_once()
+
+
+async def test_agent_serves_semantic_cache_answer(bot: models.Bot) -> None:
+    bot.semantic_cache_threshold = 0.9
+    bot.updated_at = datetime.datetime.now(datetime.timezone.utc)
+    agent = agents.ChatBotAgent(bot)
+    chain = mock.MagicMock(spec=RunnableWithMessageHistory)
+    chain.ainvoke.return_value = AIMessage(content="Hi, user")
+    agent._chain = chain
+
+    answer_cache = mock.MagicMock(spec=ports.AnswerCache)
+    answer_cache.embed = mock.AsyncMock(return_value=[0.1, 0.2])
+    answer_cache.lookup = mock.AsyncMock(return_value=None)
+    answer_cache.add = mock.AsyncMock()
+    session_history = mock.MagicMock(spec=BaseChatMessageHistory)
+    session_history.aget_messages = mock.AsyncMock(return_value=[])
+    session_history.aadd_messages = mock.AsyncMock()
+
+    with (
+        mock.patch.object(utils, "get_answer_cache", return_value=answer_cache),
+        mock.patch.object(agent, "_get_session_history", return_value=session_history),
+    ):
+        assert await agent.invoke("1234", "Hello bot") == "Hi, user"
+        answer_cache.add.assert_awaited_once()
+
+        answer_cache.lookup.return_value = "Hi, user"
+        assert await agent.invoke("1234", "Hello  BOT") == "Hi, user"
+        chain.ainvoke.assert_awaited_once()
+
+        # follow up questions are not answered from the semantic cache
+        session_history.aget_messages.return_value = [
+            HumanMessage(content="Hello bot"),
+            AIMessage(content="Hi, user"),
+        ]
+        await agent.invoke("1234", "Hello bot")
+
+    assert chain.ainvoke.await_count == 2
+    assert answer_cache.lookup.await_count == 2
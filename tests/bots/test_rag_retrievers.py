@@ -0,0 +1,94 @@
+import pytest
+from langchain_core.documents import Document
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import RunnableLambda
+
+from app.adapters.agents import retrievers
+
+prompt = ChatPromptTemplate.from_messages(
+    [MessagesPlaceholder("chat_history"), ("human", "{input}")]
+)
+chat_history = [HumanMessage(content="Tell me about Qdrant"), AIMessage(content="Ok")]
+
+
+class FakeRetriever:
+    def __init__(self) -> None:
+        self.queries: list[str] = []
+        self.runnable = RunnableLambda(self._retrieve)
+
+    def _retrieve(self, query: str) -> list[Document]:
+        self.queries.append(query)
+        return [Document(page_content=query)]
+
+
+@pytest.mark.parametrize(
+    "question,expected",
+    [
+        ("How do I install the python client?", False),
+        ("What is the pricing of the cloud plan?", False),
+        ("How do I install it?", True),
+        ("Why?", True),
+        ("and the pricing plans?", True),
+        ("Is that the default value?", True),
+    ],
+)
+def test_needs_rewrite(question: str, expected: bool) -> None:
+    assert retrievers.needs_rewrite(question) is expected
+
+
+async def test_references_policy_skips_rewrite() -> None:
+    retriever = FakeRetriever()
+    llm = FakeListChatModel(responses=["How do I install Qdrant?"])
+    chain = retrievers.create_rewriting_retriever(
+        llm, retriever.runnable, prompt, policy="references"
+    )
+    skipped = retrievers.rewrites_skipped.value
+
+    question = "How do I install the python client?"
+    await chain.ainvoke({"input": question, "chat_history": chat_history})
+    await chain.ainvoke({"input": "How do I install it?", "chat_history": chat_history})
+
+    assert retriever.queries == [question, "How do I install Qdrant?"]
+    assert retrievers.rewrites_skipped.value == skipped + 1
+
+
+@pytest.mark.parametrize(
+    "question,rewrite,expected_queries,hits",
+    [
+        # a no-op rewrite keeps the speculative retrieval
+        ("How do I install it?", "How do I install it?", ["How do I install it?"], 1),
+        (
+            "How do I install it?",
+            "How do I install Qdrant?",
+            ["How do I install it?", "How do I install Qdrant?"],
+            0,
+        ),
+        # questions without references are rewritten too
+        (
+            "How do I install the client?",
+            "How do I install the Qdrant client?",
+            ["How do I install the client?", "How do I install the Qdrant client?"],
+            0,
+        ),
+    ],
+)
+async def test_speculative_policy_retrieves_raw_question(
+    question: str, rewrite: str, expected_queries: list[str], hits: int
+) -> None:
+    retriever = FakeRetriever()
+    llm = FakeListChatModel(responses=[rewrite])
+    chain = retrievers.create_rewriting_retriever(
+        llm, retriever.runnable, prompt, policy="speculative"
+    )
+    skipped = retrievers.rewrites_skipped.value
+    speculative_hits = retrievers.speculative_hits.value
+
+    docs = await chain.ainvoke({"input": question, "chat_history": chat_history})
+
+    assert retriever.queries == expected_queries
+    assert docs[0].page_content == rewrite
+    # the rewrite LLM call is always made
+    assert retrievers.rewrites_skipped.value == skipped
+    assert retrievers.speculative_hits.value == speculative_hits + hits
@@ -107,6 +107,11 @@ def override_dependencies() -> None:
     actual_app.dependency_overrides[deps.get_vector_store] = override_dependency(
         "get_vector_store"
     )
+    actual_app.dependency_overrides[deps.get_job_queue] = override_dependency(
+        "get_job_queue"
+    )
+    # bot configurations are read from the test database
+    actual_app.dependency_overrides[deps.get_bot_config_cache] = lambda: None
 
 
 @pytest.fixture(autouse=True, scope="session")
@@ -37,3 +37,16 @@ class ChatBotAgentContract(abc.ABC):
 
         for idx, result in enumerate(agent.stream(session_id, message)):
             assert result == chunks[idx]
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        "message,response", [("Hello bot", "This is a string\nwith multiple lines\n")]
+    )
+    async def test_can_astream(
+        self, bot: models.Bot, message: str, response: str
+    ) -> None:
+        session_id = str(uuid.uuid4())
+        agent = self.chatbot(bot, results=response)
+
+        chunks = [chunk async for chunk in agent.astream(session_id, message)]
+        assert chunks == response.splitlines()
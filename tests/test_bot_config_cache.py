@@ -0,0 +1,125 @@
+import json
+import uuid
+from unittest import mock
+
+import pytest
+from redis import asyncio as aioredis
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models, ports, typings
+from app.adapters import redis, sqlalchemy
+from app.adapters.redis import bot_config_cache
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def mock_redis():
+    client = mock.MagicMock(spec=aioredis.Redis)
+    client.mget = mock.AsyncMock(return_value=[None, None])
+    client.set = mock.AsyncMock()
+    client.publish = mock.AsyncMock()
+    pipe = mock.MagicMock()
+    pipe.execute = mock.AsyncMock(return_value=[1, True, 1])
+    client.pipeline.return_value.__aenter__ = mock.AsyncMock(return_value=pipe)
+    client.pipeline.return_value.__aexit__ = mock.AsyncMock(return_value=None)
+    return client
+
+
+@pytest.fixture
+async def cache(mock_redis):
+    cache = redis.BotConfigCache(mock_redis, max_size=10, ttl=60, local_ttl=60)
+    # subscribed to invalidations, without a listener connecting to redis
+    cache._listener = mock.MagicMock()
+    cache._subscribed = True
+    yield cache
+    cache._listener = None
+
+
+@pytest.fixture
+def config_bot(bot: models.Bot, bot_context: models.BotContext) -> models.Bot:
+    bot.id = uuid.uuid4()
+    bot.bot_type = typings.BotType.chatbot
+    bot.bot_model = typings.BotModelTypes.gpt_4o
+    bot.contexts = [bot_context]
+    return bot
+
+
+async def test_cache_serves_local_then_redis_entries(cache, mock_redis, config_bot):
+    load = mock.AsyncMock(return_value=config_bot)
+    hits = bot_config_cache.local_hits.value
+    redis_hits = bot_config_cache.redis_hits.value
+
+    assert await cache.get_or_load(config_bot.id, load) is config_bot
+    cached = await cache.get_or_load(config_bot.id, load)
+
+    load.assert_awaited_once()
+    assert bot_config_cache.local_hits.value == hits + 1
+    assert cached.id == config_bot.id
+    assert cached.bot_model == typings.BotModelTypes.gpt_4o
+    assert cached.updated_at == config_bot.updated_at
+    assert [c.content for c in cached.contexts] == [config_bot.contexts[0].content]
+
+    # another process finds the entry in redis
+    other = redis.BotConfigCache(mock_redis, max_size=10, ttl=60, local_ttl=60)
+    other._listener = mock.MagicMock()
+    mock_redis.mget.return_value = [mock_redis.set.call_args.args[1], None]
+
+    cached = await other.get_or_load(config_bot.id, load)
+
+    load.assert_awaited_once()
+    assert cached.name == config_bot.name
+    assert bot_config_cache.redis_hits.value == redis_hits + 1
+
+
+async def test_outdated_redis_entry_is_reloaded(cache, mock_redis, config_bot):
+    load = mock.AsyncMock(return_value=config_bot)
+    await cache.get_or_load(config_bot.id, load)
+    entry = mock_redis.set.call_args.args[1]
+    cache._local.clear()
+
+    # the bot was saved since the entry was cached
+    mock_redis.mget.return_value = [entry, b"1"]
+    await cache.get_or_load(config_bot.id, load)
+
+    assert load.await_count == 2
+    assert json.loads(mock_redis.set.call_args.args[1])["version"] == 1
+
+
+async def test_invalidation_is_published_to_every_process(
+    cache, mock_redis, config_bot
+):
+    load = mock.AsyncMock(return_value=config_bot)
+    await cache.get_or_load(config_bot.id, load)
+    received = bot_config_cache.invalidations_received.value
+
+    await cache.invalidate(config_bot.id)
+
+    assert config_bot.id not in cache._local
+    channel, message = mock_redis.publish.call_args.args
+    assert channel == bot_config_cache.INVALIDATION_CHANNEL
+
+    # another process evicts its entry when receiving the message
+    other = redis.BotConfigCache(mock_redis, max_size=10, ttl=60, local_ttl=60)
+    other._subscribed = True
+    other._listener = mock.MagicMock()
+    mock_redis.mget.return_value = [None, None]
+    await other.get_or_load(config_bot.id, load)
+    assert config_bot.id in other._local
+
+    other._on_invalidation(message.encode())
+
+    assert config_bot.id not in other._local
+    assert bot_config_cache.invalidations_received.value == received + 1
+    # a configuration loaded before the invalidation is not cached again
+    await other.get_or_load(config_bot.id, load)
+    assert config_bot.id not in other._local
+
+
+async def test_repository_invalidates_saved_bots(db_session: AsyncSession, bot):
+    config_cache = mock.MagicMock(spec=ports.BotConfigCache)
+    repo = sqlalchemy.BotRepository(db_session, config_cache=config_cache)
+
+    bot = await repo.save(bot)
+
+    config_cache.invalidate.assert_awaited_once_with(bot.id)
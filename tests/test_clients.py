@@ -0,0 +1,20 @@
+import pytest
+
+from app import clients
+from app.config import settings
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.mark.parametrize("process_pool", [False, True])
+async def test_process_pool_is_only_created_for_the_worker(
+    process_pool: bool, monkeypatch
+) -> None:
+    monkeypatch.setattr(settings, "openai_api_key", "test")
+    app_clients = clients.AppClients()
+
+    app_clients.init(settings, process_pool=process_pool)
+    try:
+        assert (app_clients._process_pool is not None) is process_pool
+    finally:
+        await app_clients.close()
@@ -0,0 +1,72 @@
+from unittest import mock
+
+import pytest
+from langchain_core.embeddings import Embeddings
+from redis import asyncio as aioredis
+
+from app.adapters import redis
+from app.adapters.redis import embeddings as embedding_cache
+
+
+@pytest.fixture
+def mock_redis():
+    client = mock.MagicMock(spec=aioredis.Redis)
+    client.mget = mock.AsyncMock()
+    client.register_script.return_value = mock.AsyncMock(return_value=0)
+    pipe = mock.MagicMock()
+    pipe.execute = mock.AsyncMock(return_value=[True, 1, 1])
+    client.pipeline.return_value.__aenter__ = mock.AsyncMock(return_value=pipe)
+    client.pipeline.return_value.__aexit__ = mock.AsyncMock(return_value=None)
+    return client
+
+
+@pytest.fixture
+def embeddings():
+    embeddings = mock.MagicMock(spec=Embeddings)
+    embeddings.aembed_documents = mock.AsyncMock(return_value=[[0.5, 0.25]])
+    return embeddings
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("dtype", ["float32", "float16"])
+async def test_embeds_only_missing_texts(mock_redis, embeddings, dtype):
+    cached = redis.CachedEmbeddings(
+        embeddings, client=mock_redis, max_entries=10, dtype=dtype
+    )
+    mock_redis.mget.return_value = [cached._encode([1.0, -0.5]), None]
+    hits = embedding_cache.cache_hits.value
+    misses = embedding_cache.cache_misses.value
+
+    vectors = await cached.aembed_documents(["cached text", "new text"])
+
+    assert vectors == [[1.0, -0.5], [0.5, 0.25]]
+    embeddings.aembed_documents.assert_awaited_once_with(["new text"])
+    assert embedding_cache.cache_hits.value == hits + 1
+    assert embedding_cache.cache_misses.value == misses + 1
+
+    pipe = mock_redis.pipeline.return_value.__aenter__.return_value
+    stored = pipe.mset.call_args.args[0]
+    assert list(stored.values()) == [cached._encode([0.5, 0.25])]
+    # float16 halves the stored size
+    assert len(cached._encode([0.5, 0.25])) == (4 if dtype == "float16" else 8)
+
+
+@pytest.mark.asyncio
+async def test_evicts_least_recently_used(mock_redis, embeddings):
+    cached = redis.CachedEmbeddings(embeddings, client=mock_redis, max_entries=2)
+    mock_redis.mget.return_value = [None]
+    pipe = mock_redis.pipeline.return_value.__aenter__.return_value
+    pipe.execute.return_value = [True, 1, 3]
+    evict = mock_redis.register_script.return_value
+    evict.return_value = 1
+
+    await cached.aembed_query("new text")
+
+    mock_redis.register_script.assert_called_once_with(embedding_cache._EVICT_SCRIPT)
+    evict.assert_awaited_once_with(keys=[cached._index_key], args=[2])
+
+    # nothing to evict below the limit
+    evict.reset_mock()
+    pipe.execute.return_value = [True, 1, 2]
+    await cached.aembed_query("new text")
+    evict.assert_not_awaited()
@@ -2,6 +2,8 @@ import pytest
 from fastapi import status
 from httpx import AsyncClient
 
+from app import metrics
+
 pytestmark = pytest.mark.asyncio
 
 
@@ -10,3 +12,12 @@ async def test_health(client: AsyncClient) -> None:
 
     assert response.status_code == status.HTTP_200_OK, response.text
     assert response.text == '"ok"'
+
+
+async def test_metrics(client: AsyncClient) -> None:
+    metrics.registry.counter("test_metric_total").inc()
+
+    response = await client.get("/metrics/")
+
+    assert response.status_code == status.HTTP_200_OK, response.text
+    assert response.json()["test_metric_total"] >= 1
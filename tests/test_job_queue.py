@@ -0,0 +1,105 @@
+import asyncio
+import json
+from unittest import mock
+
+import pytest
+from redis import asyncio as aioredis
+
+from app import ports, worker
+from app.adapters import redis
+from app.config import settings
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def mock_redis():
+    client = mock.MagicMock(spec=aioredis.Redis)
+    client.blmove = mock.AsyncMock(return_value=None)
+    client.set = mock.AsyncMock()
+    client.zadd = mock.AsyncMock()
+    client.lrange = mock.AsyncMock(return_value=[])
+    client.zmscore = mock.AsyncMock(return_value=[])
+    client.lrem = mock.AsyncMock(return_value=1)
+    pipe = mock.MagicMock()
+    pipe.execute = mock.AsyncMock()
+    client.pipeline.return_value.__aenter__ = mock.AsyncMock(return_value=pipe)
+    client.pipeline.return_value.__aexit__ = mock.AsyncMock(return_value=None)
+    return client
+
+
+async def test_can_enqueue_and_reserve_job(mock_redis):
+    queue = redis.JobQueue(mock_redis)
+    pipe = mock_redis.pipeline.return_value.__aenter__.return_value
+
+    job = await queue.enqueue("index_bot_documents", {"bot_id": "1"})
+    pipe.lpush.assert_called_once_with("jobs:pending", job.id)
+
+    assert await queue.reserve(timeout=1) is None
+
+    mock_redis.blmove.return_value = job.id.encode()
+    pipe.execute.return_value = [1, json.dumps({"id": job.id, "name": job.name})]
+    reserved = await queue.reserve(timeout=1)
+
+    mock_redis.blmove.assert_awaited_with(
+        "jobs:pending", "jobs:processing", 1, "RIGHT", "LEFT"
+    )
+    assert reserved.id == job.id
+    assert reserved.attempts == 1
+    # the job is invisible until its visibility deadline
+    pipe.zadd.assert_called_once()
+
+
+async def test_failed_job_is_retried_then_dead(mock_redis):
+    queue = redis.JobQueue(mock_redis)
+    pipe = mock_redis.pipeline.return_value.__aenter__.return_value
+    job = ports.Job(id="1", name="index_bot_documents", attempts=1)
+
+    assert await queue.fail(job, "error")
+    pipe.lpush.assert_not_called()
+
+    job.attempts = settings.job_max_attempts
+    assert not await queue.fail(job, "error")
+    pipe.lpush.assert_called_once_with("jobs:dead", "1")
+    pipe.ltrim.assert_called_once_with(
+        "jobs:dead", 0, redis.job_queue.DEAD_JOBS_MAX - 1
+    )
+
+
+async def test_expired_jobs_are_requeued(mock_redis):
+    queue = redis.JobQueue(mock_redis)
+    pipe = mock_redis.pipeline.return_value.__aenter__.return_value
+    mock_redis.lrange.return_value = [b"expired", b"running", b"reserving"]
+    mock_redis.zmscore.return_value = [1.0, 2e10, None]
+
+    assert await queue.requeue_expired() == 1
+
+    mock_redis.lrem.assert_awaited_once_with("jobs:processing", 1, b"expired")
+    pipe.rpush.assert_called_once_with("jobs:pending", b"expired")
+    # a job being reserved gets a deadline instead of being requeued
+    mock_redis.zadd.assert_awaited_once()
+    assert mock_redis.zadd.await_args.kwargs["nx"] is True
+
+
+async def test_worker_runs_jobs():
+    queue = mock.MagicMock(spec=ports.JobQueue)
+    done = ports.Job(id="1", name="task", payload={"value": 1})
+    failed = ports.Job(id="2", name="task", payload={"value": 2})
+    task = mock.AsyncMock(side_effect=[None, RuntimeError("failed")])
+    job_worker = worker.Worker(queue, tasks={"task": task}, concurrency=2)
+
+    jobs = [done, failed]
+
+    async def reserve(timeout):
+        if jobs:
+            return jobs.pop(0)
+        job_worker.stop()
+        await asyncio.sleep(0)
+        return None
+
+    queue.reserve.side_effect = reserve
+    await asyncio.wait_for(job_worker.run(), timeout=1)
+
+    task.assert_has_awaits([mock.call({"value": 1}), mock.call({"value": 2})])
+    queue.ack.assert_awaited_once_with(done)
+    queue.fail.assert_awaited_once_with(failed, "RuntimeError('failed')")
@@ -0,0 +1,46 @@
+import asyncio
+from unittest import mock
+
+import pytest
+from redis import asyncio as aioredis
+from redis import exceptions as redis_exceptions
+
+from app.adapters import redis
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def mock_lock():
+    lock = mock.MagicMock(spec=aioredis.lock.Lock)
+    lock.name = "lock:test"
+    lock.acquire = mock.AsyncMock(return_value=True)
+    lock.reacquire = mock.AsyncMock(return_value=True)
+    lock.release = mock.AsyncMock()
+    return lock
+
+
+async def test_redis_lock_is_refreshed_while_held(mock_lock):
+    client = mock.MagicMock(spec=aioredis.Redis)
+    client.lock.return_value = mock_lock
+    manager = redis.LockManager(client, timeout=0.03)
+
+    async with manager.hold("test"):
+        mock_lock.acquire.assert_awaited_once()
+        await asyncio.sleep(0.05)
+
+    assert client.lock.call_args.args[0] == "lock:test"
+    assert mock_lock.reacquire.await_count >= 1
+    mock_lock.release.assert_awaited_once()
+
+
+async def test_redis_lock_release_ignores_expired_lock(mock_lock):
+    client = mock.MagicMock(spec=aioredis.Redis)
+    client.lock.return_value = mock_lock
+    mock_lock.release.side_effect = redis_exceptions.LockNotOwnedError("expired")
+    manager = redis.LockManager(client, timeout=10)
+
+    async with manager.hold("test"):
+        pass
+
+    mock_lock.release.assert_awaited_once()
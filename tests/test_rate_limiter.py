@@ -0,0 +1,62 @@
+from unittest import mock
+
+import pytest
+from langchain_core.embeddings import Embeddings
+from redis import asyncio as aioredis
+
+from app.adapters import redis
+from app.adapters.redis import rate_limiter as rate_limiting
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def mock_redis():
+    client = mock.MagicMock(spec=aioredis.Redis)
+    client.register_script.return_value = mock.AsyncMock(return_value=b"0")
+    return client
+
+
+async def test_acquire_takes_request_and_tokens(mock_redis):
+    limiter = redis.RateLimiter(
+        mock_redis, name="embeddings", requests_per_minute=60, tokens_per_minute=1000
+    )
+
+    await limiter.acquire(tokens=100)
+
+    script = mock_redis.register_script.return_value
+    script.assert_awaited_once_with(
+        keys=["rate_limit:embeddings"], args=[60, 1, 1000, 100]
+    )
+
+
+async def test_acquire_waits_for_the_buckets_to_refill(mock_redis):
+    script = mock_redis.register_script.return_value
+    script.side_effect = [b"0.5", b"0"]
+    limiter = redis.RateLimiter(
+        mock_redis, name="embeddings", requests_per_minute=60, tokens_per_minute=0
+    )
+    waits = rate_limiting.rate_limit_waits.value
+
+    with mock.patch("asyncio.sleep", new_callable=mock.AsyncMock) as sleep:
+        await limiter.acquire(tokens=10)
+
+    sleep.assert_awaited_once_with(0.5)
+    assert script.await_count == 2
+    assert rate_limiting.rate_limit_waits.value == waits + 1
+
+
+async def test_rate_limited_embeddings_estimate_tokens(mock_redis):
+    embeddings = mock.MagicMock(spec=Embeddings)
+    embeddings.model = "text-embedding-3-small"
+    embeddings.aembed_documents = mock.AsyncMock(return_value=[[0.5], [0.25]])
+    limiter = mock.MagicMock(spec=redis.RateLimiter)
+    limited = redis.RateLimitedEmbeddings(embeddings, limiter)
+    # cached under the model it wraps
+    assert limited.model == "text-embedding-3-small"
+
+    vectors = await limited.aembed_documents(["a" * 40, "b" * 8])
+
+    assert vectors == [[0.5], [0.25]]
+    limiter.acquire.assert_awaited_once_with(11 + 3)
+    embeddings.aembed_documents.assert_awaited_once()
@@ -0,0 +1,68 @@
+import asyncio
+import typing
+from unittest import mock
+
+import pytest
+
+from app import exceptions, utils
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_cancel_on_disconnect_returns_result() -> None:
+    is_disconnected = mock.AsyncMock(return_value=False)
+
+    result = await utils.cancel_on_disconnect(
+        is_disconnected, asyncio.sleep(0.01, result="done"), poll_interval=0.001
+    )
+
+    assert result == "done"
+
+
+async def test_cancel_on_disconnect_cancels_task() -> None:
+    is_disconnected = mock.AsyncMock(return_value=True)
+    cancelled = asyncio.Event()
+
+    async def invoke() -> str:
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        return "done"
+
+    with pytest.raises(exceptions.ClientDisconnected):
+        await utils.cancel_on_disconnect(is_disconnected, invoke(), poll_interval=0.001)
+
+    await asyncio.wait_for(cancelled.wait(), timeout=1)
+    is_disconnected.assert_awaited_once()
+
+
+async def _chunks(*chunks: bytes) -> typing.AsyncIterator[bytes]:
+    for chunk in chunks:
+        yield chunk
+
+
+async def test_aiter_lines_splits_across_chunks() -> None:
+    chunks = _chunks(b'{"a"', b": 1}\n{", b'"b": 2}\n\n', b"tail")
+
+    lines = [line async for line in utils.aiter_lines(chunks, max_line_size=16)]
+
+    assert lines == [b'{"a": 1}', b'{"b": 2}', b"", b"tail"]
+
+
+@pytest.mark.parametrize(
+    "chunks",
+    [
+        (b"short\n", b"x" * 10, b"x" * 10),
+        # complete within a single chunk
+        (b"short\n" + b"x" * 20 + b"\nshort\n",),
+    ],
+)
+async def test_aiter_lines_rejects_long_lines(chunks: tuple[bytes, ...]) -> None:
+    lines = []
+    with pytest.raises(exceptions.LineTooLong, match="longer than 16 bytes"):
+        async for line in utils.aiter_lines(_chunks(*chunks), max_line_size=16):
+            lines.append(line)
+
+    assert lines == [b"short"]
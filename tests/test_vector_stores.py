@@ -1,81 +1,109 @@
+import asyncio
+import concurrent.futures
+import dataclasses
+import gc
+import multiprocessing
+import re
+import time
+import tracemalloc
+import typing
 from unittest import mock
-from unittest.mock import AsyncMock, MagicMock, patch
+from unittest.mock import MagicMock, patch
 
 import pytest
+import qdrant_client
 from langchain import document_loaders
 from langchain_community import document_loaders
 from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
+from qdrant_client.http import models as rest
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app import models, typings
-from app.adapters import qdrant
+from app import db, models, typings
+from app.adapters import qdrant, sqlalchemy
+from app.config import settings
+
+STALE_POINT_ID = "1b4e28ba-2fa1-11d2-883f-0016d3cca427"
+
+
+async def _stream(
+    documents: typing.Iterable[models.BotDocument],
+) -> typing.AsyncIterator[models.BotDocument]:
+    for doc in documents:
+        yield doc
 
 
 @pytest.fixture
-@patch("qdrant_client.AsyncQdrantClient", autospec=True)
-@patch("qdrant_client.QdrantClient", autospec=True)
-def vector_store(mock_qdrant_client, mock_async_qdrant_client):
+def vector_store():
     embedding = mock.MagicMock(spec=Embeddings)
-    return qdrant.VectorStore(embedding)
+    embedding.aembed_query.return_value = [0.1, 0.2, 0.3]
+    embedding.aembed_documents.side_effect = lambda texts: [[0.1, 0.2, 0.3]] * len(
+        texts
+    )
+    client = mock.create_autospec(qdrant_client.QdrantClient, instance=True)
+    async_client = mock.create_autospec(qdrant_client.AsyncQdrantClient, instance=True)
+    async_client.collection_exists.return_value = False
+    async_client.scroll.return_value = ([], None)
+    return qdrant.VectorStore(embedding, client=client, async_client=async_client)
 
 
 @pytest.mark.asyncio
-@patch("langchain_qdrant.Qdrant.afrom_documents", new_callable=AsyncMock)
 async def test_can_index_text_documents(
-    mock_afrom_documents, vector_store, bot: models.Bot, bot_context: models.BotContext
+    vector_store, bot: models.Bot, bot_context: models.BotContext
 ):
     # Mock the asynchronous loading of documents
     bot.data_source = typings.BotDataSource.text
     bot.contexts = [bot_context]
+    documents = [models.BotDocument(content="test content", doc_metadata={})]
 
-    await vector_store.index(bot)
+    await vector_store.index(bot, _stream(documents))
 
-    # Check the Qdrant.afrom_documents is called
-    mock_afrom_documents.assert_called_once()
+    # Check the collection is created and documents added to the shared store
+    vector_store._async_client.create_collection.assert_called_once()
+    vector_store._async_client.upsert.assert_called_once()
 
 
 @pytest.mark.asyncio
-@patch("langchain_qdrant.Qdrant.afrom_documents", new_callable=AsyncMock)
 async def test_can_index_uploaded_documents(
-    mock_afrom_documents, vector_store, bot: models.Bot, bot_context: models.BotContext
+    vector_store, bot: models.Bot, bot_context: models.BotContext
 ):
     # Mock the asynchronous loading of documents
     bot.data_source = typings.BotDataSource.uploads
     bot.contexts = [bot_context]
 
-    with patch.object(
-        document_loaders.S3DirectoryLoader, "aload", new_callable=AsyncMock
-    ) as mock_aload:
-        mock_aload.return_value = [
+    with (
+        patch.object(qdrant.loaders, "list_s3_keys", return_value=["file.pdf"]),
+        patch.object(qdrant.loaders.document_loaders, "S3FileLoader") as mock_loader,
+    ):
+        mock_load = mock_loader.return_value.load
+        mock_load.return_value = [
             Document(page_content="test content", metadata={"title": "Test Document"})
         ]
-        await vector_store.index(bot)
+        await vector_store.index(bot, _stream([]))
 
-    mock_aload.assert_called_once()
-    # Check the Qdrant.afrom_documents is called
-    mock_afrom_documents.assert_called_once()
+    mock_load.assert_called_once()
+    # Check the documents are added to the shared store
+    vector_store._async_client.upsert.assert_called_once()
 
 
 @pytest.mark.asyncio
-@patch("langchain_qdrant.Qdrant.afrom_documents", new_callable=AsyncMock)
 async def test_can_index_web_links(
-    mock_afrom_documents, vector_store, bot: models.Bot, bot_context: models.BotContext
+    vector_store, bot: models.Bot, bot_context: models.BotContext
 ):
     # Mock the asynchronous loading of documents
     bot.data_source = typings.BotDataSource.web
     bot.contexts = [bot_context]
+    documents = [models.BotDocument(content="https://example.com", doc_metadata={})]
 
-    with patch.object(
-        document_loaders.WebBaseLoader, "aload", new_callable=MagicMock
-    ) as mock_aload:
-        mock_aload.return_value = [
-            Document(page_content="test content", metadata={"title": "Test Document"})
-        ]
-        await vector_store.index(bot)
+    with patch.object(document_loaders.WebBaseLoader, "lazy_load") as mock_load:
+        mock_load.return_value = iter(
+            [Document(page_content="test content", metadata={"title": "Test Document"})]
+        )
+        await vector_store.index(bot, _stream(documents))
 
-    mock_aload.assert_called_once()
-    # Check the Qdrant.afrom_documents is called
-    mock_afrom_documents.assert_called_once()
+    mock_load.assert_called_once()
+    # Check the documents are added to the shared store
+    vector_store._async_client.upsert.assert_called_once()
 
 
 @patch("langchain_qdrant.Qdrant.as_retriever", autospec=True)
@@ -90,3 +118,380 @@ def test_get_retriever(mock_as_retriever, vector_store):
     assert isinstance(
         retriever, MagicMock
     )  # assuming as_retriever returns a MagicMock in the mock setup
+
+
+@pytest.mark.asyncio
+async def test_index_reuses_existing_collection(vector_store, bot: models.Bot):
+    bot.data_source = typings.BotDataSource.text
+    documents = [models.BotDocument(content="test content", doc_metadata={})]
+    vector_store._async_client.collection_exists.return_value = True
+
+    await vector_store.index(bot, _stream(documents))
+
+    vector_store._async_client.create_collection.assert_not_called()
+    vector_store._async_client.upsert.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_index_tolerates_collection_created_concurrently(
+    vector_store, bot: models.Bot
+):
+    bot.data_source = typings.BotDataSource.text
+    documents = [models.BotDocument(content="test content", doc_metadata={})]
+    async_client = vector_store._async_client
+    # another worker creates the collection and its index first
+    async_client.collection_exists.side_effect = [False, True]
+    async_client.create_collection.side_effect = RuntimeError("already exists")
+    async_client.create_payload_index.side_effect = RuntimeError("already exists")
+    async_client.get_collection.return_value = rest.CollectionInfo.model_construct(
+        payload_schema={"metadata.namespace": mock.Mock()}
+    )
+
+    await vector_store.index(bot, _stream(documents))
+
+    async_client.upsert.assert_called_once()
+
+    # other failures are raised
+    async_client.collection_exists.side_effect = [False, False]
+    with pytest.raises(RuntimeError, match="already exists"):
+        await vector_store.index(bot, _stream(documents))
+
+
+@pytest.mark.asyncio
+async def test_index_only_embeds_changed_chunks(vector_store, bot: models.Bot):
+    bot.data_source = typings.BotDataSource.text
+    documents = [models.BotDocument(content="unchanged content", doc_metadata={})]
+    async_client = vector_store._async_client
+    async_client.collection_exists.return_value = True
+
+    await vector_store.index(bot, _stream(documents))
+    indexed = async_client.upsert.call_args.kwargs["points"][0]
+    indexed_id = indexed.id
+
+    # the bot documents are edited, existing points are paged through
+    documents.append(models.BotDocument(content="new content", doc_metadata={}))
+    async_client.scroll.side_effect = [
+        ([rest.Record(id=indexed_id, payload=indexed.payload)], "next"),
+        ([rest.Record(id=STALE_POINT_ID, payload={})], None),
+    ]
+    async_client.upsert.reset_mock()
+
+    await vector_store.index(bot, _stream(documents))
+
+    points = async_client.upsert.call_args.kwargs["points"]
+    assert [point.payload["page_content"] for point in points] == ["new content"]
+    assert indexed_id not in [point.id for point in points]
+    async_client.delete.assert_called_once()
+    deleted = async_client.delete.call_args.kwargs["points_selector"].points
+    assert deleted == [STALE_POINT_ID]
+
+
+@pytest.mark.asyncio
+async def test_rebuild_swaps_in_new_namespace(vector_store, bot: models.Bot):
+    bot.data_source = typings.BotDataSource.text
+    documents = [models.BotDocument(content="test content", doc_metadata={})]
+    async_client = vector_store._async_client
+    async_client.collection_exists.return_value = True
+    async_client.scroll.return_value = ([rest.Record(id=STALE_POINT_ID)], None)
+    calls = mock.Mock()
+    async_client.upsert.side_effect = lambda *args, **kwargs: calls.add()
+    async_client.set_payload.side_effect = lambda *args, **kwargs: calls.swap()
+    async_client.delete.side_effect = lambda *args, **kwargs: calls.delete()
+
+    await vector_store.index(bot, _stream(documents), rebuild=True)
+
+    # vectors are built in a staging namespace of the bot
+    point = async_client.upsert.call_args.kwargs["points"][0]
+    assert point.payload["metadata"]["namespace"].startswith(f"{bot.id}:staging-")
+    assert async_client.set_payload.call_args.kwargs["payload"] == {
+        "namespace": str(bot.id)
+    }
+    # old vectors are only deleted once the new ones serve
+    assert [c[0] for c in calls.mock_calls] == ["add", "swap", "delete"]
+    deleted = async_client.delete.call_args.kwargs["points_selector"].points
+    assert deleted == [STALE_POINT_ID]
+
+
+@pytest.mark.asyncio
+async def test_index_reports_progress(vector_store, bot: models.Bot):
+    bot.data_source = typings.BotDataSource.text
+    documents = [
+        models.BotDocument(content=f"content {idx}", doc_metadata={})
+        for idx in range(settings.index_batch_size + 1)
+    ]
+    reports = []
+
+    async def on_progress(progress):
+        reports.append(dataclasses.replace(progress))
+
+    await vector_store.index(bot, _stream(documents), on_progress=on_progress)
+
+    # chunks are embedded and upserted in batches, reported after each one
+    assert vector_store._embedding.aembed_documents.await_count == 2
+    assert vector_store._async_client.upsert.await_count == 2
+    assert len(reports) == 3
+    assert reports[-1].documents_loaded == len(documents)
+    assert reports[-1].chunks_total == len(documents)
+    assert reports[-1].chunks_embedded == len(documents)
+    assert reports[-1].chunks_upserted == len(documents)
+
+
+@pytest.mark.asyncio
+async def test_index_uses_index_embeddings(vector_store, bot: models.Bot):
+    index_embedding = mock.MagicMock(spec=Embeddings)
+    index_embedding.aembed_documents.return_value = [[0.1, 0.2, 0.3]]
+    vector_store._index_embedding = index_embedding
+    bot.data_source = typings.BotDataSource.text
+    documents = [models.BotDocument(content="test content", doc_metadata={})]
+
+    await vector_store.index(bot, _stream(documents))
+
+    # chat queries keep the unlimited embeddings
+    index_embedding.aembed_documents.assert_awaited_once()
+    vector_store._embedding.aembed_documents.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_index_reports_progress_committing_the_bot_session(
+    vector_store, db_session: AsyncSession, bot: models.Bot
+):
+    repo = sqlalchemy.BotRepository(db_session)
+    bot.data_source = typings.BotDataSource.text
+    bot.documents = [
+        models.BotDocument(content=f"content {idx}", doc_metadata={"idx": idx})
+        for idx in range(20)
+    ]
+    await repo.save(bot)
+    bot_id = bot.id
+    job = await repo.save_index_job(models.BotIndexJob(bot_id=bot_id))
+    job_id = job.id
+    bot = await repo.get_by_id(bot_id, documents=False)
+
+    async def on_progress(progress):
+        # commits expire the bot while its documents are indexed
+        job.chunks_upserted = progress.chunks_upserted
+        await repo.save_index_job(job)
+
+    with patch.object(settings, "index_batch_size", 1):
+        # documents are streamed by pages from a session that is not committed
+        async with db.async_db.session() as documents_session:
+            documents = sqlalchemy.BotRepository(documents_session).iter_documents(
+                bot_id
+            )
+            with patch.object(settings, "index_documents_page_size", 3):
+                await vector_store.index(bot, documents, on_progress=on_progress)
+
+    assert vector_store._async_client.upsert.await_count == 20
+    assert (await repo.get_index_job(bot_id, job_id)).chunks_upserted == 20
+
+
+@pytest.mark.asyncio
+async def test_index_embeds_batches_concurrently(
+    vector_store, bot: models.Bot, monkeypatch
+):
+    monkeypatch.setattr(settings, "index_batch_size", 1)
+    monkeypatch.setattr(settings, "index_concurrency", 2)
+    bot.data_source = typings.BotDataSource.text
+    documents = [
+        models.BotDocument(content=f"content {idx}", doc_metadata={})
+        for idx in range(5)
+    ]
+    embedding = 0
+    max_embedding = 0
+    upserting = 0
+    pipelined = False
+
+    async def aembed_documents(texts):
+        nonlocal embedding, max_embedding, pipelined
+        embedding += 1
+        max_embedding = max(max_embedding, embedding)
+        pipelined = pipelined or upserting > 0
+        await asyncio.sleep(0.01)
+        embedding -= 1
+        return [[0.1, 0.2, 0.3]] * len(texts)
+
+    async def upsert(**kwargs):
+        nonlocal upserting
+        upserting += 1
+        await asyncio.sleep(0.02)
+        upserting -= 1
+
+    vector_store._embedding.aembed_documents.side_effect = aembed_documents
+    vector_store._async_client.upsert.side_effect = upsert
+
+    await vector_store.index(bot, _stream(documents))
+
+    # embedding requests are bounded and run alongside the upserts
+    assert max_embedding == 2
+    assert pipelined
+    assert vector_store._async_client.upsert.await_count == 5
+    assert vector_store._embedding.aembed_documents.await_count == 5
+
+
+@pytest.mark.asyncio
+async def test_index_memory_stays_flat(vector_store, bot: models.Bot, monkeypatch):
+    monkeypatch.setattr(settings, "index_batch_size", 8)
+    monkeypatch.setattr(settings, "index_max_pending_batches", 2)
+    bot.data_source = typings.BotDataSource.text
+    vector_store._async_client.collection_exists.return_value = True
+
+    # plain functions, mocks would keep every call in memory
+    async def aembed_documents(texts):
+        await asyncio.sleep(0)
+        return [[0.1, 0.2, 0.3]] * len(texts)
+
+    async def upsert(**kwargs):
+        await asyncio.sleep(0)
+
+    vector_store._embedding.aembed_documents = aembed_documents
+    vector_store._async_client.upsert = upsert
+    # a dedicated splitting thread, not the shared default executor
+    vector_store._executor = concurrent.futures.ThreadPoolExecutor(1)
+
+    async def peak_memory(count):
+        content = "lorem ipsum dolor sit amet " * 100
+        # built while traced, as streamed from the database
+        documents = (
+            models.BotDocument(content=f"{idx} {content}", doc_metadata={})
+            for idx in range(count)
+        )
+        gc.collect()
+        tracemalloc.start()
+        try:
+            await vector_store.index(bot, _stream(documents))
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    try:
+        await peak_memory(10)  # warm up caches of the splitter and the mocks
+        small = await peak_memory(20)
+        large = await peak_memory(200)
+    finally:
+        vector_store._executor.shutdown()
+
+    # the corpus is 10 times larger, chunks are not accumulated
+    assert large < small * 1.5
+
+
+@pytest.mark.asyncio
+async def test_index_splits_in_process_pool_in_order(vector_store, bot: models.Bot):
+    bot.data_source = typings.BotDataSource.text
+    documents = [
+        models.BotDocument(content=f"document {idx} " * 100, doc_metadata={})
+        for idx in range(6)
+    ]
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(2, mp_context=context) as executor:
+        vector_store._executor = executor
+        await vector_store.index(bot, _stream(documents))
+
+    points = [
+        point
+        for call in vector_store._async_client.upsert.call_args_list
+        for point in call.kwargs["points"]
+    ]
+    order = [int(re.search(r"\d+", p.payload["page_content"]).group()) for p in points]
+    # every document is split into chunks, kept in the documents order
+    assert len(points) > len(documents)
+    assert order == sorted(order)
+    assert all(p.payload["metadata"]["content_hash"] for p in points)
+
+
+@pytest.fixture
+def answer_cache():
+    embedding = mock.MagicMock(spec=Embeddings)
+    embedding.aembed_query.return_value = [0.1, 0.2, 0.3]
+    async_client = mock.create_autospec(qdrant_client.AsyncQdrantClient, instance=True)
+    async_client.collection_exists.return_value = False
+    return qdrant.AnswerCache(embedding, async_client=async_client)
+
+
+@pytest.mark.asyncio
+async def test_answer_cache_lookup(answer_cache):
+    async_client = answer_cache._async_client
+
+    # nothing is cached before the collection exists
+    assert await answer_cache.lookup("bot", [0.1, 0.2, 0.3], threshold=0.9) is None
+    async_client.search.assert_not_called()
+
+    async_client.collection_exists.return_value = True
+    async_client.search.return_value = [
+        rest.ScoredPoint(id=1, version=1, score=0.95, payload={"answer": "Hi, user"})
+    ]
+    answer = await answer_cache.lookup("bot", [0.1, 0.2, 0.3], threshold=0.9)
+
+    assert answer == "Hi, user"
+    kwargs = async_client.search.call_args.kwargs
+    assert kwargs["score_threshold"] == 0.9
+    assert kwargs["query_filter"].must[0].match.value == "bot"
+
+
+@pytest.mark.asyncio
+async def test_answer_cache_add_creates_collection(answer_cache):
+    async_client = answer_cache._async_client
+    vector = await answer_cache.embed("Hello bot")
+
+    await answer_cache.add("bot", "Hello bot", vector, "Hi, user")
+    await answer_cache.add("bot", "Hello bot", vector, "Hi, user")
+
+    async_client.create_collection.assert_called_once()
+    assert [
+        c.kwargs["field_name"] for c in async_client.create_payload_index.call_args_list
+    ] == ["namespace", "created_at"]
+    assert async_client.upsert.call_count == 2
+    point = async_client.upsert.call_args.kwargs["points"][0]
+    assert point.payload["namespace"] == "bot"
+    assert point.payload["answer"] == "Hi, user"
+
+    # expired entries are deleted at most once per interval
+    async_client.delete.assert_called_once()
+    condition = async_client.delete.call_args.kwargs["points_selector"].filter.must[0]
+    assert condition.key == "created_at"
+    assert condition.range.lt <= time.time() - settings.semantic_cache_ttl
+
+
+@pytest.mark.asyncio
+async def test_bootstrap_creates_collection(vector_store):
+    async_client = vector_store._async_client
+
+    with (
+        patch.object(settings, "qdrant_vector_size", 1536),
+        patch.object(settings, "qdrant_quantization", True),
+    ):
+        await vector_store.bootstrap()
+
+    kwargs = async_client.create_collection.call_args.kwargs
+    assert kwargs["vectors_config"].size == 1536
+    assert kwargs["hnsw_config"].m == settings.qdrant_hnsw_m
+    assert kwargs["quantization_config"].scalar.type == rest.ScalarType.INT8
+    async_client.create_payload_index.assert_called_once_with(
+        collection_name=settings.qdrant_collection,
+        field_name="metadata.namespace",
+        field_schema=rest.PayloadSchemaType.KEYWORD,
+    )
+
+
+@pytest.mark.asyncio
+async def test_bootstrap_updates_existing_collection(vector_store):
+    async_client = vector_store._async_client
+    async_client.collection_exists.return_value = True
+
+    with patch.object(settings, "qdrant_on_disk_vectors", True):
+        await vector_store.bootstrap()
+
+    async_client.create_collection.assert_not_called()
+    kwargs = async_client.update_collection.call_args.kwargs
+    assert kwargs["vectors_config"][""].on_disk is True
+    assert kwargs["quantization_config"] == rest.Disabled.DISABLED
+    async_client.create_payload_index.assert_called_once()
+
+
+@patch("langchain_qdrant.Qdrant.as_retriever", autospec=True)
+def test_get_retriever_rescores_quantized_vectors(mock_as_retriever, vector_store):
+    with patch.object(settings, "qdrant_quantization", True):
+        vector_store.get_retriever("test_namespace")
+
+    search_kwargs = mock_as_retriever.call_args.kwargs["search_kwargs"]
+    assert search_kwargs["filter"] == {"namespace": "test_namespace"}
+    assert search_kwargs["search_params"].quantization.rescore is True